@@ -1,4 +1,5 @@
 from .easy_agents import RandomPlayer, HumanPlayer
 from .mcts import MCTSPlayer
 from .dql import DQAgent
+from .puct import PUCTPlayer
 from .dqn import *
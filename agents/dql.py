@@ -1,11 +1,28 @@
 import torch
 from numpy import ndarray
 from torch import nn
-from typing import Collection, Tuple
+from typing import Collection, Optional, Sequence, Tuple
 import numpy as np
 from three_game import DurakAction, ObservableDurakGameState, GameTransition
 from .easy_agents import DurakPlayer
 
+NUM_CARDS = DurakAction.n(4)
+# Lookup table from card to its many-hot index, replacing DurakAction.ext_from_card in the hot path
+CARD_INDEX = {DurakAction.card_from_ext(ext): ext for ext in range(NUM_CARDS)}
+# Offsets of the card blocks within an encoded state, in the order hand, attack, defend, graveyard
+HAND_OFFSET = 1
+ATTACK_OFFSET = HAND_OFFSET + NUM_CARDS
+DEFEND_OFFSET = ATTACK_OFFSET + NUM_CARDS
+GRAVEYARD_OFFSET = DEFEND_OFFSET + NUM_CARDS
+HANDS_OFFSET = GRAVEYARD_OFFSET + NUM_CARDS
+
+
+def state_input_dim(num_players: int = 3) -> int:
+    """
+    Returns the length of an encoded state for a game with num_players players.
+    """
+    return HANDS_OFFSET + num_players + 2
+
 
 def cards_to_input_array(cards: Collection[tuple]):
     """
@@ -14,46 +31,78 @@ def cards_to_input_array(cards: Collection[tuple]):
     :param cards: The cards to convert.
     :return: A 1D array of the cards.
     """
-    card_ids = np.array([DurakAction.ext_from_card(card) for card in cards], dtype=np.int32)
-    num_cards = DurakAction.n(4)
-    card_array = np.zeros(num_cards)
-    card_array[card_ids] = 1
+    card_array = np.zeros(NUM_CARDS)
+    card_array[[CARD_INDEX[card] for card in cards]] = 1
     return card_array
 
 
+def _check_out(out: np.ndarray, shape: Tuple[int, int]):
+    if out.shape != shape:
+        raise ValueError("out has shape {}, expected {}".format(out.shape, shape))
+    if not out.flags.c_contiguous:
+        raise ValueError("out must be C-contiguous")
+    if out.dtype.kind not in "iuf":
+        raise ValueError("out must have an integer or float dtype, got {}".format(out.dtype))
+
+
+def encode_states(states: Sequence[ObservableDurakGameState], out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Encodes a batch of states into the rows of a matrix, see state_to_input_array for the layout.
+    All the many-hot entries of the batch are set with a single scatter into the flattened matrix.
+
+    :param states: The states to encode, all from games with the same number of players.
+    :param out: Optional C-contiguous numeric matrix of shape [len(states), dim] to write into.
+    :return: The matrix of encoded states.
+    :raises ValueError: if out is not C-contiguous, has the wrong shape or is not of an integer or float dtype.
+    """
+    n = len(states)
+    num_players = len(states[0].num_cards_in_hands) if n else 3
+    dim = state_input_dim(num_players)
+    if out is None:
+        out = np.zeros((n, dim), dtype=np.float32)
+    else:
+        _check_out(out, (n, dim))
+        out[:] = 0
+    if n == 0:
+        return out
+    # a view of out, reshape would silently copy a non-contiguous out and the scatter would be lost
+    flat = out.reshape(-1)
+    hot = []
+    for row, state in enumerate(states):
+        base = row * dim
+        for offset, cards in (
+            (HAND_OFFSET, state.hand),
+            (ATTACK_OFFSET, state.attack_table),
+            (DEFEND_OFFSET, state.defend_table),
+            (GRAVEYARD_OFFSET, state.graveyard),
+        ):
+            start = base + offset
+            hot.extend([start + CARD_INDEX[card] for card in cards])
+    flat[hot] = 1
+    out[:, 0] = [state.player_id for state in states]
+    out[:, HANDS_OFFSET:HANDS_OFFSET + num_players] = [state.num_cards_in_hands for state in states]
+    out[:, -2] = [state.num_cards_left_in_deck for state in states]
+    out[:, -1] = [state.is_done for state in states]
+    return out
+
+
 def state_to_input_array(state: ObservableDurakGameState):
     """
     Converts a state to a 1D array input for the neural network and saving for history.
     To do so,
-    0-35: many-hot encoding of the hand
-    36-71: many-hot encoding of the attack table
-    72-107: many-hot encoding of the defend table
-    108-143: many-hot encoding of the graveyard
-    144-145: number of cards left in each opponent's hand
-    146: number of cards left in the deck
+    0: id of the observing player
+    1-36: many-hot encoding of the hand
+    37-72: many-hot encoding of the attack table
+    73-108: many-hot encoding of the defend table
+    109-144: many-hot encoding of the graveyard
+    145-147: number of cards left in each player's hand
+    148: number of cards left in the deck
+    149: whether the game is done
 
     :param state: The state to convert.
     :return: A 1D array of the state.
     """
-    player_id = np.array([state.player_id])
-    hand_array = cards_to_input_array(state.hand)
-    attack_table_array = cards_to_input_array(state.attack_table)
-    defend_table_array = cards_to_input_array(state.defend_table)
-    graveyard_array = cards_to_input_array(state.graveyard)
-    opponents_cards_left_array = np.array(state.num_cards_in_hands)
-    cards_left_in_deck_array = np.array([state.num_cards_left_in_deck])
-    is_done = np.array([state.is_done])
-
-    return np.concatenate((
-        player_id,
-        hand_array,
-        attack_table_array,
-        defend_table_array,
-        graveyard_array,
-        opponents_cards_left_array,
-        cards_left_in_deck_array,
-        is_done,
-    ))
+    return encode_states([state])[0]
 
 
 class DQN(nn.Module):
@@ -97,13 +146,24 @@ class ExperienceReplay:
         self.terminal = np.zeros(memory_size, dtype=np.bool_)
 
     def add_experience(self, transition: GameTransition):
-        i = self.memory_counter % self.memory_size
-        self.states[i] = state_to_input_array(transition.state)
-        self.new_states[i] = state_to_input_array(transition.next_state)
-        self.actions[i] = transition.action
-        self.rewards[i] = transition.reward
-        self.terminal[i] = transition.next_state.is_done
-        self.memory_counter += 1
+        self.add_experiences([transition])
+
+    def add_experiences(self, transitions: Sequence[GameTransition]):
+        """
+        Adds a batch of transitions, encoding their states straight into the memory.
+        """
+        done = 0
+        while done < len(transitions):
+            i = self.memory_counter % self.memory_size
+            chunk = transitions[done:done + self.memory_size - i]
+            rows = slice(i, i + len(chunk))
+            encode_states([t.state for t in chunk], out=self.states[rows])
+            encode_states([t.next_state for t in chunk], out=self.new_states[rows])
+            self.actions[rows] = [t.action for t in chunk]
+            self.rewards[rows] = [t.reward for t in chunk]
+            self.terminal[rows] = [t.next_state.is_done for t in chunk]
+            self.memory_counter += len(chunk)
+            done += len(chunk)
 
     def save(self):
         np.savez_compressed("experience_replay.npz",
@@ -174,6 +234,7 @@ class DQAgent(nn.Module, DurakPlayer):
             else torch.device('cpu')
         self.prev_state = None
         self.prev_action = None
+        self._input_buffer = np.zeros((1, input_dim), dtype=np.float32)
         self.to(self.device)
 
     def forward(self, x):
@@ -196,11 +257,10 @@ class DQAgent(nn.Module, DurakPlayer):
                 ))
                 self.prev_state = transition.state
 
-    def choose_action(self, info_state, legal_actions):
-        state = info_state[-1]
+    def choose_action(self, state, legal_actions, full_state=None):
         if not self.training or np.random.random() > self.eps:
-            state_array = state_to_input_array(state)
-            state_tensor = torch.from_numpy(state_array).float().to(self.device)
+            encode_states([state], out=self._input_buffer)
+            state_tensor = torch.from_numpy(self._input_buffer[0]).to(self.device)
             q_values = self(state_tensor)  # Gets us all Q-values for even illegal actions
             q_values = q_values[legal_actions]  # Gets us Q-values for legal actions
             action_idx = torch.argmax(q_values).item()
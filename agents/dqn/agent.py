@@ -170,7 +170,8 @@ class DQNPlayer(DurakPlayer, nn.Module):
             return actions[torch.randint(len(actions), (1,)).item()]
 
         arr = torch.stack([torch.from_numpy(state.to_array()).to(torch.float) for state in full_state])
-        q_values = self.agent(arr.cuda())
+        with torch.no_grad():
+            q_values = self.agent(arr.to(next(self.parameters()).device))
         # we need to filter the q_values for only legal actions provided in the actions argument
         q_values = q_values[actions]
         return actions[q_values.argmax()]
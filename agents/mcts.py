@@ -1,21 +1,115 @@
-import copy
-from typing import List
+import queue
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from multiprocessing import Pool
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
 
 import numpy as np
 
 from agents.easy_agents import DurakPlayer, RandomPlayer
-from three_game.game_state import ObservableDurakGameState
-from three_game import DurakGame, DurakDeck
+from three_game.game import Card
+from three_game.game_state import DurakGameState, ObservableDurakGameState
+from three_game.history import GameCheckpoint
+from three_game import DurakGame, DurakAction
 
+NUM_CARDS = DurakAction.n(4)
+# Every card, indexed like DurakAction.ext_from_card
+ALL_CARDS = tuple(Card(*DurakAction.card_from_ext(ext)) for ext in range(NUM_CARDS))
+CARD_INDEX = {card: ext for ext, card in enumerate(ALL_CARDS)}
+def terminal_reward(state: ObservableDurakGameState) -> float:
+    return 1.0 if len(state.hand) == 0 else -1.0
 
-def simulate(state, action: int, ret_first_obs: bool = False):
-    game = random_game_from_observation_state(state)
-    game._do_step(state.player_id, action)
+
+def simulate(
+    state: ObservableDurakGameState,
+    action: int,
+    players: Optional[List[DurakPlayer]] = None,
+    ret_first_obs: bool = False,
+    np_rand=np.random,
+):
+    """
+    Plays action in a random determinization of state and rolls the game out with players.
+    Returns the reward of state.player_id. With ret_first_obs, also returns that player's observation
+    and legal actions the next time it is their turn (or at the end of the game).
+    """
+    player_id = state.player_id
+    game = random_game_from_observation_state(state, players, np_rand)
+    game._do_step(player_id, action)
+    while not game.is_done and game.player_taking_action != player_id:
+        game.step()
+    first_observation = game.get_observable_state(player_id)
+    first_actions = [] if game.is_done else game.get_legal_actions(player_id)
     while not game.is_done:
         game.step()
+    reward = game.get_rewards()[player_id]
     if ret_first_obs:
-        return observation.reward, first_observation
-    return observation.reward
+        return reward, first_observation, first_actions
+    return reward
+
+
+class RolloutResult(NamedTuple):
+    mean: float  # mean reward of the player over the continuations
+    variance: float  # variance of that reward
+    next_state: ObservableDurakGameState  # the player's next observation in the first continuation
+    next_actions: List[int]  # the player's legal actions at next_state
+
+
+def lockstep_rollout(
+    state: ObservableDurakGameState,
+    action: int,
+    k: int,
+    policy: Optional[Callable[[DurakGame, List[int], float], int]] = None,
+    np_rand=np.random,
+) -> RolloutResult:
+    """
+    Plays action in k independent determinizations of state and rolls them all out in lockstep. This is a
+    batched rollout over k DurakGames in Python, not an array engine: the games are still stepped one by one.
+    It saves over k calls of simulate because the determinizations are cloned from a single sampled game,
+    every ply draws the random numbers for all unfinished games at once, and actions go through
+    apply_legal_action, which skips the players, the legality re-check of step and the observations it builds.
+    :param policy: picks an action from (game, legal actions, uniform draw in [0, 1)), uniform by default.
+    """
+    player_id = state.player_id
+    games = random_games_from_observation_state(state, k, [], np_rand)
+    for game in games:
+        game.apply_legal_action(player_id, action)
+    first = games[0]
+    next_state = None
+    active = games
+    while active:
+        if next_state is None and (first.is_done or first.player_taking_action == player_id):
+            next_state = first.get_observable_state(player_id)
+            next_actions = [] if first.is_done else first.get_legal_actions(player_id)
+        active = [game for game in active if not game.is_done]
+        draws = np_rand.random_sample(len(active))
+        for game, draw in zip(active, draws):
+            acting = game.player_taking_action
+            actions = game.get_legal_actions(acting)
+            if policy is None:
+                chosen = actions[int(draw * len(actions))]
+            else:
+                chosen = policy(game, actions, draw)
+            game.apply_legal_action(acting, chosen)
+    rewards = np.array([game.get_rewards()[player_id] for game in games])
+    return RolloutResult(float(rewards.mean()), float(rewards.var()), next_state, next_actions)
+
+
+PHASES = ("selection", "expansion", "rollout", "backup")
+
+
+class SearchStats(NamedTuple):
+    simulations: int  # simulations completed
+    elapsed: float  # wall-clock seconds spent searching
+    # Seconds spent in each phase. Tree-parallel search sums the time of the rollouts running side by side,
+    # so there the phases can add up to more than elapsed
+    selection: float
+    expansion: float
+    rollout: float
+    backup: float
+    stopped_early: bool  # whether the search ended because the best action could no longer change
 
 
 class MCTSNode:
@@ -26,11 +120,13 @@ class MCTSNode:
                  parent: 'MCTSNode' = None):
         self.state = state
         self.parent = parent
+        self.action = None  # action leading here from parent
         self.actions = actions
         # Children are indexed by action id
         self.children = {}
         self.visits = 0 if parent is not None else 1
         self.value = 0
+        self.virtual_loss = 0  # simulations currently running through this node in tree-parallel search
 
     def is_leaf(self):
         return len(self.children) == 0
@@ -45,11 +141,20 @@ class MCTSNode:
         return self.value / self.visits
 
     def get_ucb(self, c=1.414):
+        if self.virtual_loss:
+            # Count every running simulation as a loss so that concurrent selections spread out
+            visits = self.visits + self.virtual_loss
+            parent_visits = self.parent.visits + self.parent.virtual_loss
+            value = (self.value - self.virtual_loss) / visits
+            return value + c * np.sqrt(np.log(parent_visits) / visits)
         return self.get_value() + c * np.sqrt(np.log(self.parent.visits) / (self.visits + 1e-6))
 
     def get_best_action(self):
         return max(self.children.items(), key=lambda x: x[1].get_value())[0]
 
+    def get_most_visited_action(self):
+        return max(self.children.items(), key=lambda x: x[1].visits)[0]
+
     def get_best_child(self):
         return max(self.children.values(), key=lambda x: x.get_ucb())
 
@@ -60,8 +165,17 @@ class MCTSNode:
         return self.children[action]
 
     def add_child(self, action, child):
+        child.action = action
         self.children[action] = child
 
+    def detach(self):
+        """
+        Makes this node a root, dropping it from its parent.
+        """
+        if self.parent is not None:
+            self.parent.children.pop(self.action, None)
+            self.parent = None
+
     def update(self, value):
         self.value += value
         self.visits += 1
@@ -70,17 +184,324 @@ class MCTSNode:
         return len(self.children) == len(self.actions)
 
 
+def estimate_node_bytes(node: MCTSNode) -> int:
+    """
+    Rough size of a node in bytes: the node with its containers and its observation. Cards are shared by every
+    observation of a game and not counted.
+    """
+    size = sys.getsizeof(node) + sys.getsizeof(node.__dict__) + sys.getsizeof(node.children)
+    if node.actions is not None:
+        size += sys.getsizeof(node.actions)
+    size += sys.getsizeof(node.state)
+    for field in node.state:
+        if isinstance(field, tuple) and not isinstance(field, Card):
+            size += sys.getsizeof(field)
+    return size
+
+
+class NodeCache:
+    """
+    Cache of MCTS nodes keyed by observation, holding nodes of at most max_bytes bytes in total, as estimated
+    by estimate_node_bytes. Nodes are added when they are created. Once the cache outgrows max_bytes it evicts
+    the least visited nodes, the least recently added or looked up first among equals, until it is back under
+    nine tenths of it. An evicted node is cut from its tree and its whole subtree leaves the cache with it, so
+    that nothing the cache dropped stays reachable through it.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.nodes: OrderedDict = OrderedDict()  # observation -> (node, estimated bytes)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, state: ObservableDurakGameState):
+        return state in self.nodes
+
+    def get(self, state: ObservableDurakGameState) -> Optional[MCTSNode]:
+        entry = self.nodes.get(state)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.nodes.move_to_end(state)
+        return entry[0]
+
+    def add(self, node: MCTSNode):
+        """
+        Adds a node, or marks it as recently used if it is already cached.
+        """
+        if node.state in self.nodes:
+            self.nodes.move_to_end(node.state)
+            return
+        size = estimate_node_bytes(node)
+        self.nodes[node.state] = (node, size)
+        self.bytes += size
+        if self.bytes > self.max_bytes:
+            self._evict(node)
+
+    def _evict(self, added: MCTSNode):
+        # Evicting in batches keeps the sort off the path of every single add. Sorting is stable, so the
+        # least recently used of equally visited nodes go first
+        candidates = sorted((entry[0] for entry in self.nodes.values()), key=lambda node: node.visits)
+        for evicted in candidates:
+            if self.bytes <= 0.9 * self.max_bytes:
+                break
+            if evicted is added or self.nodes.get(evicted.state, (None,))[0] is not evicted:
+                continue  # the node just added, or already dropped with the subtree of an earlier one
+            evicted.detach()
+            self.evictions += self.discard(evicted)
+
+    def discard(self, node: MCTSNode) -> int:
+        """
+        Drops node and its subtree from the cache, e.g. when a tree is no longer searched.
+        :return: the number of nodes dropped.
+        """
+        dropped = 0
+        nodes = [node]
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.children.values())
+            entry = self.nodes.get(node.state)
+            if entry is not None and entry[0] is node:
+                del self.nodes[node.state]
+                self.bytes -= entry[1]
+                dropped += 1
+        return dropped
+
+    def clear(self):
+        self.nodes.clear()
+        self.bytes = 0
+
+
+class ArrayTree:
+    """
+    MCTS tree stored as a struct of arrays in a preallocated pool, indexed by node. Node 0 is the root.
+    A node is expanded as soon as its state is known, and its children take up the contiguous block
+    first_child:first_child + num_children with one child per legal action. A child has been reached by a
+    rollout once its visits are non-zero, which is when its own state and children are filled in. The pool
+    doubles when it runs out and is reused by reset.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        self.capacity = 0
+        self.size = 0
+        self.visits = np.zeros(0, dtype=np.int64)
+        self.value = np.zeros(0, dtype=np.float64)
+        self.parent = np.zeros(0, dtype=np.int32)
+        self.action = np.zeros(0, dtype=np.int32)  # action leading to the node from its parent
+        self.first_child = np.zeros(0, dtype=np.int32)
+        self.num_children = np.zeros(0, dtype=np.int32)
+        self.states: List[Optional[ObservableDurakGameState]] = []
+        self._grow(capacity)
+
+    def _grow(self, capacity: int):
+        extra = capacity - self.capacity
+        self.visits = np.concatenate([self.visits, np.zeros(extra, dtype=np.int64)])
+        self.value = np.concatenate([self.value, np.zeros(extra, dtype=np.float64)])
+        self.parent = np.concatenate([self.parent, np.full(extra, -1, dtype=np.int32)])
+        self.action = np.concatenate([self.action, np.full(extra, -1, dtype=np.int32)])
+        self.first_child = np.concatenate([self.first_child, np.full(extra, -1, dtype=np.int32)])
+        self.num_children = np.concatenate([self.num_children, np.zeros(extra, dtype=np.int32)])
+        self.states.extend([None] * extra)
+        self.capacity = capacity
+
+    def _allocate(self, n: int) -> int:
+        if self.size + n > self.capacity:
+            self._grow(max(2 * self.capacity, self.size + n))
+        start = self.size
+        self.size += n
+        return start
+
+    def reset(self, state: ObservableDurakGameState, actions: List[int]):
+        """
+        Clears the pool and starts a new tree rooted at state.
+        """
+        used = slice(0, self.size)
+        self.visits[used] = 0
+        self.value[used] = 0
+        self.parent[used] = -1
+        self.action[used] = -1
+        self.first_child[used] = -1
+        self.num_children[used] = 0
+        self.states[:self.size] = [None] * self.size
+        self.size = 0
+        self._allocate(1)
+        self.expand(0, state, actions)
+
+    def expand(self, node: int, state: ObservableDurakGameState, actions: List[int]):
+        self.states[node] = state
+        n = len(actions)
+        if not n:
+            return
+        start = self._allocate(n)
+        children = slice(start, start + n)
+        self.parent[children] = node
+        self.action[children] = actions
+        self.first_child[node] = start
+        self.num_children[node] = n
+
+    def children(self, node: int) -> slice:
+        start = self.first_child[node]
+        return slice(start, start + self.num_children[node])
+
+    def is_terminal(self, node: int) -> bool:
+        return self.states[node].is_done
+
+    def select_leaf(self, c: float = 1.414) -> int:
+        """
+        Descends from the root through fully visited nodes by UCB, computed for all children of a node in one
+        expression, and returns the first node with an unvisited child or no children.
+        """
+        node = 0
+        while self.num_children[node]:
+            children = self.children(node)
+            visits = self.visits[children]
+            if not visits.all():
+                break
+            ucb = self.value[children] / visits + c * np.sqrt(np.log(self.visits[node]) / visits)
+            node = children.start + int(np.argmax(ucb))
+        return node
+
+    def backpropagate(self, node: int, reward: float):
+        while node >= 0:
+            self.visits[node] += 1
+            self.value[node] += reward
+            node = self.parent[node]
+
+    def child_visits(self, node: int = 0) -> np.ndarray:
+        return self.visits[self.children(node)]
+
+    def best_action(self, node: int = 0) -> int:
+        """
+        The visited child action with the highest mean value.
+        """
+        children = self.children(node)
+        visits = self.visits[children]
+        values = np.where(visits > 0, self.value[children] / np.maximum(visits, 1), -np.inf)
+        return int(self.action[children.start + int(np.argmax(values))])
+
+    def most_visited_action(self, node: int = 0) -> int:
+        children = self.children(node)
+        return int(self.action[children.start + int(np.argmax(self.visits[children]))])
+
+
+class ISMCTSNode:
+    """
+    Node of an information-set tree. Nodes are reached by the player's own actions only and are shared
+    by every determinization in which those actions are legal, so each child also counts how often it
+    was available for selection.
+    """
+
+    def __init__(self, action: Optional[int] = None, parent: 'ISMCTSNode' = None):
+        self.action = action
+        self.parent = parent
+        # Children are indexed by action id
+        self.children = {}
+        self.visits = 0
+        self.value = 0.0
+        self.avails = 1
+
+    def get_ucb(self, c=1.414):
+        return self.value / self.visits + c * np.sqrt(np.log(self.avails) / self.visits)
+
+    def add_child(self, action: int) -> 'ISMCTSNode':
+        child = ISMCTSNode(action, self)
+        self.children[action] = child
+        return child
+
+    def update(self, value):
+        self.value += value
+        self.visits += 1
+
+
 class MCTSPlayer(DurakPlayer):
     """
     Monte-Carlo Tree-search player that guesses the best move based on
     randomized rollouts of the three_game. To do so, it must reconstruct a random three_game
     from the observational state and run many randomized rollouts for each possible
     action, picking the one with the best randomized rollouts in terms of expectation.
+
+    With information_set=True the player runs information-set MCTS instead, sampling a new
+    determinization on every simulation. num_workers > 1 spreads independent searches over a process pool,
+    each with the full num_simulations (and time_budget in seconds, if given), and merges their root
+    statistics.
+
+    With num_threads > 1 a single tree is searched with that many rollouts in flight instead, whose leaves are
+    steered apart by virtual loss, see tree_parallel_search. The rollouts run in the process pool when
+    num_workers > 1. The time_budget then bounds the search as well, but it does not stop early.
+
+    With array_tree=True the sequential search keeps its tree in an ArrayTree, which is rebuilt for every
+    move instead of going through the node cache.
+
+    With rollouts_per_leaf > 1 every expansion is valued by the mean of that many lockstep rollouts, see
+    lockstep_rollout.
+
+    After each move the tree is re-rooted at the child of the action played, so the next search starts from
+    its statistics when the opponents answered the way that child saw. Failing that, nodes are looked up by
+    observation in an LRU cache of an estimated max_cache_bytes bytes, which outlives games.
+
+    Given a time_budget in seconds the sequential search runs in anytime mode: it searches until the
+    deadline (num_simulations, which may then be None, only acts as a cap), stops early once the most
+    visited action can no longer be overtaken and plays the most visited action. Statistics of the last
+    search are kept in last_search_stats.
     """
-    def __init__(self, player_id: int, hand: List[tuple], num_simulations: int = 25):
-        super().__init__(player_id, hand)
+    def __init__(
+        self,
+        player_id: int,
+        num_simulations: Optional[int] = 25,
+        information_set: bool = False,
+        num_workers: int = 1,
+        time_budget: Optional[float] = None,
+        max_cache_bytes: int = 64 * 2 ** 20,
+        num_threads: int = 1,
+        rollouts_per_leaf: int = 1,
+        array_tree: bool = False,
+    ):
+        super().__init__(player_id)
         self.num_simulations = num_simulations
-        self.node_cache = {}
+        self.information_set = information_set
+        self.num_workers = num_workers
+        self.time_budget = time_budget
+        self.num_threads = num_threads
+        self.rollouts_per_leaf = rollouts_per_leaf
+        self.array_tree = array_tree
+        self._array_tree: Optional[ArrayTree] = None
+        self.node_cache = NodeCache(max_cache_bytes)
+        self._root: Optional[MCTSNode] = None  # root of the last search, with the action played from it
+        self._played: Optional[int] = None
+        self.reroots = 0  # searches that started from the child of the previous move
+        self.rollout_players: Optional[List[DurakPlayer]] = None  # shared by every simulated game
+        self._pool: Optional[Pool] = None
+        self._phase_times = dict.fromkeys(PHASES, 0.0)
+        self.last_search_stats: Optional[SearchStats] = None
+
+    def __getstate__(self):
+        # Process pools cannot be copied or pickled, a copy starts its own pool when it needs one
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        return state
+
+    def close(self):
+        """
+        Shuts down the worker pool, if any.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    @staticmethod
+    def make_rollout_players(num_players: int, np_rand=np.random) -> List[DurakPlayer]:
+        # Seeded from np_rand so that seeding it makes the search reproducible
+        players = [RandomPlayer(i) for i in range(num_players)]
+        for player in players:
+            player.np_random = np.random.RandomState(np_rand.randint(2 ** 31))
+        return players
 
     @staticmethod
     def get_rollout_node(root: MCTSNode) -> MCTSNode:
@@ -92,45 +513,132 @@ class MCTSPlayer(DurakPlayer):
                 return node
         return node
 
-    @staticmethod
-    def rollout(node: MCTSNode) -> MCTSNode:
+    def rollout(self, node: MCTSNode) -> MCTSNode:
+        times = self._phase_times
+        start = time.perf_counter()
+        if node.is_terminal():
+            self.backpropagate(node, terminal_reward(node.state))
+            times["backup"] += time.perf_counter() - start
+            return node
         state = node.state
+        if self.rollout_players is None:
+            self.rollout_players = self.make_rollout_players(len(state.num_cards_in_hands))
         action = np.random.choice(node.actions)
-        reward, obs = simulate(state, action, ret_first_obs=True)
+        if self.rollouts_per_leaf > 1:
+            reward, _, next_state, next_actions = lockstep_rollout(state, action, self.rollouts_per_leaf)
+        else:
+            reward, next_state, next_actions = simulate(state, action, self.rollout_players, ret_first_obs=True)
+        rolled_out = time.perf_counter()
         if action not in node.children:
-            next_rand_game = random_game_from_observation_state(copy.deepcopy(obs.next_state))
-            next_actions = next_rand_game.get_legal_actions(obs.next_state.player_id)
-            node.add_child(action, MCTSNode(obs.next_state, next_actions, node))
-        update_node = node.get_child(action)
-        while not update_node.is_root():
-            update_node.update(reward)
-            update_node = update_node.parent
+            child = MCTSNode(next_state, next_actions, node)
+            node.add_child(action, child)
+            self.node_cache.add(child)
+        expanded = time.perf_counter()
+        self.backpropagate(node.get_child(action), reward)
+        times["rollout"] += rolled_out - start
+        times["expansion"] += expanded - rolled_out
+        times["backup"] += time.perf_counter() - expanded
         return node.get_child(action)
 
-    def get_node(self, state: ObservableDurakGameState) -> MCTSNode:
-        if state in self.node_cache:
-            return self.node_cache[state]
-        rand_game = random_game_from_observation_state(copy.deepcopy(state))
-        actions = rand_game.get_legal_actions(self.player_id)
-        node = MCTSNode(state, actions)
-        self.node_cache[state] = node
+    def array_rollout(self, tree: ArrayTree, node: int):
+        """
+        Same as rollout, for a node of an ArrayTree.
+        """
+        times = self._phase_times
+        start = time.perf_counter()
+        if tree.is_terminal(node):
+            tree.backpropagate(node, terminal_reward(tree.states[node]))
+            times["backup"] += time.perf_counter() - start
+            return
+        state = tree.states[node]
+        if self.rollout_players is None:
+            self.rollout_players = self.make_rollout_players(len(state.num_cards_in_hands))
+        children = tree.children(node)
+        child = children.start + np.random.randint(children.stop - children.start)
+        action = int(tree.action[child])
+        if self.rollouts_per_leaf > 1:
+            reward, _, next_state, next_actions = lockstep_rollout(state, action, self.rollouts_per_leaf)
+        else:
+            reward, next_state, next_actions = simulate(state, action, self.rollout_players, ret_first_obs=True)
+        rolled_out = time.perf_counter()
+        if not tree.visits[child]:
+            tree.expand(child, next_state, next_actions)
+        expanded = time.perf_counter()
+        tree.backpropagate(child, reward)
+        times["rollout"] += rolled_out - start
+        times["expansion"] += expanded - rolled_out
+        times["backup"] += time.perf_counter() - expanded
+
+    def backpropagate(self, node: MCTSNode, reward: float):
+        while node is not None:
+            node.update(reward)
+            node = node.parent
+
+    def get_node(self, state: ObservableDurakGameState, actions: List[int]) -> MCTSNode:
+        """
+        Returns the root for a search from state. That is the child of the previous root for the action
+        played, if it saw the same observation, and otherwise the node cached for state or a new one. The
+        subtree of the new root, and the statistics in it, carry over, while the previous root and the rest of
+        its tree are dropped.
+        """
+        previous, self._root = self._root, None
+        node = None
+        if previous is not None:
+            child = previous.children.get(self._played)
+            if child is not None and child.state == state:
+                node = child
+                self.reroots += 1
+        if node is None:
+            node = self.node_cache.get(state)
+        if node is not None:
+            node.detach()
+        else:
+            node = MCTSNode(state, list(actions))
+        if previous is not None and previous is not node:
+            self.node_cache.discard(previous)
+        self.node_cache.add(node)
         return node
 
-    def choose_action(self, state: ObservableDurakGameState, actions: List[int]):
+    def _played_from(self, root: MCTSNode, action: int) -> int:
+        self._root, self._played = root, action
+        return action
+
+    def choose_action(
+        self,
+        state: ObservableDurakGameState,
+        actions: List[int],
+        full_state: List[ObservableDurakGameState] = None,
+    ):
         """
         Chooses an action based on the state and possible actions.
         :param state: The state of the three_game.
         :param actions: The possible actions.
+        :param full_state: The player's observations so far, unused.
         :return: The chosen action.
         """
         if len(actions) == 1:
+            if self._root is not None:
+                # Follow the tree through forced moves, so that it can still be re-rooted after them
+                return self._played_from(self.get_node(state, actions), actions[0])
             return actions[0]
-        root = self.get_node(state)
-        for i in range(self.num_simulations):
-            node = self.get_rollout_node(root)
-            child_node = self.rollout(node)
-            self.add_node_to_cache(node)
-            self.add_node_to_cache(child_node)
+        if self.information_set:
+            return self.choose_information_set_action(state)
+        if self.array_tree:
+            if self._array_tree is None:
+                self._array_tree = ArrayTree()
+            tree = self._array_tree
+            tree.reset(state, list(actions))
+            self.last_search_stats = self.search(tree)
+            if self.time_budget is not None:
+                return tree.most_visited_action()
+            return tree.best_action()
+        root = self.get_node(state, actions)
+        if self.num_threads > 1:
+            self.last_search_stats = self.tree_parallel_search(root)
+        else:
+            self.last_search_stats = self.search(root)
+        if self.time_budget is not None:
+            return self._played_from(root, root.get_most_visited_action())
         """
         sim_scores = np.zeros(len(actions))
         sim_counts = np.zeros(len(actions))
@@ -141,47 +649,249 @@ class MCTSPlayer(DurakPlayer):
         sim_scores /= (sim_counts+1e-6)
         return actions[np.argmax(sim_scores)]
         """
-        return root.get_best_action()
+        return self._played_from(root, root.get_best_action())
+
+    def search(self, root: Union[MCTSNode, ArrayTree]) -> SearchStats:
+        """
+        Runs simulations from root, or the root of an ArrayTree, until num_simulations are done or, in
+        anytime mode, until the deadline passes or the search is decided. The deadline is only checked
+        after the first simulation, so that the root always has a child to choose.
+        """
+        array = isinstance(root, ArrayTree)
+        if self.num_simulations is None and self.time_budget is None:
+            raise ValueError("Either num_simulations or time_budget must be given")
+        self._phase_times = times = dict.fromkeys(PHASES, 0.0)
+        start = time.perf_counter()
+        deadline = None if self.time_budget is None else start + self.time_budget
+        simulations = 0
+        stopped_early = False
+        while self.num_simulations is None or simulations < self.num_simulations:
+            now = time.perf_counter()
+            if deadline is not None and simulations:
+                if now >= deadline:
+                    break
+                if self.is_decided(root, simulations, now - start, deadline - now):
+                    stopped_early = True
+                    break
+            node = root.select_leaf() if array else self.get_rollout_node(root)
+            times["selection"] += time.perf_counter() - now
+            if array:
+                self.array_rollout(root, node)
+            else:
+                self.rollout(node)
+            simulations += 1
+        return SearchStats(simulations, time.perf_counter() - start, stopped_early=stopped_early, **times)
 
-    def add_node_to_cache(self, node: MCTSNode):
-        if node.state not in self.node_cache:
-            self.node_cache[node.state] = node
+    def is_decided(
+        self, root: Union[MCTSNode, ArrayTree], simulations: int, elapsed: float, time_left: float
+    ) -> bool:
+        """
+        Whether the most visited root action leads the runner-up by more visits than the simulations that
+        still fit in the search, estimated from the rate so far.
+        """
+        if not simulations:
+            return False
+        remaining = time_left * simulations / elapsed
+        if self.num_simulations is not None:
+            remaining = min(remaining, self.num_simulations - simulations)
+        if isinstance(root, ArrayTree):
+            visits = sorted(root.child_visits().tolist(), reverse=True)
+        else:
+            visits = sorted((child.visits for child in root.children.values()), reverse=True)
+            if len(root.children) < len(root.actions):
+                visits.append(0)
+        visits += [0, 0]
+        return visits[0] - visits[1] > remaining
 
+    def tree_parallel_search(self, root: MCTSNode) -> SearchStats:
+        """
+        Runs simulations from root with num_threads rollouts in flight, until num_simulations are done or
+        time_budget seconds have passed, whichever comes first. Selection, expansion and backup all happen in
+        this thread: as soon as a rollout comes back it is backed up and the next leaf is selected, steered
+        away from the leaves still being rolled out by their virtual loss. Rollouts run in the process pool
+        when num_workers > 1 and in a thread pool otherwise, where they only overlap as far as they release
+        the GIL. The deadline is only checked after the first simulation, as in search.
+        """
+        if self.num_simulations is None and self.time_budget is None:
+            raise ValueError("Either num_simulations or time_budget must be given")
+        if self.num_workers > 1 and self._pool is None:
+            self._pool = Pool(self.num_workers)
+        times = dict.fromkeys(PHASES, 0.0)
+        start = time.perf_counter()
+        deadline = None if self.time_budget is None else start + self.time_budget
+        # (path, action, result or exception) of every finished rollout
+        finished = queue.SimpleQueue()
+        started = simulations = running = 0
+        with ThreadPoolExecutor(self.num_threads) as threads:
+            while True:
+                while running < self.num_threads and (
+                    self.num_simulations is None or started < self.num_simulations
+                ) and (deadline is None or not started or time.perf_counter() < deadline):
+                    started += 1
+                    now = time.perf_counter()
+                    path = self._select_virtual_loss_path(root)
+                    times["selection"] += time.perf_counter() - now
+                    node = path[-1]
+                    if node.is_terminal():
+                        now = time.perf_counter()
+                        self._parallel_backup(path, None, terminal_reward(node.state))
+                        times["backup"] += time.perf_counter() - now
+                        simulations += 1
+                        continue
+                    seed = np.random.randint(2 ** 31)
+                    action = node.actions[np.random.RandomState(seed).randint(len(node.actions))]
+                    self._start_rollout(threads, (node.state, action, seed), path, action, finished)
+                    running += 1
+                if not running:
+                    break
+                path, action, result = finished.get()
+                running -= 1
+                if isinstance(result, BaseException):
+                    raise result
+                (reward, next_state, next_actions), seconds = result
+                times["rollout"] += seconds
+                now = time.perf_counter()
+                node = path[-1]
+                if action not in node.children:
+                    child = MCTSNode(next_state, next_actions, node)
+                    node.add_child(action, child)
+                    self.node_cache.add(child)
+                expanded = time.perf_counter()
+                self._parallel_backup(path, node.get_child(action), reward)
+                times["expansion"] += expanded - now
+                times["backup"] += time.perf_counter() - expanded
+                simulations += 1
+        return SearchStats(simulations, time.perf_counter() - start, stopped_early=False, **times)
 
-def shuffle_for_random_deck(deck, visible_card):
-    if len(deck):
-        deck.remove(visible_card)
-        np.random.shuffle(deck)
-        deck.insert(0, visible_card)
-    return deck
+    @staticmethod
+    def _select_virtual_loss_path(root: MCTSNode) -> List[MCTSNode]:
+        # Selection, adding a virtual loss to every node on the way
+        path = [root]
+        root.virtual_loss += 1
+        node = root
+        while not node.is_leaf() and node.fully_expanded():
+            node = node.get_best_child()
+            node.virtual_loss += 1
+            path.append(node)
+        return path
 
+    def _start_rollout(self, threads: ThreadPoolExecutor, job, path: List[MCTSNode], action: int, finished):
+        if self._pool is not None:
+            self._pool.apply_async(
+                _timed_simulate_job,
+                (job,),
+                callback=lambda result: finished.put((path, action, result)),
+                error_callback=lambda error: finished.put((path, action, error)),
+            )
+            return
+        future = threads.submit(_timed_simulate_job, job)
+        future.add_done_callback(
+            lambda future: finished.put((path, action, future.exception() or future.result()))
+        )
+
+    @staticmethod
+    def _parallel_backup(path: List[MCTSNode], child: Optional[MCTSNode], reward: float):
+        if child is not None:
+            child.update(reward)
+        for node in path:
+            node.virtual_loss -= 1
+            node.update(reward)
 
-def get_deck_and_hands_from_state(state: ObservableDurakGameState):
+    def choose_information_set_action(self, state: ObservableDurakGameState) -> int:
+        """
+        Runs one information-set search per worker and picks the action visited most over all of them.
+        """
+        start = time.perf_counter()
+        seeds = np.random.randint(2 ** 31, size=self.num_workers)
+        jobs = [(state, self.num_simulations, self.time_budget, int(seed)) for seed in seeds]
+        if self.num_workers > 1:
+            if self._pool is None:
+                self._pool = Pool(self.num_workers)
+            results = self._pool.map(_information_set_search_job, jobs)
+        else:
+            results = [_information_set_search_job(job) for job in jobs]
+        stats = merge_root_statistics(results)
+        self.last_search_stats = SearchStats(
+            sum(visits for visits, _ in stats.values()), time.perf_counter() - start, 0.0, 0.0, 0.0, 0.0, False
+        )
+        return max(stats, key=lambda action: stats[action][0])
+
+
+def unseen_cards(state: ObservableDurakGameState) -> np.ndarray:
     """
-    Get randomized deck and hands from observable state
+    Returns the indices into ALL_CARDS of the cards hidden from state.player_id, i.e. the deck below the
+    visible card and the opponents' hands.
     """
+    unseen = np.ones(NUM_CARDS, dtype=bool)
+    unseen[[CARD_INDEX[card] for card in chain(
+        state.hand, state.attack_table, state.defend_table, state.graveyard
+    )]] = False
+    if state.num_cards_left_in_deck:
+        unseen[CARD_INDEX[state.visible_card]] = False
+    return np.flatnonzero(unseen)
+
+
+def _deal_unseen(state: ObservableDurakGameState, unseen: np.ndarray, np_rand) -> Tuple[List[list], list]:
+    """
+    Shuffles the unseen cards into the opponents' hands and the deck, returning every hand and the deck.
+    """
+    unseen = unseen.copy()
+    np_rand.shuffle(unseen)
     hands = []
-    deck = DurakDeck(6, np.random.RandomState())
-    for card in state.graveyard:
-        deck.deck.remove(card)
-    for card in state.hand:
-        deck.deck.remove(card)
-    for card in state.attack_table:
-        deck.deck.remove(card)
-    for card in state.defend_table:
-        deck.deck.remove(card)
-    for i in range(len(state.num_cards_in_hands)):
-        if i == state.player_id:
+    start = 0
+    for player_id, num_cards in enumerate(state.num_cards_in_hands):
+        if player_id == state.player_id:
             hands.append(list(state.hand))
             continue
-        hand = []
-        for _ in range(state.num_cards_in_hands[i]):
-            hand.append(deck.deck.pop())
-        hands.append(hand)
-    return deck, hands
+        hands.append([ALL_CARDS[i] for i in unseen[start:start + num_cards]])
+        start += num_cards
+    deck = [ALL_CARDS[i] for i in unseen[start:]]
+    if state.num_cards_left_in_deck:
+        # The visible card is always at the bottom of the deck, i.e. drawn last
+        deck.insert(0, state.visible_card)
+    return hands, deck
+
+
+def determinize(state: ObservableDurakGameState, np_rand=np.random) -> GameCheckpoint:
+    """
+    Samples a full game state consistent with an observation: public knowledge (table, graveyard, visible
+    card) and the player's own hand are kept, and the unseen cards are shuffled into the opponents' hands
+    and the deck.
+    """
+    hands, deck = _deal_unseen(state, unseen_cards(state), np_rand)
+    if state.num_cards_left_in_deck:
+        in_players = tuple(range(len(hands)))
+    else:
+        # The engine only drops players at the end of a round, so anyone taking part in the current round
+        # is still in even if their hand is empty
+        in_players = tuple(
+            i for i, num_cards in enumerate(state.num_cards_in_hands)
+            if num_cards or i == state.defender or i in state.attackers
+        )
+    game_state = DurakGameState(
+        np_rand=None,
+        defender_has_taken=state.defender_has_taken,
+        deck=tuple(deck),
+        visible_card=state.visible_card,
+        attackers=tuple(state.attackers),
+        defender=state.defender,
+        player_hands=tuple(tuple(hand) for hand in hands),
+        attack_table=tuple(state.attack_table),
+        defend_table=tuple(state.defend_table),
+        stopped_attacking=tuple(state.stopped_attacking),
+        player_taking_action=state.acting_player,
+        graveyard=tuple(state.graveyard),
+        is_done=state.is_done,
+        round_over=False,
+    )
+    return GameCheckpoint(game_state, in_players)
 
 
-def random_game_from_observation_state(state: ObservableDurakGameState) -> DurakGame:
+def random_game_from_observation_state(
+    state: ObservableDurakGameState,
+    players: Optional[List[DurakPlayer]] = None,
+    np_rand=np.random,
+) -> DurakGame:
     """
     Create a three_game from an observable state of the three_game according to a player's
     perspective. This will be helpful for MCTS agent. The idea here is public
@@ -189,31 +899,126 @@ def random_game_from_observation_state(state: ObservableDurakGameState) -> Durak
     card) and private knowledge to the player must be the same (hand, number of
     cards in other players' hands). The deck and the other players' hands will be
     randomized.
+    The game is built directly from the sampled state, without dealing, and has no history. players
+    default to fresh RandomPlayers, pass them in to share them between games.
     """
-    game = DurakGame()
-    game.configure({
-        'game_num_players': len(state.num_cards_in_hands),
-        'lowest_card': state.lowest_rank,
-        'agents': [RandomPlayer for _ in range(len(state.num_cards_in_hands))],
-    })
-    game.init_game()
-    deck, hands = get_deck_and_hands_from_state(state)
-
-    for i, hand in enumerate(hands):
-        game.players[i].hand = hand
-
-    # State management
-    game.attack_table = list(state.attack_table)
-    game.defend_table = list(state.defend_table)
-    game.graveyard = list(state.graveyard)
-    game.visible_card = state.visible_card
-    game.attackers = list(state.attackers)
-    game.defender = state.defender
-    game.player_taking_action = state.acting_player
-    game.defender_has_taken = state.defender_has_taken
-    game.stopped_attacking = list(state.stopped_attacking)
-
-    # Replace deck
-    game.deck = deck
-
+    num_players = len(state.num_cards_in_hands)
+    game = DurakGame.from_checkpoint(determinize(state, np_rand), num_players, DurakAction.lowest_card)
+    game.np_random = np_rand
+    game.players = players if players is not None else [RandomPlayer(i) for i in range(num_players)]
     return game
+
+
+def random_games_from_observation_state(
+    state: ObservableDurakGameState,
+    k: int,
+    players: Optional[List[DurakPlayer]] = None,
+    np_rand=np.random,
+) -> List[DurakGame]:
+    """
+    Creates k independent determinizations of state, see random_game_from_observation_state. Only the first
+    game is built from a sampled checkpoint, the others are clones of it with the hidden cards dealt again,
+    since the public part of the state is the same in all of them.
+    """
+    first = random_game_from_observation_state(state, players, np_rand)
+    games = [first]
+    unseen = unseen_cards(state)
+    for _ in range(k - 1):
+        game = first.clone()
+        game.player_hands, game.deck.deck = _deal_unseen(state, unseen, np_rand)
+        games.append(game)
+    return games
+
+
+def information_set_search(
+    state: ObservableDurakGameState,
+    num_simulations: Optional[int] = None,
+    time_budget: Optional[float] = None,
+    seed: Optional[int] = None,
+    c: float = 1.414,
+) -> Dict[int, Tuple[int, float]]:
+    """
+    Single-observer information-set MCTS from the point of view of state.player_id, who must be the one
+    acting. Every simulation samples a fresh determinization of state and only descends through actions
+    that are legal in it. Runs until num_simulations simulations are done or time_budget seconds have
+    passed, whichever comes first, but always runs at least one simulation so that the root has a child.
+    :return: visits and total value of each root action.
+    """
+    if num_simulations is None and time_budget is None:
+        raise ValueError("Either num_simulations or time_budget must be given")
+    np_rand = np.random.RandomState(seed)
+    players = MCTSPlayer.make_rollout_players(len(state.num_cards_in_hands), np_rand)
+    root = ISMCTSNode()
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    simulations = 0
+    while num_simulations is None or simulations < num_simulations:
+        if deadline is not None and simulations and time.perf_counter() >= deadline:
+            break
+        _information_set_simulation(root, state, players, np_rand, c)
+        simulations += 1
+    return {action: (child.visits, child.value) for action, child in root.children.items()}
+
+
+def _information_set_simulation(
+    root: ISMCTSNode,
+    state: ObservableDurakGameState,
+    players: List[DurakPlayer],
+    np_rand,
+    c: float,
+):
+    player_id = state.player_id
+    game = random_game_from_observation_state(state, players, np_rand)
+    node = root
+    # Selection and expansion of a single new node, the rest of the game is a random rollout
+    while not game.is_done:
+        actions = game.get_legal_actions(player_id)
+        # Every child compatible with this determinization was available, whether or not one is expanded
+        children = [node.children[action] for action in actions if action in node.children]
+        for child in children:
+            child.avails += 1
+        untried = [action for action in actions if action not in node.children]
+        if untried:
+            node = node.add_child(untried[np_rand.randint(len(untried))])
+        else:
+            node = max(children, key=lambda child: child.get_ucb(c))
+        game.apply_legal_action(player_id, node.action)
+        while not game.is_done and game.player_taking_action != player_id:
+            game.step()
+        if untried:
+            break
+    while not game.is_done:
+        game.step()
+    reward = game.get_rewards()[player_id]
+    while node is not None:
+        node.update(reward)
+        node = node.parent
+
+
+def _simulate_job(job):
+    state, action, seed = job
+    np_rand = np.random.RandomState(seed)
+    players = MCTSPlayer.make_rollout_players(len(state.num_cards_in_hands), np_rand)
+    return simulate(state, action, players, ret_first_obs=True, np_rand=np_rand)
+
+
+def _timed_simulate_job(job):
+    start = time.perf_counter()
+    result = _simulate_job(job)
+    return result, time.perf_counter() - start
+
+
+def _information_set_search_job(job) -> Dict[int, Tuple[int, float]]:
+    state, num_simulations, time_budget, seed = job
+    return information_set_search(state, num_simulations, time_budget, seed)
+
+
+def merge_root_statistics(results: Iterable[Dict[int, Tuple[int, float]]]) -> Dict[int, Tuple[int, float]]:
+    """
+    Sums visits and values per root action over independent searches.
+    """
+    merged = {}
+    for result in results:
+        for action, (visits, value) in result.items():
+            total_visits, total_value = merged.get(action, (0, 0.0))
+            merged[action] = (total_visits + visits, total_value + value)
+    return merged
@@ -0,0 +1,282 @@
+"""
+PUCT search guided by a network instead of random rollouts. The network scores the legal actions of a leaf
+(the priors) and gives the leaf a value, so a simulation ends as soon as it reaches a node it has not
+expanded yet. Leaves are not evaluated one by one: simulations queue them in a LeafQueue and stop there,
+and the queue evaluates every pending leaf, possibly from the searches of many concurrent games, in a
+single forward pass.
+
+Like the information-set mode of agents.mcts, every simulation samples a determinization of the root
+observation and the tree only holds the searching player's own decisions; opponents move with random
+players in between.
+"""
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from torch import nn
+
+from three_game import ObservableDurakGameState
+from .dql import DQN, encode_states
+from .easy_agents import DurakPlayer
+from .mcts import MCTSPlayer, random_game_from_observation_state
+
+# Maps a batch of leaf observations and their legal actions to priors over those actions and values
+Evaluator = Callable[
+    [Sequence[ObservableDurakGameState], Sequence[List[int]]],
+    Tuple[List[np.ndarray], np.ndarray]
+]
+
+
+class NetworkEvaluator:
+    """
+    Evaluates leaves with a network over encode_states inputs. The network may return per-action scores,
+    in which case the priors are the softmax of the legal scores and the value is the best legal score
+    squashed into the [-1, 1] range of the game rewards with tanh, or a (scores, values) tuple with a value
+    head of its own, whose values are clipped to [-1, 1].
+    agents.dql.DQN ends in a softmax over all actions, which would turn its scores into probabilities, so
+    its scores are the logits before the softmax.
+    """
+
+    def __init__(self, network: nn.Module, device: Optional[torch.device] = None, temperature: float = 1.0):
+        self.network = network
+        self.device = device if device is not None else next(network.parameters()).device
+        self.temperature = temperature
+        self.forward_passes = 0
+
+    def __call__(
+        self,
+        states: Sequence[ObservableDurakGameState],
+        actions: Sequence[List[int]],
+    ) -> Tuple[List[np.ndarray], np.ndarray]:
+        inputs = torch.from_numpy(encode_states(states)).to(self.device)
+        with torch.no_grad():
+            output = self._forward(inputs)
+        self.forward_passes += 1
+        if isinstance(output, tuple):
+            scores, values = output
+            values = values.reshape(-1).cpu().numpy()
+        else:
+            scores, values = output, None
+        scores = scores.cpu().numpy()
+        priors = []
+        best = np.empty(len(states))
+        for i, legal in enumerate(actions):
+            legal_scores = scores[i, legal]
+            prior = np.exp((legal_scores - legal_scores.max()) / self.temperature)
+            priors.append(prior / prior.sum())
+            best[i] = legal_scores.max()
+        if values is None:
+            return priors, np.tanh(best)
+        return priors, np.clip(values, -1.0, 1.0)
+
+    def _forward(self, inputs: torch.Tensor):
+        network = self.network
+        if isinstance(network, DQN):
+            return network.out(network.ff(inputs))
+        return network(inputs)
+
+
+class LeafQueue:
+    """
+    Collects leaves waiting for evaluation together with a callback taking their priors and value, and
+    evaluates all of them at once on flush.
+    """
+
+    def __init__(self, evaluator: Evaluator):
+        self.evaluator = evaluator
+        self.states: List[ObservableDurakGameState] = []
+        self.actions: List[List[int]] = []
+        self.callbacks: List[Callable[[np.ndarray, float], None]] = []
+
+    def __len__(self):
+        return len(self.states)
+
+    def add(
+        self,
+        state: ObservableDurakGameState,
+        actions: List[int],
+        callback: Callable[[np.ndarray, float], None],
+    ):
+        self.states.append(state)
+        self.actions.append(actions)
+        self.callbacks.append(callback)
+
+    def flush(self):
+        if not self.states:
+            return
+        states, actions, callbacks = self.states, self.actions, self.callbacks
+        self.states, self.actions, self.callbacks = [], [], []
+        priors, values = self.evaluator(states, actions)
+        for callback, prior, value in zip(callbacks, priors, values):
+            callback(prior, float(value))
+
+
+class PUCTNode:
+
+    def __init__(self, prior: float, parent: 'PUCTNode' = None):
+        self.prior = prior
+        self.parent = parent
+        # Children are indexed by action id
+        self.children: Dict[int, 'PUCTNode'] = {}
+        self.priors: Optional[Dict[int, float]] = None  # set once the network has evaluated the node
+        self.visits = 0
+        self.value = 0.0
+        self.virtual_loss = 0  # simulations waiting for an evaluation below this node
+        self.pending = False  # whether the node itself is waiting for an evaluation
+
+    def is_expanded(self):
+        return self.priors is not None
+
+    def get_value(self):
+        visits = self.visits + self.virtual_loss
+        if not visits:
+            return 0.0
+        # Pending simulations count as losses so that the next ones in the batch look elsewhere
+        return (self.value - self.virtual_loss) / visits
+
+    def select(self, actions: List[int], c_puct: float) -> Tuple[int, 'PUCTNode']:
+        """
+        Picks the legal action maximizing Q + c_puct * P * sqrt(N) / (1 + n). Actions that were not legal
+        when the node was expanded, which happens across determinizations, get a uniform prior.
+        """
+        sqrt_visits = np.sqrt(max(1, self.visits + self.virtual_loss))
+        best_score = -np.inf
+        best = None
+        for action in actions:
+            child = self.children.get(action)
+            if child is None:
+                child = self.children[action] = PUCTNode(self.priors.get(action, 1.0 / len(actions)), self)
+            score = child.get_value() + c_puct * child.prior * sqrt_visits / (
+                1 + child.visits + child.virtual_loss
+            )
+            if score > best_score:
+                best_score = score
+                best = action
+        return best, self.children[best]
+
+    def update(self, value):
+        self.value += value
+        self.visits += 1
+
+
+class PUCTSearch:
+    """
+    Search state for a single root observation, advanced one simulation at a time so that many searches
+    can share a LeafQueue.
+    """
+
+    def __init__(self, state: ObservableDurakGameState, c_puct: float = 1.5, np_rand=np.random):
+        self.state = state
+        self.c_puct = c_puct
+        self.np_rand = np_rand
+        self.root = PUCTNode(1.0)
+        self.players = MCTSPlayer.make_rollout_players(len(state.num_cards_in_hands), np_rand)
+        self.simulations = 0  # simulations backed up
+        self.in_flight = 0  # simulations waiting in a queue
+
+    def queue_simulation(self, queue: LeafQueue):
+        """
+        Descends to a leaf of a fresh determinization. Terminal leaves are backed up right away and other
+        leaves are queued for evaluation. A leaf that is already queued by another simulation is dropped.
+        """
+        player_id = self.state.player_id
+        game = random_game_from_observation_state(self.state, self.players, self.np_rand)
+        node = self.root
+        node.virtual_loss += 1
+        path = [node]
+        while node.is_expanded() and not game.is_done:
+            action, node = node.select(game.get_legal_actions(player_id), self.c_puct)
+            node.virtual_loss += 1
+            path.append(node)
+            game._apply_action(player_id, action)
+            while not game.is_done and game.player_taking_action != player_id:
+                game.step()
+        if game.is_done:
+            self._backup(path, game.get_rewards()[player_id])
+            return
+        if node.pending:
+            for visited in path:
+                visited.virtual_loss -= 1
+            return
+        node.pending = True
+        self.in_flight += 1
+        actions = game.get_legal_actions(player_id)
+        queue.add(
+            game.get_observable_state(player_id),
+            actions,
+            lambda priors, value: self._expand(path, actions, priors, value),
+        )
+
+    def _expand(self, path: List[PUCTNode], actions: List[int], priors: np.ndarray, value: float):
+        leaf = path[-1]
+        leaf.priors = dict(zip(actions, priors.tolist()))
+        leaf.pending = False
+        self.in_flight -= 1
+        self._backup(path, value)
+
+    def _backup(self, path: List[PUCTNode], value: float):
+        for node in path:
+            node.virtual_loss -= 1
+            node.update(value)
+        self.simulations += 1
+
+    def root_visits(self) -> Dict[int, int]:
+        return {action: child.visits for action, child in self.root.children.items() if child.visits}
+
+
+def puct_search_many(
+    states: Sequence[ObservableDurakGameState],
+    evaluator: Evaluator,
+    num_simulations: int,
+    batch_size: int = 16,
+    c_puct: float = 1.5,
+    np_rand=np.random,
+) -> List[Dict[int, int]]:
+    """
+    Searches from several root observations at once, e.g. one per concurrent game. Each round queues up
+    to batch_size leaves per search and evaluates all of them in one call to evaluator.
+    :return: the visit counts of the root actions of each search.
+    """
+    searches = [PUCTSearch(state, c_puct, np_rand) for state in states]
+    queue = LeafQueue(evaluator)
+    while any(search.simulations < num_simulations for search in searches):
+        for search in searches:
+            for _ in range(batch_size):
+                if search.simulations + search.in_flight >= num_simulations:
+                    break
+                search.queue_simulation(queue)
+        queue.flush()
+    return [search.root_visits() for search in searches]
+
+
+class PUCTPlayer(DurakPlayer):
+    """
+    Plays the most visited root action of a network-guided PUCT search.
+    """
+
+    def __init__(
+        self,
+        player_id: int,
+        network: nn.Module,
+        num_simulations: int = 64,
+        batch_size: int = 16,
+        c_puct: float = 1.5,
+    ):
+        super().__init__(player_id)
+        self.evaluator = NetworkEvaluator(network)
+        self.num_simulations = num_simulations
+        self.batch_size = batch_size
+        self.c_puct = c_puct
+
+    def choose_action(
+        self,
+        state: ObservableDurakGameState,
+        actions: List[int],
+        full_state: List[ObservableDurakGameState] = None,
+    ):
+        if len(actions) == 1:
+            return actions[0]
+        visits = puct_search_many(
+            [state], self.evaluator, self.num_simulations, self.batch_size, self.c_puct
+        )[0]
+        return max(visits, key=visits.get)
@@ -0,0 +1,4 @@
+"""
+Benchmarks for the Durak engines: micro times the hot paths of two_game and three_game, and engines compares
+the heads-up implementations against each other. See python -m benchmarks --help.
+"""
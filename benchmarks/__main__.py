@@ -0,0 +1,96 @@
+"""
+Benchmark command line.
+
+    python -m benchmarks run [--only NAME ...] [--repeat 5] [--warmup 1] [--scale 1.0] [--output results.json]
+    python -m benchmarks compare baseline.json [--current results.json] [--threshold 0.1]
+    python -m benchmarks engines [--deals 200] [--games 200]
+
+compare runs the micro-benchmarks again unless --current is given, and exits with status 1 if any of them
+regressed.
+"""
+import argparse
+import sys
+from typing import List, NamedTuple
+
+from . import engines
+from .engines import format_table
+from .micro import BENCHMARKS, BenchmarkResult, compare_results, load_results, run_benchmarks, save_results
+
+
+class _Row(NamedTuple):
+    name: str
+    calls: int
+    best_us: float
+    median_us: float
+    stdev_us: float
+
+
+def _results_table(results: List[BenchmarkResult]) -> str:
+    return format_table([
+        _Row(result.name, result.number, result.best * 1e6, result.median * 1e6, result.stdev * 1e6)
+        for result in results
+    ])
+
+
+def _add_run_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='benchmarks to run')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplies the calls per timing')
+
+
+def _run(args) -> List[BenchmarkResult]:
+    results = run_benchmarks(args.only, args.repeat, args.warmup, args.scale)
+    print(_results_table(results))
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='run the micro-benchmarks')
+    _add_run_arguments(run)
+    run.add_argument('--output', help='JSON file to store the results in')
+
+    compare = commands.add_parser('compare', help='compare micro-benchmark results against a baseline')
+    compare.add_argument('baseline', help='JSON results of a previous run')
+    compare.add_argument('--current', help='JSON results to compare instead of running the benchmarks')
+    compare.add_argument('--threshold', type=float, default=0.1, help='relative slowdown counted as a regression')
+    _add_run_arguments(compare)
+
+    commands.add_parser('engines', help='cross-engine conformance and throughput', add_help=False)
+
+    args, rest = parser.parse_known_args(argv)
+    if args.command == 'engines':
+        engines.main(rest)
+        return 0
+    if rest:
+        parser.error(f'unrecognized arguments: {" ".join(rest)}')
+
+    if args.command == 'run':
+        results = _run(args)
+        if args.output:
+            save_results(results, args.output)
+        return 0
+
+    baseline = load_results(args.baseline)
+    if args.current:
+        current = load_results(args.current)
+    else:
+        if args.only is None:
+            args.only = [result.name for result in baseline if result.name in BENCHMARKS]
+        current = _run(args)
+    comparisons = compare_results(baseline, current, args.threshold)
+    print()
+    print(format_table(comparisons))
+    regressions = [comparison.name for comparison in comparisons if comparison.status == 'regression']
+    if regressions:
+        print(f'\nRegressed: {", ".join(regressions)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+// Line-based driver for the two_game_faster engine, used by benchmarks.engines.CppEngine.
+//
+// Commands, one per line on stdin:
+//   deal <card> x36   deals a game from a deck whose first card is drawn first and whose last card is the
+//                     visible card, six cards to player 0 and then six to player 1
+//   step <action>     applies an action
+// After each command one line describing the state is written to stdout:
+//   acting defender cardsInDeck isDone defenderHasTaken visibleCard reward0 reward1;hand0;hand1;attackTable;
+//   defendTable;legalActions
+// Cards are written as their order (rank - 6) + 9 * suit with the suits of Cards::suit_t, and actions as the
+// engine's action numbers. The legal actions of a finished game are empty.
+#include <iostream>
+#include <sstream>
+#include <string>
+#include <vector>
+
+#include "game.h"
+
+using namespace std;
+using namespace durak_game;
+
+static int cardOrder(const Card &card) {
+  return (card.rank - 6) + (int)card.suit * 9;
+}
+
+static Card cardFromOrder(int order) {
+  return Card((suit_t)(order / 9), order % 9 + 6);
+}
+
+static void writeCards(ostream &out, const vector<Card> &cards) {
+  out << ';';
+  for (size_t i = 0; i < cards.size(); i++) {
+    out << (i ? " " : "") << cardOrder(cards[i]);
+  }
+}
+
+// The engine leaves the first attacker as a TODO, so the driver applies the usual rule: whoever holds the
+// lowest trump attacks first, player 0 when neither holds one.
+static int firstAttacker(GameState *state) {
+  int lowest = 15;
+  int attacker = 0;
+  const vector<Card> *hands[2] = {&state->player1Cards, &state->player2Cards};
+  for (int player = 0; player < 2; player++) {
+    for (const Card &card : *hands[player]) {
+      if (card.suit == state->visibleCard.suit && card.rank < lowest) {
+        lowest = card.rank;
+        attacker = player;
+      }
+    }
+  }
+  return attacker;
+}
+
+static void deal(DurakGameC &game, const vector<int> &deck) {
+  GameState *state = game.getGameState();
+  state->deck.clear();
+  for (int order : deck) {
+    state->deck.push_back(cardFromOrder(order));
+  }
+  state->player1Cards.clear();
+  state->player2Cards.clear();
+  Cards::dealCards(6, &state->deck, &state->player1Cards);
+  Cards::dealCards(6, &state->deck, &state->player2Cards);
+  state->visibleCard = state->deck.back();
+  state->attackTable.clear();
+  state->defendTable.clear();
+  state->graveyard.clear();
+  state->playerTackingAction = firstAttacker(state);
+  state->defender = (state->playerTackingAction + 1) % 2;
+  state->defenderHasTaken = false;
+  state->attackerHasStopped = false;
+  state->isDone = false;
+}
+
+static void writeState(ostream &out, DurakGameC &game) {
+  GameState *state = game.getGameState();
+  out << state->playerTackingAction << ' ' << state->defender << ' ' << state->deck.size() << ' '
+      << state->isDone << ' ' << state->defenderHasTaken << ' ' << cardOrder(state->visibleCard) << ' '
+      << DurakGameC::reward(0, state) << ' ' << DurakGameC::reward(1, state);
+  writeCards(out, state->player1Cards);
+  writeCards(out, state->player2Cards);
+  writeCards(out, state->attackTable);
+  writeCards(out, state->defendTable);
+  out << ';';
+  if (!state->isDone) {
+    vector<int> actions = game.legalActions();
+    for (size_t i = 0; i < actions.size(); i++) {
+      out << (i ? " " : "") << actions[i];
+    }
+  }
+  out << endl;
+}
+
+int main() {
+  // The engine prints diagnostics to cout, which would garble the protocol, so they are dropped and the
+  // protocol goes through a stream of its own on stdout
+  ostream out(cout.rdbuf());
+  cout.rdbuf(nullptr);
+
+  DurakGameC game;
+  string line;
+  while (getline(cin, line)) {
+    istringstream command(line);
+    string name;
+    command >> name;
+    if (name == "deal") {
+      vector<int> deck;
+      int order;
+      while (command >> order) {
+        deck.push_back(order);
+      }
+      deal(game, deck);
+    } else if (name == "step") {
+      int action;
+      command >> action;
+      game.step(action);
+    } else {
+      cerr << "unknown command: " << line << endl;
+      return 1;
+    }
+    writeState(out, game);
+  }
+  return 0;
+}
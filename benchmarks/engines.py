@@ -0,0 +1,539 @@
+"""
+Cross-engine benchmark for the heads-up Durak implementations: two_game (Python), twogame_rust/durak_rt
+(Rust) and two_game_faster (C++). Every engine is driven through the same small Engine interface, so the
+same seeded deals and action sequences can be replayed through all of them. Conformance checks that the
+acting player's view and the legal moves match the reference engine step by step, and throughput measures
+games/sec, steps/sec and per-step latency percentiles with random play.
+
+two_game_faster has no Python bindings, so it runs behind benchmarks/cpp_driver.cpp, a line-based driver that
+is compiled with the system compiler ($CXX, g++ by default) on first use and talks over a pipe. Its latencies
+include that round trip. Engines that cannot be loaded, such as durak_rt when the extension is not built or
+two_game_faster without a compiler, are reported as unavailable rather than failing the run.
+
+    python -m benchmarks.engines --deals 200 --games 200
+"""
+import abc
+import argparse
+import functools
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from three_game import DurakAction
+from two_game import game as two_game
+from two_game.backend import from_rust_action, rust_unavailable_reason, to_rust_action
+
+Card = Tuple[str, int]
+
+
+class Snapshot(NamedTuple):
+    """
+    What every engine can report about a state: the view of the acting player. Tables are compared as sets
+    since not every engine exposes their order.
+    """
+    acting_player: int
+    defender: int
+    hand: FrozenSet[Card]
+    attack_table: FrozenSet[Card]
+    defend_table: FrozenSet[Card]
+    visible_card: Card
+    cards_in_deck: int
+    cards_in_opponent: int
+    defender_has_taken: bool
+    is_done: bool
+
+
+class Engine(abc.ABC):
+    """
+    A heads-up engine driven one action at a time. Actions are three_game.DurakAction ids.
+    """
+    name = None
+
+    @classmethod
+    def unavailable_reason(cls) -> Optional[str]:
+        """
+        :return: why the engine cannot be used here, or None if it can.
+        """
+        return None
+
+    @abc.abstractmethod
+    def deal(self, deck: Sequence[Card]):
+        """
+        Starts a game from an ordered deck: the last cards are dealt first, six to each player starting with
+        player 0, and the first card is the visible card. The holder of the lowest trump attacks first, see
+        seeded_deck for decks in which nobody holds one.
+        """
+
+    @abc.abstractmethod
+    def legal_actions(self) -> List[int]:
+        """
+        :return: the legal actions in ascending order, none once the game is over.
+        """
+
+    @abc.abstractmethod
+    def step(self, action: int):
+        pass
+
+    @abc.abstractmethod
+    def snapshot(self) -> Snapshot:
+        pass
+
+    @abc.abstractmethod
+    def is_done(self) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def rewards(self) -> Tuple[float, float]:
+        pass
+
+    def close(self):
+        """
+        Releases whatever the engine runs on, e.g. a driver process.
+        """
+
+
+class PythonEngine(Engine):
+    name = 'python'
+
+    def __init__(self):
+        self.state = None
+
+    def deal(self, deck: Sequence[Card]):
+        deck = [two_game.Card(*card) for card in deck]
+        self.state = two_game.state_from_deck(deck, np.random.RandomState(0))
+
+    def legal_actions(self) -> List[int]:
+        return sorted(two_game.legal_actions(self.state))
+
+    def step(self, action: int):
+        self.state = two_game.step(self.state, DurakAction(action))
+
+    def snapshot(self) -> Snapshot:
+        state = self.state
+        return Snapshot(
+            acting_player=state.player_taking_action,
+            defender=state.defender,
+            hand=frozenset(map(tuple, state.hands[state.player_taking_action])),
+            attack_table=frozenset(map(tuple, state.attack_table)),
+            defend_table=frozenset(map(tuple, state.defend_table)),
+            visible_card=tuple(state.visible_card),
+            cards_in_deck=len(state.deck),
+            cards_in_opponent=len(state.hands[(state.player_taking_action + 1) % 2]),
+            defender_has_taken=bool(state.defender_has_taken),
+            is_done=bool(state.is_done),
+        )
+
+    def is_done(self) -> bool:
+        return self.state.is_done
+
+    def rewards(self) -> Tuple[float, float]:
+        return tuple(map(float, two_game.rewards(self.state)))
+
+
+# durak_rt observations order the suits spades, hearts, clubs, diamonds
+RUST_OBSERVATION_SUITS = 'SHCD'
+
+
+def _rust_cards(bitmap: np.ndarray) -> FrozenSet[Card]:
+    return frozenset((RUST_OBSERVATION_SUITS[i // 9], i % 9 + 6) for i in np.flatnonzero(bitmap))
+
+
+class RustEngine(Engine):
+    name = 'rust'
+
+    @classmethod
+    def unavailable_reason(cls) -> Optional[str]:
+        return rust_unavailable_reason()
+
+    def __init__(self):
+        from durak_rt.wrapper import StepEnv
+        self.env = StepEnv()
+
+    def deal(self, deck: Sequence[Card]):
+        self.env.deal([DurakAction.ext_from_card(card) for card in deck])
+
+    def legal_actions(self) -> List[int]:
+        return sorted(from_rust_action(action) for action in np.flatnonzero(self.env.legal_mask))
+
+    def step(self, action: int):
+        self.env.step(to_rust_action(action))
+
+    def snapshot(self) -> Snapshot:
+        obs = self.env.observation
+        acting_player = int(np.argmax(obs[0:2]))
+        return Snapshot(
+            acting_player=acting_player,
+            defender=int(np.argmax(obs[148:150])),
+            hand=_rust_cards(obs[2:38]),
+            attack_table=_rust_cards(obs[38:74]),
+            defend_table=_rust_cards(obs[74:110]),
+            visible_card=next(iter(_rust_cards(obs[111:147]))),
+            cards_in_deck=int(obs[110]),
+            cards_in_opponent=int(obs[150]),
+            defender_has_taken=bool(obs[147]),
+            is_done=self.env.done,
+        )
+
+    def is_done(self) -> bool:
+        return self.env.done
+
+    def rewards(self) -> Tuple[float, float]:
+        return tuple(map(float, self.env.rewards()))
+
+
+TWO_GAME_FASTER = Path(__file__).resolve().parent.parent / 'two_game_faster'
+CPP_DRIVER = Path(__file__).resolve().with_name('cpp_driver.cpp')
+# The engine sources the driver links against, two_game_fast.cpp holds the engine's own main
+CPP_SOURCES = ('game.cpp', 'dealer.cpp')
+CXX = os.environ.get('CXX', 'g++')
+# two_game_faster numbers the suits clubs, diamonds, hearts, spades
+CPP_SUITS = 'CDHS'
+CPP_TAKE = 0
+CPP_STOP = 1
+CPP_ATTACK = 2
+CPP_DEFEND = 2 + 36
+
+
+def _cpp_order(card: Card) -> int:
+    return CPP_SUITS.index(card[0]) * 9 + card[1] - 6
+
+
+def _cpp_card(order: int) -> Card:
+    return CPP_SUITS[order // 9], order % 9 + 6
+
+
+def to_cpp_action(action: int) -> int:
+    if DurakAction.is_take(action):
+        return CPP_TAKE
+    if DurakAction.is_stop_attacking(action):
+        return CPP_STOP
+    if DurakAction.is_attack(action):
+        return CPP_ATTACK + _cpp_order(DurakAction.card_from_attack_id(action))
+    return CPP_DEFEND + _cpp_order(DurakAction.card_from_defend_id(action))
+
+
+def from_cpp_action(action: int) -> int:
+    if action == CPP_TAKE:
+        return DurakAction.take_action()
+    if action == CPP_STOP:
+        return DurakAction.stop_attacking()
+    if action < CPP_DEFEND:
+        return DurakAction.attack(_cpp_card(action - CPP_ATTACK))
+    return DurakAction.defend(_cpp_card(action - CPP_DEFEND))
+
+
+@functools.lru_cache(maxsize=None)
+def build_cpp_driver() -> Path:
+    """
+    Compiles the two_game_faster driver into the temporary directory, once for every version of its sources.
+    :raises subprocess.CalledProcessError: if the compiler fails, with its output in stderr.
+    """
+    sources = [CPP_DRIVER] + [TWO_GAME_FASTER / source for source in CPP_SOURCES]
+    headers = sorted(TWO_GAME_FASTER.glob('*.h'))
+    digest = hashlib.sha1(b''.join(path.read_bytes() for path in sources + headers)).hexdigest()[:12]
+    binary = Path(tempfile.gettempdir()) / f'durak_cpp_driver_{digest}'
+    if not binary.exists():
+        partial = binary.with_name(f'{binary.name}.{os.getpid()}')
+        subprocess.run(
+            [CXX, '-O2', '-std=c++17', '-I', str(TWO_GAME_FASTER), *map(str, sources), '-o', str(partial)],
+            check=True, capture_output=True, text=True,
+        )
+        # Renamed into place so that runs building at the same time never start a half-written binary
+        os.replace(partial, binary)
+    return binary
+
+
+class CppState(NamedTuple):
+    """
+    A state line of the driver, with cards and actions converted to this module's.
+    """
+    acting_player: int
+    defender: int
+    cards_in_deck: int
+    is_done: bool
+    defender_has_taken: bool
+    visible_card: Card
+    rewards: Tuple[float, float]
+    hands: Tuple[Tuple[Card, ...], Tuple[Card, ...]]
+    attack_table: Tuple[Card, ...]
+    defend_table: Tuple[Card, ...]
+    legal_actions: List[int]
+
+    @classmethod
+    def parse(cls, line: str) -> 'CppState':
+        header, *cards, actions = line.rstrip('\n').split(';')
+        acting, defender, deck, done, taken, visible, reward0, reward1 = map(int, header.split())
+        hand0, hand1, attack, defend = (tuple(_cpp_card(int(order)) for order in part.split()) for part in cards)
+        return cls(
+            acting_player=acting,
+            defender=defender,
+            cards_in_deck=deck,
+            is_done=bool(done),
+            defender_has_taken=bool(taken),
+            visible_card=_cpp_card(visible),
+            rewards=(float(reward0), float(reward1)),
+            hands=(hand0, hand1),
+            attack_table=attack,
+            defend_table=defend,
+            legal_actions=sorted(from_cpp_action(int(action)) for action in actions.split()),
+        )
+
+
+class CppEngine(Engine):
+    name = 'cpp'
+
+    @classmethod
+    def unavailable_reason(cls) -> Optional[str]:
+        if shutil.which(CXX) is None:
+            return f'no C++ compiler ({CXX}) to build the two_game_faster driver'
+        try:
+            build_cpp_driver()
+        except subprocess.CalledProcessError as error:
+            return f'building the two_game_faster driver failed: {error.stderr.strip()}'
+        return None
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            [str(build_cpp_driver())], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1
+        )
+        self.state: Optional[CppState] = None
+
+    def _send(self, command: str):
+        self.process.stdin.write(command + '\n')
+        self.process.stdin.flush()
+        line = self.process.stdout.readline()
+        if not line:
+            raise RuntimeError(f'the two_game_faster driver exited with status {self.process.wait()}')
+        self.state = CppState.parse(line)
+
+    def deal(self, deck: Sequence[Card]):
+        # The driver draws from the front of its deck, so it gets the deck the other way round
+        self._send('deal ' + ' '.join(str(_cpp_order(card)) for card in reversed(deck)))
+
+    def legal_actions(self) -> List[int]:
+        return self.state.legal_actions
+
+    def step(self, action: int):
+        self._send(f'step {to_cpp_action(action)}')
+
+    def snapshot(self) -> Snapshot:
+        state = self.state
+        return Snapshot(
+            acting_player=state.acting_player,
+            defender=state.defender,
+            hand=frozenset(state.hands[state.acting_player]),
+            attack_table=frozenset(state.attack_table),
+            defend_table=frozenset(state.defend_table),
+            visible_card=state.visible_card,
+            cards_in_deck=state.cards_in_deck,
+            cards_in_opponent=len(state.hands[1 - state.acting_player]),
+            defender_has_taken=state.defender_has_taken,
+            is_done=state.is_done,
+        )
+
+    def is_done(self) -> bool:
+        return self.state.is_done
+
+    def rewards(self) -> Tuple[float, float]:
+        return self.state.rewards
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            self.process.wait()
+
+
+ENGINES = (PythonEngine, RustEngine, CppEngine)
+
+
+def available_engines() -> Tuple[List[type], List[Tuple[str, str]]]:
+    """
+    :return: the engine classes that can be used and the (name, reason) of those that cannot.
+    """
+    available, unavailable = [], []
+    for engine in ENGINES:
+        reason = engine.unavailable_reason()
+        if reason is None:
+            available.append(engine)
+        else:
+            unavailable.append((engine.name, reason))
+    return available, unavailable
+
+
+def seeded_deck(seed: int) -> List[Card]:
+    """
+    A shuffled 36-card deck in which one of the hands dealt holds a trump. The engines break the case in
+    which neither hand holds one differently: two_game draws the first attacker at random, durak_rt always
+    picks the second player and the two_game_faster driver the first. Such decks are reshuffled, so that the
+    holder of the lowest trump attacks first in every engine.
+    """
+    rand = np.random.RandomState(seed)
+    while True:
+        deck = [tuple(card) for card in two_game.new_deck(rand, lowest_rank=6)]
+        trump = deck[0][0]
+        if any(card[0] == trump for card in deck[-12:]):
+            return deck
+
+
+class Divergence(NamedTuple):
+    engine: str
+    deal: int
+    step: int
+    field: str
+    expected: object
+    actual: object
+
+
+def _compare(reference: Engine, engine: Engine, deal: int, step: int) -> Optional[Divergence]:
+    expected, actual = reference.snapshot(), engine.snapshot()
+    for field in Snapshot._fields:
+        if getattr(expected, field) != getattr(actual, field):
+            return Divergence(engine.name, deal, step, field, getattr(expected, field), getattr(actual, field))
+    expected, actual = reference.legal_actions(), engine.legal_actions()
+    if expected != actual:
+        return Divergence(engine.name, deal, step, 'legal_actions', expected, actual)
+    if reference.is_done() and reference.rewards() != engine.rewards():
+        return Divergence(engine.name, deal, step, 'rewards', reference.rewards(), engine.rewards())
+    return None
+
+
+def check_conformance(reference: Engine, engines: Sequence[Engine], num_deals: int, seed: int = 0) -> List[Divergence]:
+    """
+    Plays num_deals seeded deals with random actions chosen from the reference engine's legal moves and
+    replays every action through engines, comparing them with the reference after each step.
+    :return: the first divergence of each engine on each deal.
+    """
+    divergences = []
+    for deal in range(num_deals):
+        deck = seeded_deck(seed + deal)
+        rand = np.random.RandomState(seed + deal)
+        active = list(engines)
+        for engine in [reference] + active:
+            engine.deal(deck)
+        step = 0
+        while active:
+            for engine in list(active):
+                divergence = _compare(reference, engine, deal, step)
+                if divergence is not None:
+                    divergences.append(divergence)
+                    active.remove(engine)
+            actions = reference.legal_actions()
+            if reference.is_done() or not actions:
+                break
+            action = actions[rand.randint(len(actions))]
+            for engine in [reference] + active:
+                engine.step(action)
+            step += 1
+    return divergences
+
+
+class Throughput(NamedTuple):
+    engine: str
+    games: int
+    steps: int
+    seconds: float
+    games_per_sec: float
+    steps_per_sec: float
+    p50_us: float
+    p90_us: float
+    p99_us: float
+
+
+def measure_throughput(engine: Engine, num_games: int, seed: int = 0) -> Throughput:
+    """
+    Plays num_games seeded games with random actions, timing every step: listing the legal moves, picking
+    one and applying it.
+    """
+    rand = np.random.RandomState(seed)
+    latencies = []
+    start = time.perf_counter()
+    for game in range(num_games):
+        engine.deal(seeded_deck(seed + game))
+        while True:
+            step_start = time.perf_counter_ns()
+            actions = engine.legal_actions()
+            if engine.is_done() or not actions:
+                break
+            engine.step(actions[rand.randint(len(actions))])
+            latencies.append(time.perf_counter_ns() - step_start)
+    seconds = time.perf_counter() - start
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) / 1e3 if latencies else (np.nan,) * 3
+    return Throughput(
+        engine.name, num_games, len(latencies), seconds,
+        num_games / seconds, len(latencies) / seconds, p50, p90, p99,
+    )
+
+
+def measure_rust_batch_throughput(num_games: int, seed: int = 0) -> Throughput:
+    """
+    Throughput of durak_rt.play_many, which plays whole games natively and in parallel, so there is no
+    per-step latency to report.
+    """
+    from durak_rt.wrapper import play_many
+    start = time.perf_counter()
+    trajectories = play_many(num_games, seed)
+    seconds = time.perf_counter() - start
+    steps = len(trajectories.actions)
+    return Throughput('rust (play_many)', num_games, steps, seconds, num_games / seconds, steps / seconds,
+                      np.nan, np.nan, np.nan)
+
+
+def format_table(rows: Sequence[NamedTuple]) -> str:
+    if not rows:
+        return ''
+    header = rows[0]._fields
+    cells = [[f'{value:.2f}' if isinstance(value, float) else str(value) for value in row] for row in rows]
+    widths = [max(len(str(name)), *(len(row[i]) for row in cells)) for i, name in enumerate(header)]
+    lines = ['  '.join(name.ljust(width) for name, width in zip(header, widths))]
+    lines += ['  '.join(cell.ljust(width) for cell, width in zip(row, widths)) for row in cells]
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--deals', type=int, default=200, help='deals replayed for conformance')
+    parser.add_argument('--games', type=int, default=200, help='games played per engine for throughput')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    available, unavailable = available_engines()
+    for name, reason in unavailable:
+        print(f'{name}: unavailable, {reason}')
+
+    engines = [engine() for engine in available]
+    try:
+        _report(engines, args)
+    finally:
+        for engine in engines:
+            engine.close()
+
+
+def _report(engines: List[Engine], args: argparse.Namespace):
+    reference, others = engines[0], engines[1:]
+    if others:
+        divergences = check_conformance(reference, others, args.deals, args.seed)
+        print(f'\nConformance against {reference.name} over {args.deals} deals')
+        for engine in others:
+            count = sum(divergence.engine == engine.name for divergence in divergences)
+            print(f'{engine.name}: {count} diverging deals')
+        if divergences:
+            print(format_table(divergences[:20]))
+    else:
+        print(f'\nConformance skipped, {reference.name} is the only available engine')
+
+    results = [measure_throughput(engine, args.games, args.seed) for engine in engines]
+    if any(isinstance(engine, RustEngine) for engine in engines):
+        results.append(measure_rust_batch_throughput(args.games, args.seed))
+    print(f'\nThroughput over {args.games} random games')
+    print(format_table(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""
+Micro-benchmarks for the hot paths of two_game and three_game. Every benchmark builds its inputs from fixed
+seeds, runs a warmup and then times `number` calls `repeat` times, so that results are comparable between
+runs on the same machine. Results are saved as JSON and a later run can be compared against them to flag
+regressions.
+"""
+import json
+import platform
+import statistics
+import time
+from itertools import cycle
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from three_game import DurakAction, DurakGame
+from two_game import game as two_game
+
+# A benchmark builds its inputs and returns the operation to time
+Setup = Callable[[], Callable[[], object]]
+
+
+class Benchmark(NamedTuple):
+    name: str
+    setup: Setup
+    number: int  # calls per timing
+
+
+class BenchmarkResult(NamedTuple):
+    name: str
+    number: int
+    repeat: int
+    # seconds per call
+    best: float
+    median: float
+    mean: float
+    stdev: float
+
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, number: int):
+    def register(setup: Setup) -> Setup:
+        BENCHMARKS[name] = Benchmark(name, setup, number)
+        return setup
+    return register
+
+
+def _seeded_random_player(player_id: int):
+    from agents import RandomPlayer
+    player = RandomPlayer(player_id)
+    player.np_random = np.random.RandomState(player_id)
+    return player
+
+
+def _two_game_states(num_games: int = 5) -> List[two_game.GameState]:
+    """
+    States of a few seeded random heads-up games.
+    """
+    states = []
+    for seed in range(num_games):
+        rand = np.random.RandomState(seed)
+        state = two_game.new_state(seed, lowest_rank=6)
+        while not state.is_done:
+            states.append(state)
+            actions = two_game.legal_actions(state)
+            if not actions:
+                break
+            state = two_game.step(state, actions[rand.randint(len(actions))])
+    return states
+
+
+@benchmark('two_game.new_state', number=2000)
+def bench_new_state():
+    seeds = cycle(range(100))
+    return lambda: two_game.new_state(next(seeds), lowest_rank=6)
+
+
+@benchmark('two_game.new_states(100)', number=200)
+def bench_new_states():
+    starts = cycle(range(0, 10000, 100))
+    return lambda: two_game.new_states(100, lowest_rank=6, start=next(starts))
+
+
+@benchmark('two_game.legal_actions', number=20000)
+def bench_legal_actions():
+    states = cycle(_two_game_states())
+    return lambda: two_game.legal_actions(next(states))
+
+
+@benchmark('two_game.step', number=10000)
+def bench_step():
+    rand = np.random.RandomState(0)
+    transitions = []
+    for state in _two_game_states():
+        actions = two_game.legal_actions(state)
+        transitions.append((state, actions[rand.randint(len(actions))]))
+    transitions = cycle(transitions)
+
+    def step():
+        state, action = next(transitions)
+        return two_game.step(state, action)
+    return step
+
+
+@benchmark('ObservableGameState.to_array', number=5000)
+def bench_to_array():
+    observations = cycle([state.observable(state.player_taking_action) for state in _two_game_states()])
+    return lambda: next(observations).to_array()
+
+
+@benchmark('ObservableGameState.from_array', number=5000)
+def bench_from_array():
+    arrays = cycle([state.observable(state.player_taking_action).to_array() for state in _two_game_states()])
+    return lambda: two_game.ObservableGameState.from_array(next(arrays))
+
+
+@benchmark('GameRunner.run', number=20)
+def bench_game_runner():
+    runner = two_game.GameRunner()
+    runner.set_agents([_seeded_random_player(0), _seeded_random_player(1)])
+    seeds = cycle(range(20))
+    return lambda: runner.run(seed=next(seeds))
+
+
+@benchmark('DurakGame.step', number=2000)
+def bench_durak_game_step():
+    game = DurakGame()
+    game.configure({
+        'game_num_players': 3,
+        'lowest_card': 6,
+        'agents': [_seeded_random_player] * 3,
+        'seed': 0,
+    })
+    game.init_game()
+
+    def step():
+        if game.is_done:
+            game.init_game()
+        game.step()
+    return step
+
+
+ROLLOUTS = 16  # continuations per leaf in the rollout benchmarks
+
+
+def _three_game_leaves(num_leaves: int = 20) -> list:
+    """
+    (observation, action) pairs of the acting player along a seeded three-player game, as MCTS rolls out.
+    """
+    game = DurakGame()
+    game.configure({
+        'game_num_players': 3,
+        'lowest_card': 6,
+        'agents': [_seeded_random_player] * 3,
+        'seed': 0,
+    })
+    game.init_game()
+    leaves = []
+    while len(leaves) < num_leaves:
+        if game.is_done:
+            game.init_game()
+        player_id = game.player_taking_action
+        actions = game.get_legal_actions(player_id)
+        leaves.append((game.get_observable_state(player_id), actions[0]))
+        game.step()
+    return leaves
+
+
+@benchmark(f'mcts.simulate x{ROLLOUTS}', number=5)
+def bench_simulate():
+    from agents.mcts import MCTSPlayer, simulate
+    leaves = cycle(_three_game_leaves())
+    rand = np.random.RandomState(0)
+    players = MCTSPlayer.make_rollout_players(3, rand)
+
+    def rollouts():
+        state, action = next(leaves)
+        return [simulate(state, action, players, np_rand=rand) for _ in range(ROLLOUTS)]
+    return rollouts
+
+
+@benchmark(f'mcts.lockstep_rollout({ROLLOUTS})', number=5)
+def bench_lockstep_rollout():
+    from agents.mcts import lockstep_rollout
+    leaves = cycle(_three_game_leaves())
+    rand = np.random.RandomState(0)
+
+    def rollout():
+        state, action = next(leaves)
+        return lockstep_rollout(state, action, ROLLOUTS, np_rand=rand)
+    return rollout
+
+
+@benchmark('DurakAction.encode_decode', number=20000)
+def bench_durak_action():
+    cards = cycle([DurakAction.card_from_ext(ext) for ext in range(DurakAction.n(4))])
+
+    def encode_decode():
+        card = next(cards)
+        DurakAction.card_from_defend_id(DurakAction.defend(card))
+        return DurakAction.card_from_attack_id(DurakAction.attack(card))
+    return encode_decode
+
+
+def run_benchmark(bench: Benchmark, repeat: int = 5, warmup: int = 1, number: Optional[int] = None) -> BenchmarkResult:
+    """
+    Times bench.setup()'s operation: warmup untimed rounds, then repeat rounds of number calls each.
+    """
+    number = number or bench.number
+    operation = bench.setup()
+    for _ in range(warmup):
+        for _ in range(number):
+            operation()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            operation()
+        timings.append((time.perf_counter() - start) / number)
+    return BenchmarkResult(
+        name=bench.name,
+        number=number,
+        repeat=repeat,
+        best=min(timings),
+        median=statistics.median(timings),
+        mean=statistics.mean(timings),
+        stdev=statistics.stdev(timings) if repeat > 1 else 0.0,
+    )
+
+
+def run_benchmarks(
+    names: Optional[List[str]] = None,
+    repeat: int = 5,
+    warmup: int = 1,
+    scale: float = 1.0,
+) -> List[BenchmarkResult]:
+    """
+    Runs the named benchmarks, all of them by default. scale multiplies the calls per timing.
+    """
+    names = names if names is not None else list(BENCHMARKS)
+    results = []
+    for name in names:
+        bench = BENCHMARKS[name]
+        results.append(run_benchmark(bench, repeat, warmup, max(1, int(bench.number * scale))))
+    return results
+
+
+def environment() -> Dict[str, str]:
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+    }
+
+
+def save_results(results: List[BenchmarkResult], path: str):
+    with open(path, 'w') as f:
+        json.dump({
+            'environment': environment(),
+            'benchmarks': {result.name: result._asdict() for result in results},
+        }, f, indent=2)
+
+
+def load_results(path: str) -> List[BenchmarkResult]:
+    with open(path) as f:
+        data = json.load(f)
+    return [BenchmarkResult(**result) for result in data['benchmarks'].values()]
+
+
+class Comparison(NamedTuple):
+    name: str
+    # median microseconds per call
+    baseline_us: float
+    current_us: float
+    ratio: float
+    status: str  # 'regression', 'improvement' or 'ok'
+
+
+def compare_results(
+    baseline: List[BenchmarkResult],
+    current: List[BenchmarkResult],
+    threshold: float = 0.1,
+) -> List[Comparison]:
+    """
+    Compares the median time per call of the benchmarks present in both runs. A benchmark regressed if it got
+    more than threshold slower, and improved if it got more than threshold faster.
+    """
+    baseline = {result.name: result for result in baseline}
+    comparisons = []
+    for result in current:
+        if result.name not in baseline:
+            continue
+        ratio = result.median / baseline[result.name].median
+        if ratio > 1 + threshold:
+            status = 'regression'
+        elif ratio < 1 - threshold:
+            status = 'improvement'
+        else:
+            status = 'ok'
+        comparisons.append(Comparison(
+            result.name, baseline[result.name].median * 1e6, result.median * 1e6, ratio, status
+        ))
+    return comparisons
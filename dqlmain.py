@@ -1,6 +1,7 @@
 from pathlib import Path
 
 from three_game import DurakGame, DurakAction
+from three_game.history_store import HistoryWriter
 from agents import RandomPlayer, DQAgent
 
 
@@ -19,20 +20,20 @@ def main(*args, **kwargs):
     game.configure(gconfig)
     game.init_game()
     wins = 0
-
-    for i in range(200):
-        game.reset_game()
-        print('playing three_game ', i)
-        while not game.is_done:
-            game.step()
-        game.save_history(Path('histories'))
-        if len(game.player_hands[2]) == 0:
-            wins += 1
-        print(game.player_hands)
-        #for _ in range(5):
-        #    three_game.players[2].update()
-        # three_game.players[2].save()
-        print('win rate: ', wins / (i + 1))
+    with HistoryWriter(Path('histories')) as writer:
+        for i in range(200):
+            game.reset_game()
+            print('playing three_game ', i)
+            while not game.is_done:
+                game.step()
+            game.save_history(writer)
+            if len(game.player_hands[2]) == 0:
+                wins += 1
+            print(game.player_hands)
+            #for _ in range(5):
+            #    three_game.players[2].update()
+            # three_game.players[2].save()
+            print('win rate: ', wins / (i + 1))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,235 @@
+import sys
+import types
+import warnings
+
+import numpy as np
+import pytest
+
+import two_game
+from three_game import DurakAction
+from two_game import GameRunner, backend
+from two_game import game as python_game
+from benchmarks.engines import seeded_deck
+from duraik_tests.test_history import seeded_random_player
+from rl.durak_env import TwoGameEnv
+
+
+@pytest.fixture
+def restore_backend():
+    yield
+    backend._backend = None
+
+
+def test_python_backend_is_default(monkeypatch, restore_backend):
+    monkeypatch.delenv(backend.BACKEND_ENV_VAR, raising=False)
+    backend._backend = None
+    assert two_game.get_backend().name == "python"
+    assert two_game.new_state(3) == python_game.new_state(3)
+
+
+class FakeStepEnv:
+    """
+    durak_rt's StepEnv played by the Python engine, counting the games it deals and restores.
+    """
+
+    def __init__(self):
+        self.legal_mask = np.zeros(74, dtype=bool)
+        self.state = None
+        self.deals = self.restores = self.steps = 0
+
+    def _set(self, state):
+        self.state = state
+        self.legal_mask[:] = False
+        for action in python_game.legal_actions(state):
+            self.legal_mask[backend.to_rust_action(action)] = True
+
+    @property
+    def done(self):
+        return not self.legal_mask.any()
+
+    def deal(self, cards):
+        self.deals += 1
+        self._set(python_game.state_from_deck([backend._CARDS[card] for card in cards], np.random.RandomState(0)))
+        return self.state.player_taking_action
+
+    def step(self, action):
+        self.steps += 1
+        self._set(python_game.step(self.state, backend.from_rust_action(action)))
+        return self.done
+
+    def full_state(self):
+        state = self.state
+        return (
+            *([backend._INDICES[card] for card in cards] for cards in backend._card_lists(state)),
+            backend._INDICES[state.visible_card], state.player_taking_action, state.defender,
+            state.defender_has_taken,
+        )
+
+    def restore(self, full_state):
+        self.restores += 1
+        deck, hand1, hand2, attack_table, defend_table, graveyard = (
+            tuple(backend._CARDS[card] for card in cards) for cards in full_state[:6]
+        )
+        visible_card, acting, defender, taken = full_state[6:]
+        self._set(two_game.GameState(
+            deck, (hand1, hand2), backend._CARDS[visible_card], attack_table, defend_table, graveyard, False,
+            acting, defender, taken,
+        ))
+        return self.done
+
+
+@pytest.fixture
+def fake_durak_rt(monkeypatch):
+    package, wrapper = types.ModuleType("durak_rt"), types.ModuleType("durak_rt.wrapper")
+    package.wrapper, wrapper.StepEnv = wrapper, FakeStepEnv
+    monkeypatch.setitem(sys.modules, "durak_rt", package)
+    monkeypatch.setitem(sys.modules, "durak_rt.wrapper", wrapper)
+
+
+@pytest.fixture
+def no_durak_rt(monkeypatch):
+    monkeypatch.setitem(sys.modules, "durak_rt.wrapper", None)
+
+
+def _rust_backend():
+    with pytest.warns(UserWarning, match="lowest_rank=6"):
+        return backend.make_backend("rust")
+
+
+def _normalized(state):
+    # the Python engine keeps the deck of a fresh deal as a list
+    return state._replace(deck=tuple(state.deck))
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        backend.Backend()
+
+
+def test_rust_falls_back_to_python(no_durak_rt):
+    assert backend.rust_unavailable_reason() is not None
+    with pytest.warns(UserWarning, match="durak_rt"):
+        assert backend.make_backend("rust").name == "python"
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert backend.make_backend("auto").name == "python"
+    with pytest.raises(ValueError):
+        backend.make_backend("cpp")
+
+
+def test_rust_is_picked_when_available(fake_durak_rt):
+    assert backend.rust_unavailable_reason() is None
+    assert _rust_backend().name == "rust"
+    with pytest.warns(UserWarning, match="lowest_rank=6"):
+        assert backend.make_backend("auto").name == "rust"
+
+
+@pytest.mark.parametrize("value, name", [(" Rust ", "rust"), ("AUTO", "rust"), ("python", "python"), ("", "python")])
+def test_backend_env_var(monkeypatch, fake_durak_rt, restore_backend, value, name):
+    monkeypatch.setenv(backend.BACKEND_ENV_VAR, value)
+    backend._backend = None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        assert backend.get_backend().name == name
+
+
+def test_unknown_backend_env_var(monkeypatch, restore_backend):
+    monkeypatch.setenv(backend.BACKEND_ENV_VAR, "cpp")
+    backend._backend = None
+    with pytest.raises(ValueError, match="cpp"):
+        backend.get_backend()
+
+
+def test_rust_backend_plays_sequential_games_without_restoring(fake_durak_rt):
+    rust = _rust_backend()
+    runner = GameRunner(rust)
+    runner.set_agents([seeded_random_player(0), seeded_random_player(1)])
+    runner.run(seed=4)
+    states = runner.state_history
+    assert len(states[0].deck) == 36 - 12
+    assert (rust.env.deals, rust.env.restores, rust.env.steps) == (1, 0, len(runner.action_history))
+    for state, action, next_state in zip(states, runner.action_history, states[1:]):
+        assert _normalized(python_game.step(state, action)) == _normalized(next_state)
+
+
+def test_rust_backend_restores_other_states(fake_durak_rt):
+    rust = _rust_backend()
+    state = rust.deal(7)
+    first, second = rust.legal_actions(state)[:2]
+    assert rust.step(state, first) == _normalized(python_game.step(state, first))
+    # the native game has moved on from state, and a copy of it is not the state it last returned
+    assert rust.step(state, second) == _normalized(python_game.step(state, second))
+    copy = state._replace()
+    assert sorted(rust.legal_actions(copy)) == sorted(python_game.legal_actions(state))
+    assert rust.env.restores == 2
+
+
+def test_rust_backend_passes_other_decks_to_python(fake_durak_rt):
+    rust = _rust_backend()
+    state = rust.deal(3, lowest_rank=9)
+    assert state == python_game.new_state(3)
+    actions = rust.legal_actions(state)
+    assert actions == python_game.legal_actions(state)
+    assert rust.step(state, actions[0]) == python_game.step(state, actions[0])
+    assert (rust.env.deals, rust.env.restores, rust.env.steps) == (0, 0, 0)
+
+
+def test_entry_points_deal_the_backend_deck(fake_durak_rt, restore_backend):
+    with pytest.warns(UserWarning, match="lowest_rank=6"):
+        two_game.set_backend("rust")
+    assert len(two_game.new_state(3).deck) == 36 - 12
+    env = TwoGameEnv()
+    env.reset()
+    assert env.lowest_rank == 6 and len(env.get_state().deck) == 36 - 12
+    small = TwoGameEnv(lowest_rank=9)
+    small.reset()
+    assert len(small.get_state().deck) == 24 - 12
+
+
+def test_game_runner_uses_its_backend():
+    class CountingBackend(backend.PythonBackend):
+        steps = 0
+
+        def step(self, state, action):
+            self.steps += 1
+            return super().step(state, action)
+
+    counting = CountingBackend()
+    runner, reference = GameRunner(counting), GameRunner(backend.PythonBackend())
+    for each in (runner, reference):
+        each.set_agents([seeded_random_player(0), seeded_random_player(1)])
+    assert runner.run(seed=5) == reference.run(seed=5)
+    assert runner.state_history == reference.state_history
+    assert counting.steps == len(runner.action_history)
+
+
+def test_unsupported_decks_are_dealt_by_python():
+    class SmallDeckBackend(backend.PythonBackend):
+        def supports(self, lowest_rank):
+            return lowest_rank == 6
+
+        def new_state(self, seed=0, lowest_rank=9):
+            self.dealt = lowest_rank
+            return super().new_state(seed, lowest_rank)
+
+    small = SmallDeckBackend()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert small.deal(3) == python_game.new_state(3)
+    assert not hasattr(small, "dealt")
+    runner = GameRunner(small)
+    runner.set_agents([seeded_random_player(0), seeded_random_player(1)])
+    runner.run(seed=3, lowest_rank=6)
+    assert small.dealt == 6 and runner.state_history[0] == python_game.new_state(3, 6)
+
+
+def test_rust_action_ids_round_trip():
+    rust_actions = []
+    for card in seeded_deck(0):
+        for action in (DurakAction.attack(card), DurakAction.defend(card)):
+            rust_actions.append(backend.to_rust_action(action))
+            assert backend.from_rust_action(rust_actions[-1]) == action
+    for action in (DurakAction.take_action(), DurakAction.stop_attacking()):
+        rust_actions.append(backend.to_rust_action(action))
+        assert backend.from_rust_action(rust_actions[-1]) == action
+    assert sorted(rust_actions) == list(range(74))
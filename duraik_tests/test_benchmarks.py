@@ -0,0 +1,165 @@
+import numpy as np
+import pytest
+
+from benchmarks.engines import (
+    CppEngine, Divergence, Engine, PythonEngine, check_conformance, from_cpp_action, measure_throughput, seeded_deck,
+    to_cpp_action,
+)
+from three_game import DurakAction
+from two_game import game as two_game
+
+
+def test_state_from_deck_matches_new_state():
+    rand = np.random.RandomState(3)
+    deck = two_game.new_deck(rand, 9)
+    assert two_game.state_from_deck(deck, rand) == two_game.new_state(3)
+
+
+def test_conformance_of_identical_engines():
+    assert check_conformance(PythonEngine(), [PythonEngine()], num_deals=10) == []
+
+
+def test_conformance_reports_divergence():
+    class Cheating(PythonEngine):
+        name = 'cheating'
+
+        def legal_actions(self):
+            return super().legal_actions()[1:]
+
+    divergences = check_conformance(PythonEngine(), [Cheating()], num_deals=3)
+    assert [(divergence.deal, divergence.step, divergence.field) for divergence in divergences] == [
+        (0, 0, 'legal_actions'), (1, 0, 'legal_actions'), (2, 0, 'legal_actions')
+    ]
+
+
+class Recorder(PythonEngine):
+    """
+    Records what it reports after the deal and after every step, keyed by deck.
+    """
+    name = 'recorder'
+
+    def __init__(self):
+        super().__init__()
+        self.traces = {}
+        self.trace = None
+
+    def _record(self):
+        self.trace.append((self.snapshot(), self.legal_actions(), self.rewards() if self.is_done() else None))
+
+    def deal(self, deck):
+        super().deal(deck)
+        self.trace = self.traces[tuple(deck)] = []
+        self._record()
+
+    def step(self, action):
+        super().step(action)
+        self._record()
+
+
+class Replay(Engine):
+    """
+    Plays back recorded traces whatever actions it is given.
+    """
+    name = 'replay'
+
+    def __init__(self, traces):
+        self.traces = traces
+        self.trace = None
+        self.position = 0
+
+    def deal(self, deck):
+        self.trace = self.traces[tuple(deck)]
+        self.position = 0
+
+    def legal_actions(self):
+        return self.trace[self.position][1]
+
+    def step(self, action):
+        self.position += 1
+
+    def snapshot(self):
+        return self.trace[self.position][0]
+
+    def is_done(self):
+        return self.snapshot().is_done
+
+    def rewards(self):
+        return self.trace[self.position][2]
+
+
+def test_conformance_reports_divergence_of_recorded_trace():
+    recorder = Recorder()
+    assert check_conformance(PythonEngine(), [recorder], num_deals=2) == []
+    assert check_conformance(PythonEngine(), [Replay(recorder.traces)], num_deals=2) == []
+
+    # A card lost from the hand of the player acting after the fifth action of the first deal
+    trace = recorder.traces[tuple(seeded_deck(0))]
+    snapshot, actions, rewards = trace[5]
+    card = sorted(snapshot.hand)[0]
+    trace[5] = (snapshot._replace(hand=snapshot.hand - {card}), actions, rewards)
+    divergences = check_conformance(PythonEngine(), [Replay(recorder.traces)], num_deals=2)
+    assert divergences == [Divergence('replay', 0, 5, 'hand', snapshot.hand, snapshot.hand - {card})]
+
+
+def test_engine_is_abstract():
+    class Incomplete(Engine):
+        def deal(self, deck):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_seeded_decks_deal_a_trump():
+    # Otherwise the engines pick the first attacker differently
+    for seed in range(50):
+        deck = seeded_deck(seed)
+        assert len(set(deck)) == 36 and deck == seeded_deck(seed)
+        assert any(card[0] == deck[0][0] for card in deck[-12:])
+
+
+def test_cpp_actions_round_trip():
+    actions = list(range(2 * DurakAction.n(4))) + [DurakAction.take_action(), DurakAction.stop_attacking()]
+    assert [from_cpp_action(to_cpp_action(action)) for action in actions] == actions
+    assert len({to_cpp_action(action) for action in actions}) == len(actions)
+
+
+@pytest.mark.skipif(CppEngine.unavailable_reason() is not None, reason='two_game_faster driver cannot be built')
+def test_cpp_engine_deals_like_python():
+    engine = CppEngine()
+    try:
+        for seed in range(20):
+            reference = PythonEngine()
+            deck = seeded_deck(seed)
+            reference.deal(deck)
+            engine.deal(deck)
+            assert engine.snapshot() == reference.snapshot()
+            assert engine.legal_actions() == reference.legal_actions()
+        # The engines agree on every deal and its first attacker, but two_game_faster still breaks some rules,
+        # which conformance has to point out
+        divergences = check_conformance(PythonEngine(), [engine], num_deals=5)
+        assert divergences and all(divergence.step > 0 for divergence in divergences)
+    finally:
+        engine.close()
+    assert engine.process.returncode == 0
+
+
+def test_measure_throughput():
+    result = measure_throughput(PythonEngine(), num_games=3)
+    assert result.games == 3 and result.steps > 0
+    assert result.p50_us <= result.p90_us <= result.p99_us
+
+
+def test_micro_benchmarks_compare(tmp_path):
+    from benchmarks.micro import BENCHMARKS, compare_results, load_results, run_benchmarks, save_results
+    results = run_benchmarks(list(BENCHMARKS), repeat=2, warmup=0, scale=0.001)
+    assert [result.name for result in results] == list(BENCHMARKS)
+    assert all(result.best <= result.median for result in results)
+
+    save_results(results, tmp_path / 'baseline.json')
+    baseline = load_results(tmp_path / 'baseline.json')
+    assert baseline == results
+    slower = [result._replace(median=result.median * 2) for result in results]
+    comparisons = compare_results(baseline, slower, threshold=0.1)
+    assert {comparison.status for comparison in comparisons} == {'regression'}
+    assert {comparison.status for comparison in compare_results(baseline, results)} == {'ok'}
@@ -0,0 +1,48 @@
+import numpy as np
+
+from three_game import DurakDeck, DurakGame
+from three_game.dealing import card_ids, deal_batch
+from two_game import game as two_game
+from duraik_tests.test_history import seeded_random_player
+
+
+def test_deals_are_permutations():
+    deals = deal_batch(500, seed=1, lowest_rank=9)
+    assert np.array_equal(np.sort(deals.decks, axis=1), np.tile(np.sort(card_ids(9)), (500, 1)))
+    assert np.array_equal(deals.stock[:, 0], deals.visible_card)
+    counts = np.bincount(deals.decks[:, 0], minlength=36)[card_ids(9)]
+    assert counts.min() > 0  # every card turns up as the visible card
+
+
+def test_per_game_seed_mapping():
+    batch = deal_batch(50, seed=7, lowest_rank=6, num_players=3, round_robin=True)
+    single = deal_batch(1, seed=7, lowest_rank=6, num_players=3, start=23, round_robin=True)
+    assert single.game(0) == batch.game(23)
+    assert not np.array_equal(deal_batch(50, seed=8).decks, deal_batch(50, seed=7).decks)
+
+
+def test_two_game_states_match_state_from_deck():
+    deals = deal_batch(100, seed=3, lowest_rank=9)
+    states = two_game.new_states(100, seed=3, lowest_rank=9)
+    for index, state in enumerate(states):
+        deck = [two_game.Card(*card) for card in deals.game(index).deck]
+        expected = two_game.state_from_deck(deck, np.random.RandomState(0))
+        if any(card.suit == state.visible_card.suit for hand in state.hands for card in hand):
+            assert state == expected
+        else:
+            assert state._replace(player_taking_action=0, defender=1) == expected._replace(
+                player_taking_action=0, defender=1
+            )
+
+
+def test_three_game_deals_round_robin():
+    deals = deal_batch(20, seed=0, lowest_rank=6, num_players=3, round_robin=True)
+    for index in range(20):
+        deal = deals.game(index)
+        game = DurakGame()
+        game.configure({'game_num_players': 3, 'lowest_card': 6, 'agents': [seeded_random_player] * 3})
+        game.init_game(deck=DurakDeck.from_cards(deal.deck))
+        assert [list(hand) for hand in game.player_hands] == deal.hands
+        assert game.visible_card == deal.visible_card
+        if any(card[0] == deal.visible_card[0] for hand in deal.hands for card in hand):
+            assert game.attackers[0] == deal.first_attacker
@@ -0,0 +1,71 @@
+"""
+This file tests the batched state encoder of agents.dql
+"""
+import numpy as np
+import pytest
+
+from three_game import DurakAction, GameTransition
+from agents.dql import encode_states, state_to_input_array, state_input_dim, ExperienceReplay
+from duraik_tests.test_history import play_game
+
+
+def reference_encoding(state):
+    def many_hot(cards):
+        arr = np.zeros(DurakAction.n(4))
+        arr[[DurakAction.ext_from_card(card) for card in cards]] = 1
+        return arr
+    return np.concatenate((
+        [state.player_id],
+        many_hot(state.hand),
+        many_hot(state.attack_table),
+        many_hot(state.defend_table),
+        many_hot(state.graveyard),
+        state.num_cards_in_hands,
+        [state.num_cards_left_in_deck],
+        [state.is_done],
+    ))
+
+
+def observations(seed=7):
+    _, states = play_game(seed)
+    return [state.observable(i % 3) for i, state in enumerate(states)]
+
+
+def test_encode_states_matches_reference():
+    obs = observations()
+    encoded = encode_states(obs)
+    assert encoded.shape == (len(obs), state_input_dim(3))
+    for row, state in zip(encoded, obs):
+        np.testing.assert_array_equal(row, reference_encoding(state))
+    np.testing.assert_array_equal(state_to_input_array(obs[5]), reference_encoding(obs[5]))
+
+
+def test_encode_into_preallocated_rows():
+    obs = observations()
+    out = np.full((len(obs), state_input_dim(3)), 7, dtype=np.int32)
+    assert encode_states(obs, out=out) is out
+    np.testing.assert_array_equal(out, encode_states(obs))
+
+
+def test_encode_rejects_unusable_out():
+    obs = observations()
+    dim = state_input_dim(3)
+    for out in (
+        np.zeros((dim, len(obs)), dtype=np.float32).T,
+        np.zeros((len(obs) + 1, dim), dtype=np.float32),
+        np.zeros((len(obs), dim), dtype=object),
+    ):
+        with pytest.raises(ValueError):
+            encode_states(obs, out=out)
+
+
+def test_add_experiences_wraps_around():
+    obs = observations()
+    transitions = [GameTransition(s, 1, 0.0, s_prime) for s, s_prime in zip(obs, obs[1:])][:13]
+    replay = ExperienceReplay(5, state_input_dim(3))
+    replay.add_experience(transitions[0])
+    replay.add_experiences(transitions[1:])
+    assert replay.memory_counter == 13
+    for i in range(8, 13):
+        np.testing.assert_array_equal(replay.states[i % 5], reference_encoding(transitions[i].state))
+        np.testing.assert_array_equal(replay.new_states[i % 5], reference_encoding(transitions[i].next_state))
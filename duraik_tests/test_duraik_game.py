@@ -2,6 +2,8 @@
 This file tests the Durak Game engine
 """
 
+import numpy as np
+
 from three_game import DurakGame, DurakAction, DurakDeck
 from agents import RandomPlayer
 
@@ -186,5 +188,48 @@ def test_passing():
     assert game.is_done
 
 
+
+def test_clone_is_independent():
+    game = get_normal_random_game()
+    for _ in range(5):
+        game.step()
+    clone = game.clone()
+    assert clone.current_state()._replace(np_rand=None) == game.current_state()._replace(np_rand=None)
+    assert clone.players[0] is game.players[0]
+    assert clone.history.actions == game.history.actions
+    state = game.current_state()._replace(np_rand=None)
+    for _ in range(5):
+        clone.step()
+    assert game.current_state()._replace(np_rand=None) == state
+    assert len(game.history.actions) == 5
+    assert len(clone.history.actions) == 10
+    assert clone.np_random is game.np_random
+    assert game.clone(np.random.RandomState(1)).np_random is not game.np_random
+
+    class TracedGame(DurakGame):
+        __slots__ = ()
+
+    game.__class__ = TracedGame
+    assert type(game.clone()) is TracedGame
+
+
+def test_round_ends_when_nobody_is_left_to_attack():
+    game = get_normal_random_game()
+    game.player_hands = [[], [('H', 6), ('H', 7)], [('C', 6), ('C', 7)]]
+    game.deck.deck = []
+    game.attack_table = [('D', 11), ('S', 11)]
+    game.defend_table = [('D', 12), ('S', 13)]
+    game.attackers = [0, 2]
+    game.defender = 1
+    game.player_taking_action = 2
+    game.defender_has_taken = True
+    game.in_players = [0, 1, 2]
+    game.stopped_attacking = []
+
+    game.step()
+    assert game.attack_table == [] and game.defend_table == []
+    assert game.player_taking_action == 1
+    assert game.defender == 2
+
 if __name__ == '__main__':
     test_passing()
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+import torch
+
+from agents import RandomPlayer
+from rl.evaluation import (
+    ACCEPT_H0, ACCEPT_H1, SPRT, compare, duplicate_schedule, evaluate, play_schedule, seat_schedule, wilson_interval
+)
+
+
+def test_pool_matches_in_process():
+    schedule = seat_schedule(12, seed=5)
+    in_process, _ = play_schedule(RandomPlayer, RandomPlayer, schedule, num_workers=0)
+    pooled, histograms = play_schedule(RandomPlayer, RandomPlayer, schedule, num_workers=2, chunk_size=5)
+    assert pooled == in_process
+    assert [(result.seed, result.seat) for result in pooled] == schedule
+    assert sum(histogram.count for histogram in histograms) == sum(result.steps for result in pooled)
+
+
+def test_games_leave_the_torch_generator_alone():
+    torch.manual_seed(11)
+    expected = torch.rand(3)
+    torch.manual_seed(11)
+    play_schedule(RandomPlayer, RandomPlayer, seat_schedule(4), num_workers=0)
+    assert torch.equal(torch.rand(3), expected)
+
+
+def test_evaluate_summary():
+    result = evaluate(RandomPlayer, RandomPlayer, 20, num_workers=0)
+    assert result.games == result.wins + result.losses + result.draws == 20
+    assert result.ci_low <= result.win_rate <= result.ci_high
+    assert result.latency[0].decisions > 0 and result.games_per_sec > 0
+    low, high = wilson_interval(50, 100)
+    assert abs(low - 0.4038) < 1e-3 and abs(high - 0.5962) < 1e-3
+
+
+def test_duplicate_deals_cancel_between_identical_agents():
+    result = evaluate(RandomPlayer, RandomPlayer, 20, num_workers=0, duplicate=True)
+    assert result.games == 20 and result.win_rate == 0.5 and result.std_error == 0
+    assert duplicate_schedule(2, seed=3) == [(3, 0), (3, 1), (4, 0), (4, 1)]
+
+
+def test_common_random_numbers():
+    result = compare(RandomPlayer, RandomPlayer, RandomPlayer, 10, num_workers=0, duplicate=False)
+    assert result.games == 10 and result.score_difference == 0
+    assert result.result_a.wins == result.result_b.wins
+
+
+def test_comparison_shares_one_pool():
+    pooled = compare(RandomPlayer, RandomPlayer, RandomPlayer, 8, num_workers=2, chunk_size=3)
+    in_process = compare(RandomPlayer, RandomPlayer, RandomPlayer, 8, num_workers=0)
+    assert pooled.score_difference == in_process.score_difference == 0
+    assert pooled.result_a.wins == in_process.result_a.wins
+
+
+def test_game_counts_are_checked():
+    with pytest.raises(ValueError):
+        compare(RandomPlayer, RandomPlayer, RandomPlayer, 0, num_workers=0)
+    with pytest.raises(ValueError):
+        evaluate(RandomPlayer, RandomPlayer, 7, num_workers=0, duplicate=True)
+    assert evaluate(RandomPlayer, RandomPlayer, 7, num_workers=0).games == 7
+
+
+def test_sprt():
+    sprt = SPRT(0.5, 0.6)
+    rand = np.random.RandomState(0)
+    assert sprt.decide(rand.binomial(1, 0.5, size=5)) is None
+    assert sprt.decide(rand.binomial(1, 0.7, size=2000)) == ACCEPT_H1
+    assert sprt.decide(rand.binomial(1, 0.4, size=2000)) == ACCEPT_H0
+    result = evaluate(RandomPlayer, RandomPlayer, 400, num_workers=0, duplicate=True, sprt=sprt, batch_games=20)
+    assert result.sequential.decision == ACCEPT_H0 and result.games < 400
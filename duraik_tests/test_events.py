@@ -0,0 +1,96 @@
+"""
+This file tests the event hooks of the game engines
+"""
+from durak_common.events import STEP, TAKE, ROUND_OVER, GAME_END
+from two_game import GameRunner
+from agents import RandomPlayer
+from duraik_tests.test_history import play_game, seeded_random_player
+
+
+def record_events(engine):
+    events = {event: [] for event in (STEP, TAKE, ROUND_OVER, GAME_END)}
+    for event, payloads in events.items():
+        engine.add_listener(event, payloads.append)
+    return events
+
+
+def test_three_game_events(capsys):
+    game, _ = play_game(7)
+    game.reset_game()
+    events = record_events(game)
+    while not game.is_done:
+        game.step()
+    assert capsys.readouterr().out == ""
+    assert len(events[STEP]) == len(game.history.actions)
+    assert events[STEP][-1].next_state == game.current_state()
+    for prev, nxt in zip(events[STEP], events[STEP][1:]):
+        assert prev.next_state == nxt.state
+    assert len(events[TAKE]) == sum(event.defender_took for event in events[ROUND_OVER])
+    assert all(len(event.cards) for event in events[TAKE])
+    assert len(events[GAME_END]) == 1
+    assert list(events[GAME_END][0].rewards) == game.get_rewards()
+
+
+def test_game_runner_events():
+    runner = GameRunner()
+    runner.set_agents([seeded_random_player(0), seeded_random_player(1)])
+    events = record_events(runner)
+    rewards = runner.run(seed=4)
+    assert len(events[STEP]) == len(runner.action_history)
+    assert [event.next_state for event in events[STEP]] == runner.state_history[1:]
+    assert len(events[GAME_END]) == 1
+    assert events[GAME_END][0].rewards == rewards
+    for event in events[TAKE]:
+        assert event.cards
+
+
+def record_sequence(engine):
+    sequence = []
+    for event in (STEP, TAKE, ROUND_OVER, GAME_END):
+        engine.add_listener(event, lambda payload, event=event: sequence.append((event, payload)))
+    return sequence
+
+
+def check_sequence(sequence):
+    """
+    Both engines emit STEP first, then TAKE if the defender picked the table up, then ROUND_OVER, and GAME_END
+    last, with the taken cards in table order: the attack cards, then the defend cards.
+    """
+    names = [event for event, _ in sequence]
+    assert names[0] == STEP and names[-1] == GAME_END and names.count(GAME_END) == 1
+    for index, (event, payload) in enumerate(sequence):
+        if event == TAKE:
+            step = sequence[index - 1]
+            assert step[0] == STEP and names[index + 1] == ROUND_OVER
+            assert tuple(payload.cards) == tuple(step[1].state.attack_table + step[1].state.defend_table)
+        elif event == ROUND_OVER:
+            assert names[index - 1] in (STEP, TAKE)
+            assert payload.defender_took == (names[index - 1] == TAKE)
+    assert names[-2] in (STEP, ROUND_OVER)
+    assert TAKE in names
+
+
+def test_engines_emit_events_in_the_same_order():
+    game, _ = play_game(7)
+    game.reset_game()
+    three_game_sequence = record_sequence(game)
+    while not game.is_done:
+        game.step()
+    check_sequence(three_game_sequence)
+
+    runner = GameRunner()
+    runner.set_agents([seeded_random_player(0), seeded_random_player(1)])
+    two_game_sequence = record_sequence(runner)
+    runner.run(seed=4)
+    check_sequence(two_game_sequence)
+
+
+def test_listeners_can_be_removed():
+    runner = GameRunner()
+    runner.set_agents([RandomPlayer(0), RandomPlayer(1)])
+    steps = []
+    runner.add_listener(STEP, steps.append)
+    runner.remove_listener(STEP, steps.append)
+    assert not runner.has_listeners(STEP)
+    runner.run(seed=1)
+    assert steps == []
@@ -0,0 +1,72 @@
+"""
+This file tests the action-log history of the three_game engine
+"""
+import pickle
+
+import numpy as np
+
+from three_game import DurakGame
+from agents import RandomPlayer
+
+
+def seeded_random_player(player_id):
+    player = RandomPlayer(player_id)
+    player.np_random = np.random.RandomState(player_id)
+    return player
+
+
+def play_game(seed: int):
+    game = DurakGame()
+    game.configure({
+        'game_num_players': 3,
+        'lowest_card': 6,
+        'agents': [seeded_random_player] * 3,
+        'seed': seed,
+    })
+    game.init_game()
+    states = [game.current_state()._replace(np_rand=None)]
+    while not game.is_done and len(states) < 100:
+        game.step()
+        states.append(game.current_state()._replace(np_rand=None))
+    return game, states
+
+
+def test_history_replays_states():
+    game, states = play_game(3)
+    history = game.history
+    assert len(history) == len(states)
+    assert len(history.actions) == len(states) - 1
+    assert set(history.checkpoints) == set(range(0, len(states), history.checkpoint_every))
+    for ply in [0, 1, 31, 32, 33, len(states) - 1]:
+        assert history.state_at(ply) == states[ply]
+
+
+def test_observations_are_lazy_and_cached():
+    game, states = play_game(5)
+    history = game.history
+    observations = history.observations(1)
+    assert len(observations) == len(states)
+    assert history._observations == {}
+    assert observations[10] == states[10].observable(1)
+    assert len(history._observations[1]) == 11
+    assert 0 not in history._observations
+    assert list(observations) == [state.observable(1) for state in states]
+    assert observations[-1] == game.get_observable_state(1)
+
+
+def test_forks_share_the_log():
+    game, states = play_game(3)
+    history = game.history
+    fork = history.fork()
+    assert fork._parent is history and fork._actions == []
+    assert fork.actions == history.actions and len(fork) == len(history)
+    fork.append(0, 109, game.checkpoint)
+    second = fork.fork().fork()
+    second.append(1, 108, game.checkpoint)
+    history.append(2, 110, game.checkpoint)
+    assert fork.actions == history.actions[:-1] + [(0, 109)]
+    assert second.actions == history.actions[:-1] + [(0, 109), (1, 108)]
+    assert second._parent is fork
+    assert second.state_at(len(states) - 1) == states[-1]
+    restored = pickle.loads(pickle.dumps(second))
+    assert restored._parent is None and restored.actions == second.actions
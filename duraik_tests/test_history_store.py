@@ -0,0 +1,94 @@
+"""
+This file tests the columnar history store
+"""
+import json
+
+import numpy as np
+
+from three_game.history_store import HistoryWriter, HistoryReader, pack_cards, unpack_cards, cards_from_mask
+from duraik_tests.test_history import play_game
+
+
+def test_pack_round_trip():
+    cards = (('S', 6), ('H', 12), ('C', 14))
+    mask = unpack_cards(np.array([pack_cards(cards)], dtype=np.uint64))[0]
+    assert mask.sum() == 3
+    assert set(cards_from_mask(mask)) == set(cards)
+
+
+def test_replay_later_game_from_store(tmp_path):
+    game, _ = play_game(4)
+    with HistoryWriter(tmp_path) as writer:
+        for _ in range(3):
+            game.reset_game()
+            while not game.is_done:
+                game.step()
+            game.save_history(writer)
+    reader = HistoryReader(tmp_path)
+    seeds = reader.columns["seeds"]
+    assert len(set(seeds.tolist())) == 3
+
+    replay, _ = play_game(0)
+    replay.init_game(init_players=False, seed=int(seeds[1]))
+    columns = reader.game(1)
+    for ply, (player, action) in enumerate(zip(columns["player"], columns["action"])):
+        assert [set(hand) for hand in replay.player_hands] == [set(hand) for hand in reader.hands_at(1, ply)]
+        if action >= 0:
+            replay._do_step(int(player), int(action))
+    assert replay.is_done
+
+
+def test_write_and_read_games(tmp_path):
+    games = [play_game(seed) for seed in (1, 2, 7)]
+    with HistoryWriter(tmp_path, games_per_shard=2) as writer:
+        for game, _ in games[:2]:
+            game.save_history(writer)
+    games[2][0].save_history(tmp_path)
+
+    reader = HistoryReader(tmp_path)
+    assert len(reader.index["shards"]) == 2
+    assert reader.num_players == 3
+    assert reader.num_games == 3
+    assert reader.num_plies == sum(len(states) for _, states in games)
+    for i, (game, states) in enumerate(games):
+        columns = reader.game(i)
+        assert list(columns["action"][:-1]) == [action for _, action in game.history.actions]
+        assert columns["action"][-1] == -1
+        assert (columns["game"] == i).all()
+        assert list(columns["player"]) == [state.player_taking_action for state in states]
+        assert list(columns["deck_size"]) == [len(state.deck) for state in states]
+        assert list(columns["attack_size"]) == [len(state.attack_table) for state in states]
+        assert reader.columns["seeds"][i] == game.history.seed == game.seed
+        for ply in (0, len(states) // 2, len(states) - 1):
+            hands = reader.hands_at(i, ply)
+            assert [set(hand) for hand in hands] == [set(hand) for hand in states[ply].player_hands]
+
+
+def test_reader_opens_shards_lazily(tmp_path):
+    games = [play_game(seed)[0] for seed in (1, 2, 3)]
+    with HistoryWriter(tmp_path, games_per_shard=1) as writer:
+        for game in games:
+            game.save_history(writer)
+    # an older store's compressed shard is still readable
+    old = tmp_path / "shard_000002"
+    np.savez_compressed(tmp_path / "old.npz", **{path.stem: np.load(path) for path in old.iterdir()})
+    index = json.loads((tmp_path / "index.json").read_text())
+    index["shards"][2]["file"] = "old.npz"
+    (tmp_path / "index.json").write_text(json.dumps(index))
+
+    reader = HistoryReader(tmp_path)
+    assert all("hands" not in shard._arrays for shard in reader._shards.values())
+    hands = games[1].history.state_at(0).player_hands
+    assert [set(hand) for hand in reader.hands_at(1, 0)] == [set(hand) for hand in hands]
+    assert isinstance(reader._shards[1]["hands"], np.memmap)
+    assert "hands" not in reader._shards[0]._arrays
+    assert list(reader.game(2)["action"][:-1]) == [action for _, action in games[2].history.actions]
+    assert (reader.game(2)["game"] == 2).all()
+    assert len(reader.columns["hands"]) == reader.num_plies
+
+
+def test_empty_store(tmp_path):
+    HistoryWriter(tmp_path).close()
+    reader = HistoryReader(tmp_path)
+    assert reader.num_games == 0 and reader.num_plies == 0
+    assert reader.columns["rewards"].shape == (0, 0) and reader.columns["hands"].ndim == 2
@@ -1,9 +1,17 @@
+import time
+
+import numpy as np
+import pytest
+
 from three_game import DurakGame, DurakAction, DurakDeck
-from agents import RandomPlayer, MCTSPlayer
-from test_duraik_game import get_normal_random_game
+from agents import MCTSPlayer, mcts
+from agents.mcts import ArrayTree, ISMCTSNode, MCTSNode, NodeCache, lockstep_rollout, determinize, estimate_node_bytes, random_games_from_observation_state, information_set_search, merge_root_statistics, _information_set_simulation
+from duraik_tests.test_duraik_game import get_normal_random_game
+from duraik_tests.test_history import play_game, seeded_random_player
 
 
 def test_mcts():
+    np.random.seed(0)
     game = get_normal_random_game()
     hands = [
         [('S', 6), ('H', 12), ('D', 14), ('S', 7)],
@@ -11,20 +19,291 @@ def test_mcts():
         [('D', 6), ('D', 11)],
     ]
 
-    mcts_player = MCTSPlayer(0, hand=[])
+    mcts_player = MCTSPlayer(0)
     game.players[0] = mcts_player
 
     visible_card = ('S', 9)
-    for player, hand in zip(game.players, hands):
-        player.hand = hand
+    game.player_hands = hands
     game.visible_card = visible_card
     game.player_taking_action = 0
     game.defender = 1
     game.attackers = [0]
     game.is_done = False
     game.deck.deck = []
-    game.graveyard = DurakDeck.deck_without(hands[0] + hands[1] + hands[2]).new_deck
+    game.graveyard = DurakDeck.deck_without(hands[0] + hands[1] + hands[2]).deck
     game.step()
+    assert len(game.history.actions) == 1
+    assert DurakAction.is_attack(game.history.actions[0][1])
+
+
+def test_determinize_keeps_observation():
+    _, states = play_game(7)
+    rand = np.random.RandomState(0)
+    for state in states[::7]:
+        for player_id in range(3):
+            observation = state.observable(player_id)
+            sampled = determinize(observation, rand)
+            assert sampled.state.observable(player_id) == observation
+            cards = sum(sampled.state.player_hands, ()) + sampled.state.deck + sampled.state.attack_table \
+                + sampled.state.defend_table + sampled.state.graveyard
+            assert len(cards) == len(set(cards)) == DurakAction.n(4)
+
+
+def test_determinizations_are_clones():
+    _, states = play_game(7)
+    observation = states[12].observable(1)
+    games = random_games_from_observation_state(observation, 20, np_rand=np.random.RandomState(0))
+    rand = np.random.RandomState(0)
+    for game in games:
+        assert game.checkpoint() == DurakGame.from_checkpoint(determinize(observation, rand), 3, 6).checkpoint()
+        assert game.get_observable_state(1) == observation
+    assert len({tuple(game.deck.deck) for game in games}) > 1
+
+
+def test_information_set_search():
+    _, states = play_game(7)
+    state = states[10]
+    observation = state.observable(state.player_taking_action)
+    game = DurakGame.from_checkpoint(determinize(observation), 3, 6)
+    stats = information_set_search(observation, num_simulations=20, seed=0)
+    assert set(stats) <= set(game.get_legal_actions(observation.player_id))
+    assert sum(visits for visits, _ in stats.values()) == 20
+    assert stats == information_set_search(observation, num_simulations=20, seed=0)
+
+    merged = merge_root_statistics([{1: (2, 1.0), 3: (1, -1.0)}, {1: (1, 1.0)}])
+    assert merged == {1: (3, 2.0), 3: (1, -1.0)}
+
+
+def test_information_set_avails_count_every_simulation():
+    _, states = play_game(7)
+    state = states[8]
+    observation = state.observable(state.player_taking_action)
+    actions = DurakGame.from_checkpoint(determinize(observation), 3, 6).get_legal_actions(observation.player_id)
+    assert len(actions) > 1
+    rand = np.random.RandomState(0)
+    players = MCTSPlayer.make_rollout_players(3, rand)
+    root = ISMCTSNode()
+    simulations = len(actions) + 3
+    for _ in range(simulations):
+        _information_set_simulation(root, observation, players, rand, 1.414)
+    # The observer's own actions are legal in every determinization, so each child counts the simulations
+    # since it was added, including those that expanded one of its siblings
+    assert len(root.children) == len(actions)
+    for i, child in enumerate(root.children.values()):
+        assert child.avails == simulations - i
+
+
+def test_node_cache_evicts_least_visited_subtrees():
+    _, states = play_game(7)
+    observations = [state.observable(0) for state in states[:5]]
+    root = MCTSNode(observations[0], [])
+    first = MCTSNode(observations[1], [], root)
+    grandchild = MCTSNode(observations[2], [], first)
+    second = MCTSNode(observations[3], [], root)
+    root.add_child(0, first)
+    first.add_child(0, grandchild)
+    root.add_child(1, second)
+    for node, visits in ((root, 5), (first, 1), (grandchild, 1), (second, 3)):
+        node.visits = visits
+    nodes = (root, first, grandchild, second)
+    cache = NodeCache(max_bytes=sum(estimate_node_bytes(node) for node in nodes))
+    for node in nodes:
+        cache.add(node)
+    assert len(cache) == 4 and cache.bytes == cache.max_bytes and cache.evictions == 0
+    assert cache.get(observations[1]) is first
+    assert cache.get(observations[4]) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # The least visited node goes with its subtree, even though it was just looked up
+    cache.add(MCTSNode(observations[4], []))
+    assert cache.evictions == 2 and cache.bytes <= 0.9 * cache.max_bytes
+    assert observations[1] not in cache and observations[2] not in cache
+    assert list(root.children) == [1] and first.parent is None
+
+    cache.discard(root)
+    assert len(cache) == 1 and observations[4] in cache
+
+
+def test_mcts_reroots_at_played_child():
+    np.random.seed(3)
+    _, states = play_game(7)
+    state = states[8]
+    observation = state.observable(state.player_taking_action)
+    actions = DurakGame.from_checkpoint(determinize(observation), 3, 6).get_legal_actions(observation.player_id)
+    player = MCTSPlayer(observation.player_id, num_simulations=30)
+    action = player.choose_action(observation, actions)
+    root = player._root
+    child = root.children[action]
+    siblings = [node for node in root.children.values() if node is not child]
+    visits = child.visits
+    player.choose_action(child.state, child.actions)
+    assert player.reroots == 1 and player._root is child
+    assert child.parent is None and child.visits > visits
+    assert observation not in player.node_cache
+    assert all(sibling.state not in player.node_cache for sibling in siblings)
+
+
+def test_mcts_reuses_tree_across_moves():
+    np.random.seed(1)
+    player = MCTSPlayer(0, num_simulations=30, max_cache_bytes=20_000)
+    game = DurakGame()
+    game.configure({'game_num_players': 3, 'lowest_card': 6, 'agents': [seeded_random_player] * 3, 'seed': 1})
+    game.init_game()
+    game.players[0] = player
+    while not game.is_done:
+        game.step()
+    assert player.node_cache.bytes <= 20_000
+    assert player.node_cache.evictions > 0
+    assert player.reroots > 0
+
+
+def _assert_consistent_visits(root: MCTSNode, simulations: int):
+    assert root.visits == simulations + 1
+    assert sum(child.visits for child in root.children.values()) == simulations
+    nodes = [root]
+    while nodes:
+        node = nodes.pop()
+        assert node.virtual_loss == 0
+        # Every simulation through a node also visits a child of it, except the one that created the node and
+        # those ending at a finished game. The root starts out with a visit instead
+        assert node.visits >= sum(child.visits for child in node.children.values()) + 1
+        nodes.extend(node.children.values())
+
+
+def test_tree_parallel_search_releases_virtual_loss():
+    np.random.seed(2)
+    _, states = play_game(7)
+    state = states[10]
+    observation = state.observable(state.player_taking_action)
+    actions = DurakGame.from_checkpoint(determinize(observation), 3, 6).get_legal_actions(observation.player_id)
+    player = MCTSPlayer(observation.player_id, num_simulations=16, num_threads=4)
+    root = player.get_node(observation, actions)
+    stats = player.tree_parallel_search(root)
+    assert stats.simulations == 16
+    assert stats.rollout > 0 and stats.selection > 0 and stats.backup > 0
+    _assert_consistent_visits(root, 16)
+
+    player = MCTSPlayer(observation.player_id, num_simulations=16, num_threads=4, num_workers=2)
+    try:
+        root = player.get_node(observation, actions)
+        assert player.tree_parallel_search(root).simulations == 16
+    finally:
+        player.close()
+    _assert_consistent_visits(root, 16)
+
+
+def test_tree_parallel_search_respects_deadline():
+    _, states = play_game(7)
+    state = states[10]
+    observation = state.observable(state.player_taking_action)
+    actions = DurakGame.from_checkpoint(determinize(observation), 3, 6).get_legal_actions(observation.player_id)
+    player = MCTSPlayer(observation.player_id, num_simulations=None, time_budget=0.2, num_threads=4)
+    root = player.get_node(observation, actions)
+    stats = player.tree_parallel_search(root)
+    assert 0 < stats.simulations and stats.elapsed < 1.0
+    _assert_consistent_visits(root, stats.simulations)
+    with pytest.raises(ValueError):
+        MCTSPlayer(0, num_simulations=None, num_threads=4).tree_parallel_search(root)
+
+
+def test_tree_parallel_search_overlaps_rollouts(monkeypatch):
+    simulate_job = mcts._simulate_job
+
+    def slow_simulate_job(job):
+        # Stands in for a rollout that releases the GIL, e.g. one running in a native engine
+        time.sleep(0.02)
+        return simulate_job(job)
+
+    monkeypatch.setattr(mcts, "_simulate_job", slow_simulate_job)
+    _, states = play_game(7)
+    state = states[10]
+    observation = state.observable(state.player_taking_action)
+    actions = DurakGame.from_checkpoint(determinize(observation), 3, 6).get_legal_actions(observation.player_id)
+    elapsed = {}
+    for num_threads in (1, 4):
+        player = MCTSPlayer(observation.player_id, num_simulations=24, num_threads=num_threads)
+        root = player.get_node(observation, actions)
+        if num_threads == 1:
+            start = time.perf_counter()
+            player.tree_parallel_search(root)
+            elapsed[num_threads] = time.perf_counter() - start
+        else:
+            elapsed[num_threads] = player.tree_parallel_search(root).elapsed
+        _assert_consistent_visits(root, 24)
+    assert elapsed[4] < elapsed[1] / 2
+
+
+def test_lockstep_rollout():
+    _, states = play_game(7)
+    state = states[0]
+    observation = state.observable(state.player_taking_action)
+    actions = DurakGame.from_checkpoint(determinize(observation), 3, 6).get_legal_actions(observation.player_id)
+    action = actions[0]
+    result = lockstep_rollout(observation, action, 32, np_rand=np.random.RandomState(0))
+    assert -1.0 <= result.mean <= 1.0
+    assert 0.0 <= result.variance <= 1.0
+    assert result.next_state.player_id == observation.player_id
+    assert result == lockstep_rollout(observation, action, 32, np_rand=np.random.RandomState(0))
+
+    np.random.seed(0)
+    player = MCTSPlayer(observation.player_id, num_simulations=5, rollouts_per_leaf=8)
+    assert len(actions) > 1
+    assert player.choose_action(observation, actions) in actions
+
+
+def test_anytime_search_respects_deadline():
+    np.random.seed(0)
+    _, states = play_game(7)
+    observation = states[0].observable(states[0].player_taking_action)
+    actions = DurakGame.from_checkpoint(determinize(observation), 3, 6).get_legal_actions(observation.player_id)
+    player = MCTSPlayer(observation.player_id, num_simulations=None, time_budget=0.1)
+    assert player.choose_action(observation, actions) in actions
+    stats = player.last_search_stats
+    assert stats.simulations > 1
+    assert stats.stopped_early or stats.elapsed >= 0.1
+    assert stats.selection + stats.expansion + stats.rollout + stats.backup <= stats.elapsed
+
+    for information_set in (False, True):
+        player = MCTSPlayer(
+            observation.player_id, num_simulations=None, time_budget=1e-9, information_set=information_set
+        )
+        assert player.choose_action(observation, actions) in actions
+        assert player.last_search_stats.simulations == 1
+
+    player = MCTSPlayer(observation.player_id, num_simulations=None)
+    with pytest.raises(ValueError):
+        player.choose_action(observation, actions)
+
+
+def test_array_tree():
+    _, states = play_game(7)
+    observation = states[0].observable(0)
+    tree = ArrayTree(capacity=2)
+    tree.reset(observation, [10, 11, 12])
+    assert tree.size == 4 and tree.capacity >= 4
+    assert tree.action[tree.children(0)].tolist() == [10, 11, 12]
+    assert tree.select_leaf() == 0
+
+    tree.expand(2, observation, [20, 21])
+    tree.backpropagate(2, 1.0)
+    tree.backpropagate(1, -1.0)
+    tree.backpropagate(3, -1.0)
+    assert tree.visits[:4].tolist() == [3, 1, 1, 1]
+    assert tree.value[0] == -1.0
+    assert tree.best_action() == 11
+    # The root is fully visited, so selection descends by UCB into the only expanded child
+    assert tree.select_leaf() == 2
+    assert tree.parent[tree.children(2)].tolist() == [2, 2]
+
+    tree.reset(observation, [5])
+    assert tree.size == 2 and tree.visits[:6].sum() == 0
+
 
-if __name__ == '__main__':
-    test_mcts()
+def test_mcts_with_array_tree():
+    np.random.seed(0)
+    _, states = play_game(7)
+    observation = states[0].observable(states[0].player_taking_action)
+    actions = DurakGame.from_checkpoint(determinize(observation), 3, 6).get_legal_actions(observation.player_id)
+    player = MCTSPlayer(observation.player_id, num_simulations=20, array_tree=True)
+    assert player.choose_action(observation, actions) in actions
+    assert player._array_tree.visits[0] == 20
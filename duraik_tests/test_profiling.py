@@ -0,0 +1,53 @@
+import json
+
+import numpy as np
+
+from three_game import DurakGame
+from durak_common.profiling import PhaseHistogram, PhaseProfiler
+from two_game import GameRunner
+from duraik_tests.test_history import seeded_random_player
+
+
+def test_histogram_quantiles():
+    histogram = PhaseHistogram()
+    values = np.random.RandomState(0).randint(1, 100_000, size=2000)
+    for value in values:
+        histogram.add(int(value))
+    assert histogram.count == 2000 and histogram.max == values.max()
+    for q in (0.5, 0.9, 0.99):
+        assert abs(histogram.quantile(q) - np.quantile(values, q)) <= 0.15 * np.quantile(values, q)
+
+
+def test_game_runner_phases(tmp_path):
+    runner = GameRunner()
+    runner.set_agents([seeded_random_player(0), seeded_random_player(1)])
+    profiler = PhaseProfiler(profile_games=1)
+    runner.profiler = profiler
+    for seed in range(3):
+        runner.run(seed=seed)
+    assert profiler.games == 3
+    phases = {summary.phase: summary for summary in profiler.summary()}
+    assert set(phases) == {'decision', 'information_state', 'legal_actions', 'transition', 'rewards', 'history'}
+    assert phases['decision'].count == phases['transition'].count
+    assert profiler.profile_stats().total_calls > 0
+
+    profiler.save_json(tmp_path / 'phases.json')
+    with open(tmp_path / 'phases.json') as f:
+        assert json.load(f)['games'] == 3
+    assert profiler.format_table().splitlines()[0].startswith('phase')
+
+
+def test_durak_game_phases():
+    game = DurakGame()
+    game.configure({'game_num_players': 3, 'lowest_card': 6, 'agents': [seeded_random_player] * 3, 'seed': 0})
+    game.init_game()
+    game.profiler = PhaseProfiler()
+    steps = 0
+    while not game.is_done:
+        game.step()
+        steps += 1
+    phases = {summary.phase: summary.count for summary in game.profiler.summary()}
+    assert phases['decision'] == phases['transition'] == phases['history'] == steps
+    assert phases['legal_actions'] == steps
+    assert game.profiler.games == 1
+    assert game.clone().profiler is None
@@ -0,0 +1,76 @@
+"""
+This file tests the network-guided PUCT search
+"""
+import numpy as np
+import torch
+
+from agents.dql import DQN, state_input_dim
+from agents.puct import LeafQueue, NetworkEvaluator, PUCTPlayer, puct_search_many
+from three_game import DurakAction
+from duraik_tests.test_history import play_game
+
+
+def make_evaluator():
+    torch.manual_seed(0)
+    return NetworkEvaluator(DQN(state_input_dim(3), DurakAction.num_actions()))
+
+
+def test_network_evaluator_priors():
+    evaluator = make_evaluator()
+    _, states = play_game(7)
+    observations = [state.observable(0) for state in states[:3]]
+    actions = [[0, 1, 2], [108], [5, 109]]
+    priors, values = evaluator(observations, actions)
+    assert evaluator.forward_passes == 1
+    assert [len(prior) for prior in priors] == [3, 1, 2]
+    assert all(np.isclose(prior.sum(), 1.0) for prior in priors)
+    assert values.shape == (3,) and np.all(np.abs(values) <= 1.0)
+
+
+def test_losing_leaf_gets_a_negative_value():
+    evaluator = make_evaluator()
+    game, _ = play_game(7)
+    while not game.is_done:
+        game.step()
+    loser = game.get_rewards().index(-1)
+    # a network scoring every action of the leaf as a loss, stopping a little less so
+    out = evaluator.network.out
+    with torch.no_grad():
+        out.weight.zero_()
+        out.bias.fill_(-2.0)
+        out.bias[109] = -1.0
+    priors, values = evaluator([game.get_observable_state(loser)], [[108, 109]])
+    assert values[0] < 0 and np.isclose(values[0], np.tanh(-1.0))
+    assert np.allclose(priors[0], np.exp([-2.0, -1.0]) / np.exp([-2.0, -1.0]).sum())
+
+
+def test_leaf_queue_evaluates_in_one_batch():
+    calls = []
+
+    def evaluator(states, actions):
+        calls.append(len(states))
+        return [np.ones(len(a)) / len(a) for a in actions], np.arange(len(states), dtype=float)
+
+    results = []
+    queue = LeafQueue(evaluator)
+    for i in range(3):
+        queue.add(None, [0, 1], lambda priors, value: results.append(value))
+    queue.flush()
+    queue.flush()
+    assert calls == [3]
+    assert results == [0.0, 1.0, 2.0]
+
+
+def test_puct_search_many_batches_leaves():
+    evaluator = make_evaluator()
+    _, states = play_game(7)
+    observations = [state.observable(state.player_taking_action) for state in states[:12:4]]
+    visits = puct_search_many(observations, evaluator, 32, batch_size=8, np_rand=np.random.RandomState(0))
+    assert len(visits) == 3
+    # The first simulation of every search only expands its root
+    assert all(sum(v.values()) == 31 for v in visits)
+    assert evaluator.forward_passes < 32
+
+    np.random.seed(0)
+    player = PUCTPlayer(observations[0].player_id, evaluator.network, num_simulations=16)
+    assert player.choose_action(observations[0], list(visits[0])) in visits[0]
@@ -0,0 +1,55 @@
+import functools
+
+import numpy as np
+import pytest
+
+from rl.durak_env import ThreeGameEnv, TwoGameEnv
+from rl.vector_env import SubprocVectorEnv
+
+
+def play_random(env, rand):
+    steps = 0
+    done = False
+    while not done:
+        mask = env.get_legal_action_mask()
+        assert sorted(np.flatnonzero(mask)) == sorted(env.get_legal_actions())
+        rewards, observation, done = env.step(rand.choice(np.flatnonzero(mask)))
+        assert observation.shape == (env.get_state_size(),)
+        steps += 1
+    assert not env.get_legal_action_mask().any()
+    return rewards, steps
+
+
+@pytest.mark.parametrize("make_env", [TwoGameEnv, ThreeGameEnv])
+def test_env_plays_to_the_end(make_env):
+    env = make_env(seed=3)
+    first = env.reset()
+    rewards, steps = play_random(env, np.random.RandomState(0))
+    assert steps > 0 and rewards.shape == (env.get_num_players(),) and rewards.any()
+    with pytest.raises(ValueError):
+        env.step(0)
+    assert np.array_equal(env.reset(seed=3), first)
+
+
+def test_vector_env_matches_single_envs():
+    env_fn = functools.partial(TwoGameEnv, lowest_rank=6)
+    rand = np.random.RandomState(1)
+    with SubprocVectorEnv([env_fn] * 3) as envs:
+        singles = [env_fn() for _ in range(3)]
+        observations = envs.reset(seed=10)
+        for index, env in enumerate(singles):
+            assert np.array_equal(observations[index], env.reset(seed=10 + index))
+        for _ in range(200):
+            actions = [rand.choice(np.flatnonzero(mask)) for mask in envs.legal_action_masks]
+            rewards, observations, dones = envs.step(actions)
+            for index, env in enumerate(singles):
+                expected_rewards, _, done = env.step(actions[index])
+                if done:
+                    env.reset()
+                assert dones[index] == done
+                assert np.array_equal(rewards[index], expected_rewards)
+                assert np.array_equal(observations[index], env.get_observation())
+                assert np.array_equal(envs.legal_action_masks[index], env.get_legal_action_mask())
+                assert envs.current_players[index] == env.get_current_player_id()
+        with pytest.raises(RuntimeError, match="not a legal action"):
+            envs.step([np.flatnonzero(~mask)[0] for mask in envs.legal_action_masks])
@@ -0,0 +1,73 @@
+import multiprocessing as mp
+from queue import Empty, Full
+
+import numpy as np
+import pytest
+
+from rl.shared_ring import SharedRing, transition_dtype
+
+DTYPE = transition_dtype(state_size=5, num_actions=4, num_players=2)
+
+
+def produce(ring, start, count):
+    records = np.zeros(count, dtype=DTYPE)
+    records["action"] = np.arange(start, start + count)
+    records["observation"] = records["action"][:, None]
+    for chunk in np.array_split(records, 7):
+        ring.put_many(chunk)
+    ring.close()
+
+
+def test_ring_put_get():
+    ring = SharedRing(DTYPE, capacity=2)
+    try:
+        ring.put(action=3, legal_mask=[True, False, True, False], rewards=[1, -1], done=True)
+        ring.put(action=4)
+        with pytest.raises(Full):
+            ring.put(block=False)
+        with pytest.raises(ValueError):
+            ring.put(reward=1)
+        record = ring.get()
+        assert record["action"] == 3 and record["done"] and list(record["rewards"]) == [1, -1]
+        assert list(record["legal_mask"]) == [True, False, True, False]
+        assert len(ring) == 1
+        assert ring.get_many(10)["action"].tolist() == [4]
+        with pytest.raises(Empty):
+            ring.get(timeout=0.01)
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_put_many_reports_partial_writes():
+    ring = SharedRing(DTYPE, capacity=2)
+    try:
+        records = np.zeros(3, dtype=DTYPE)
+        records["action"] = [1, 2, 3]
+        with pytest.raises(Full) as error:
+            ring.put_many(records, timeout=0.01)
+        assert error.value.written == 2
+        assert ring.get()["action"] == 1
+        ring.put_many(records[error.value.written:])
+        assert ring.get_many(2)["action"].tolist() == [2, 3]
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_ring_between_processes():
+    ring = SharedRing(DTYPE, capacity=16)
+    producer = mp.Process(target=produce, args=(ring, 100, 500))
+    producer.start()
+    try:
+        received = []
+        while len(received) < 500:
+            received.extend(ring.get_many(32, timeout=10))
+        producer.join()
+        actions = np.array([record["action"] for record in received])
+        assert actions.tolist() == list(range(100, 600))
+        assert np.array_equal(np.array([record["observation"] for record in received])[:, 0], actions)
+        assert len(ring) == 0
+    finally:
+        ring.close()
+        ring.unlink()
@@ -0,0 +1,5 @@
+"""
+Engine-independent pieces shared by three_game and two_game: event hooks and per-phase profiling.
+"""
+from .events import EventEmitter, STEP, ROUND_OVER, TAKE, GAME_END
+from .profiling import PhaseHistogram, PhaseProfiler
@@ -0,0 +1,76 @@
+"""
+Event hooks for the game engines. Listeners are registered per event name and called with a structured
+payload. Engines only build payloads when at least one listener is registered, so a game without listeners
+pays nothing beyond an empty dict check.
+
+Both engines emit the events of a step in the same order: STEP, then TAKE if the defender picked the table up
+and ROUND_OVER if the step ended the round, then GAME_END if it ended the game.
+"""
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+STEP = "step"
+ROUND_OVER = "round_over"
+TAKE = "take"
+GAME_END = "game_end"
+EVENTS = (STEP, ROUND_OVER, TAKE, GAME_END)
+
+
+class StepEvent(NamedTuple):
+    player_id: int  # player that took the action
+    action: int  # action taken
+    state: Any  # full state before the action
+    next_state: Any  # full state after the action
+    rewards: Tuple[float, ...]  # rewards for each player after the action
+
+
+class TakeEvent(NamedTuple):
+    player_id: int  # defender picking up the cards
+    cards: Tuple[tuple, ...]  # cards picked up from the table, the attack cards then the defend cards
+
+
+class RoundOverEvent(NamedTuple):
+    attackers: Tuple[int, ...]  # attackers of the round that just ended
+    defender: int  # defender of the round that just ended
+    defender_took: bool  # whether the defender picked up the table rather than beating it
+    state: Any  # full state once the round is over
+
+
+class GameEndEvent(NamedTuple):
+    rewards: Tuple[float, ...]  # final rewards for each player
+    num_steps: Optional[int]  # number of actions taken over the game, if known
+    state: Any  # final full state
+
+
+class EventEmitter:
+    """
+    Mixin giving an engine add_listener/remove_listener. Engines must set self._listeners = {} on init
+    and guard any payload construction with `if self._listeners:`.
+    """
+    __slots__ = ()
+    _listeners: Dict[str, List[Callable[[Any], None]]]
+
+    def add_listener(self, event: str, listener: Callable[[Any], None]):
+        if event not in EVENTS:
+            raise ValueError("Unknown event {}, must be one of {}".format(event, EVENTS))
+        self._listeners.setdefault(event, []).append(listener)
+
+    def remove_listener(self, event: str, listener: Callable[[Any], None]):
+        listeners = self._listeners.get(event, [])
+        if listener in listeners:
+            listeners.remove(listener)
+        if not listeners:
+            self._listeners.pop(event, None)
+
+    def has_listeners(self, event: str) -> bool:
+        return event in self._listeners
+
+    def _emit(self, event: str, payload: Any):
+        for listener in self._listeners.get(event, ()):
+            listener(payload)
+
+
+def print_step(event: StepEvent):
+    """
+    Listener reproducing the engines' old per-action printout, e.g. for games with a human player.
+    """
+    print(f"Player {event.player_id} chose action {event.action}")
@@ -0,0 +1,207 @@
+"""
+Per-phase latency instrumentation for the game engines. An engine with a PhaseProfiler attached records how
+long each phase of a step takes (agent decision, information-state construction, legal-move generation,
+transition, rewards, history bookkeeping and event emission) into per-phase histograms. Engines keep
+`self.profiler = None` by default and only read the clock behind `if profiler is not None:`, so a game
+without a profiler pays nothing beyond a None check per phase.
+
+    profiler = PhaseProfiler(profile_games=5)
+    runner.profiler = profiler
+    ...
+    print(profiler.format_table())
+    profiler.save_json("phases.json")
+    profiler.profile_stats().sort_stats("cumulative").print_stats(20)
+"""
+import cProfile
+import json
+import pstats
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+DECISION = "decision"
+INFORMATION_STATE = "information_state"
+LEGAL_ACTIONS = "legal_actions"
+TRANSITION = "transition"
+REWARDS = "rewards"
+HISTORY = "history"
+EVENT_EMISSION = "events"
+PHASES = (DECISION, INFORMATION_STATE, LEGAL_ACTIONS, TRANSITION, REWARDS, HISTORY, EVENT_EMISSION)
+
+# Each power of two of nanoseconds is split into this many buckets, so quantiles are within ~1/SUB_BUCKETS
+SUB_BUCKET_BITS = 2
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+
+class PhaseHistogram:
+    """
+    Log-linear histogram of durations in nanoseconds, with constant-time insertion.
+    """
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (64 * SUB_BUCKETS)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def bucket(ns: int) -> int:
+        if ns < SUB_BUCKETS:
+            return max(ns, 0)
+        exponent = ns.bit_length() - 1
+        return exponent * SUB_BUCKETS + ((ns >> (exponent - SUB_BUCKET_BITS)) & (SUB_BUCKETS - 1))
+
+    @staticmethod
+    def bucket_bounds(index: int):
+        exponent, sub = divmod(index, SUB_BUCKETS)
+        if exponent < SUB_BUCKET_BITS:
+            return index, index + 1
+        width = 1 << (exponent - SUB_BUCKET_BITS)
+        low = (SUB_BUCKETS + sub) * width
+        return low, low + width
+
+    def add(self, ns: int):
+        self.counts[self.bucket(ns)] += 1
+        self.count += 1
+        self.total += ns
+        if self.min is None or ns < self.min:
+            self.min = ns
+        if ns > self.max:
+            self.max = ns
+
+    def merge(self, other: "PhaseHistogram"):
+        """
+        Adds the durations recorded by other, e.g. in another process.
+        """
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates the q-quantile as the middle of the bucket holding it, clipped to the observed range.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                low, high = self.bucket_bounds(index)
+                return float(min(max((low + high) / 2, self.min), self.max))
+        return float(self.max)
+
+
+class PhaseSummary(NamedTuple):
+    phase: str
+    count: int
+    total_ms: float
+    mean_us: float
+    p50_us: float
+    p90_us: float
+    p99_us: float
+    max_us: float
+
+
+class PhaseProfiler:
+    """
+    Collects per-phase timings from the engines it is attached to. With profile_games > 0, cProfile also
+    runs over the first profile_games games.
+    """
+
+    def __init__(self, profile_games: int = 0):
+        self.histograms: Dict[str, PhaseHistogram] = {phase: PhaseHistogram() for phase in PHASES}
+        self.games = 0  # games finished
+        self.profile_games = profile_games
+        self._profile: Optional[cProfile.Profile] = None
+        self._profiling = False
+        self._in_game = False
+
+    def start_step(self) -> int:
+        """
+        Called by engines at the start of every step, starting a game on its first step.
+        :return: the clock, to pass to lap.
+        """
+        if not self._in_game:
+            self._in_game = True
+            if self.games < self.profile_games:
+                if self._profile is None:
+                    self._profile = cProfile.Profile()
+                self._profile.enable()
+                self._profiling = True
+        return time.perf_counter_ns()
+
+    def lap(self, phase: str, start: int) -> int:
+        """
+        Records the time since start under phase.
+        :return: the clock, to pass to the next lap.
+        """
+        now = time.perf_counter_ns()
+        self.histograms[phase].add(now - start)
+        return now
+
+    def end_game(self):
+        if not self._in_game:
+            return
+        if self._profiling:
+            self._profile.disable()
+            self._profiling = False
+        self._in_game = False
+        self.games += 1
+
+    def summary(self) -> List[PhaseSummary]:
+        """
+        :return: a summary of every phase that was recorded, in PHASES order.
+        """
+        summaries = []
+        for phase, histogram in self.histograms.items():
+            if not histogram.count:
+                continue
+            summaries.append(PhaseSummary(
+                phase=phase,
+                count=histogram.count,
+                total_ms=histogram.total / 1e6,
+                mean_us=histogram.total / histogram.count / 1e3,
+                p50_us=histogram.quantile(0.5) / 1e3,
+                p90_us=histogram.quantile(0.9) / 1e3,
+                p99_us=histogram.quantile(0.99) / 1e3,
+                max_us=histogram.max / 1e3,
+            ))
+        return summaries
+
+    def to_dict(self) -> dict:
+        return {
+            "games": self.games,
+            "phases": {summary.phase: summary._asdict() for summary in self.summary()},
+        }
+
+    def save_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def format_table(self) -> str:
+        summaries = self.summary()
+        total = sum(summary.total_ms for summary in summaries) or 1.0
+        lines = ["{:<18} {:>9} {:>10} {:>6} {:>9} {:>9} {:>9} {:>9}".format(
+            "phase", "count", "total_ms", "share", "mean_us", "p50_us", "p99_us", "max_us"
+        )]
+        for summary in summaries:
+            lines.append("{:<18} {:>9} {:>10.2f} {:>5.1f}% {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f}".format(
+                summary.phase, summary.count, summary.total_ms, 100 * summary.total_ms / total,
+                summary.mean_us, summary.p50_us, summary.p99_us, summary.max_us,
+            ))
+        return "\n".join(lines)
+
+    def profile_stats(self) -> Optional[pstats.Stats]:
+        """
+        :return: the cProfile statistics of the profiled games, or None if none were profiled.
+        """
+        if self._profile is None:
+            return None
+        return pstats.Stats(self._profile)
@@ -1,4 +1,5 @@
 from three_game import DurakGame
+from durak_common.events import STEP, print_step
 from agents import RandomPlayer, HumanPlayer
 
 
@@ -12,6 +13,7 @@ def main(*args, **kwargs):
     game = DurakGame()
     game.configure(gconfig)
     game.init_game()
+    game.add_listener(STEP, print_step)
     while not game.is_done:
         game.step()
     print(game.players)
@@ -0,0 +1,197 @@
+"""
+Env implementations of the two Durak engines. Both are turn-based: the observation and legal actions are
+always those of the player taking the next action, and step returns the rewards of every player, which are
+zero until the game is done.
+
+Observations are fixed-size float32 vectors and legal actions are also offered as a fixed-size boolean mask,
+so that batches of environments can be written into preallocated arrays, see rl.vector_env.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from three_game import DurakAction, DurakGame
+from two_game import backend as two_game_backend
+from two_game import game as two_game
+from agents.dql import encode_states, state_input_dim
+from .env import Env
+
+
+class DurakEnv(Env):
+    """
+    Common interface of the Durak environments on top of Env.
+    """
+
+    def reset(self, seed: Optional[int] = None) -> np.ndarray:
+        """
+        Deals a new game, with the next seed of the environment unless seed is given.
+        :return: the observation of the acting player
+        """
+        raise NotImplementedError
+
+    def step(self, action: int) -> Tuple[np.ndarray, np.ndarray, bool]:
+        """
+        Plays action for the acting player.
+        :return: a tuple of (rewards of every player, observation of the next acting player, done)
+        """
+        raise NotImplementedError
+
+    def get_num_actions(self) -> int:
+        raise NotImplementedError
+
+    def get_observation(self) -> np.ndarray:
+        """
+        :return: the observation of the acting player as a float32 vector of length get_state_size()
+        """
+        raise NotImplementedError
+
+    def get_legal_action_mask(self) -> np.ndarray:
+        """
+        :return: a boolean vector of length get_num_actions() flagging the legal actions, all False once done
+        """
+        mask = np.zeros(self.get_num_actions(), dtype=bool)
+        mask[self.get_legal_actions()] = True
+        return mask
+
+    def get_rewards(self) -> np.ndarray:
+        raise NotImplementedError
+
+    def is_done(self) -> bool:
+        raise NotImplementedError
+
+    def get_current_player(self) -> int:
+        return self.get_current_player_id()
+
+    def get_players(self) -> List[int]:
+        return list(range(self.get_num_players()))
+
+    def _next_seed(self, seed: Optional[int]) -> int:
+        if seed is None:
+            seed = self.seed
+        self.seed = seed + 1
+        return seed
+
+
+class TwoGameEnv(DurakEnv):
+    """
+    Heads-up Durak on two_game, played by the configured two_game backend. Observations are
+    ObservableGameState.to_array() of the acting player. The games are dealt with the deck of lowest_rank, by
+    default the backend's own.
+    """
+
+    def __init__(self, seed: int = 0, lowest_rank: Optional[int] = None):
+        super().__init__()
+        self.seed = seed
+        self.backend = two_game_backend.get_backend()
+        self.lowest_rank = lowest_rank if lowest_rank is not None else self.backend.lowest_rank
+        self.state: Optional[two_game.GameState] = None
+        self.legal_actions: List[two_game.DurakAction] = []
+        self.state_size = len(two_game.new_state(0, self.lowest_rank).observable(0).to_array())
+
+    def reset(self, seed: Optional[int] = None) -> np.ndarray:
+        self._set_state(self.backend.deal(self._next_seed(seed), self.lowest_rank))
+        return self.get_observation()
+
+    def _set_state(self, state: two_game.GameState):
+        self.legal_actions = self.backend.legal_actions(state) if not state.is_done else []
+        if not self.legal_actions and not state.is_done:
+            # the same convention as GameRunner.step: a player without moves ends the game
+            state = state._replace(is_done=True)
+        self.state = state
+
+    def step(self, action: int) -> Tuple[np.ndarray, np.ndarray, bool]:
+        if self.state.is_done:
+            raise ValueError("The game is done, reset the environment")
+        if action not in self.legal_actions:
+            raise ValueError(f"{DurakAction.action_to_string(action)} is not a legal action")
+        self._set_state(self.backend.step(self.state, DurakAction(action)))
+        return self.get_rewards(), self.get_observation(), self.state.is_done
+
+    def get_state_size(self) -> int:
+        return self.state_size
+
+    def get_num_actions(self) -> int:
+        return two_game.num_actions()
+
+    def get_legal_actions(self) -> List[int]:
+        return self.legal_actions
+
+    def get_num_players(self) -> int:
+        return 2
+
+    def get_state(self) -> two_game.GameState:
+        return self.state
+
+    def get_current_player_id(self) -> int:
+        return self.state.player_taking_action
+
+    def get_observation(self) -> np.ndarray:
+        return self.state.observable(self.state.player_taking_action).to_array().astype(np.float32)
+
+    def get_rewards(self) -> np.ndarray:
+        return np.array(two_game.rewards(self.state), dtype=np.float32)
+
+    def is_done(self) -> bool:
+        return self.state.is_done
+
+
+class ThreeGameEnv(DurakEnv):
+    """
+    Durak for num_players players on three_game. Observations are the agents.dql encoding of the acting
+    player's ObservableDurakGameState.
+    """
+
+    def __init__(self, seed: int = 0, num_players: int = 3, lowest_card: int = 6):
+        super().__init__()
+        self.seed = seed
+        self.num_players = num_players
+        self.lowest_card = lowest_card
+        self.game: Optional[DurakGame] = None
+        self._observation = np.zeros((1, state_input_dim(num_players)), dtype=np.float32)
+
+    def reset(self, seed: Optional[int] = None) -> np.ndarray:
+        self.game = DurakGame()
+        self.game.configure({
+            "game_num_players": self.num_players,
+            "lowest_card": self.lowest_card,
+            "agents": None,
+            "seed": self._next_seed(seed),
+        })
+        self.game.init_game(init_players=False)
+        return self.get_observation()
+
+    def step(self, action: int) -> Tuple[np.ndarray, np.ndarray, bool]:
+        if self.game.is_done:
+            raise ValueError("The game is done, reset the environment")
+        self.game._do_step(self.game.player_taking_action, DurakAction(action))
+        return self.get_rewards(), self.get_observation(), self.game.is_done
+
+    def get_state_size(self) -> int:
+        return self._observation.shape[1]
+
+    def get_num_actions(self) -> int:
+        return DurakAction.num_actions()
+
+    def get_legal_actions(self) -> List[int]:
+        if self.game.is_done:
+            return []
+        return self.game.get_legal_actions(self.game.player_taking_action)
+
+    def get_num_players(self) -> int:
+        return self.num_players
+
+    def get_state(self):
+        return self.game.current_state()
+
+    def get_current_player_id(self) -> int:
+        return self.game.player_taking_action
+
+    def get_observation(self) -> np.ndarray:
+        encode_states([self.game.get_observable_state(self.game.player_taking_action)], out=self._observation)
+        return self._observation[0].copy()
+
+    def get_rewards(self) -> np.ndarray:
+        return np.array(self.game.get_rewards(), dtype=np.float32)
+
+    def is_done(self) -> bool:
+        return self.game.is_done
@@ -0,0 +1,596 @@
+"""
+Head-to-head evaluation of heads-up agents across a process pool. Games are played with GameRunner on
+seeded deals, agent a taking seat 0 in even games and seat 1 in odd ones, so neither agent profits from
+always attacking first. Every worker builds the two agents once from picklable factories, e.g. loading a
+DQN checkpoint on the CPU with DQNCheckpoint, and keeps them for all the games it plays.
+
+    python -m rl.evaluation saved_models/heads_up_harder_9/dqn_agent.pt random --games 5000
+
+reports agent a's win rate with a Wilson confidence interval, games/sec and each agent's decision latency.
+
+Deal luck dominates single games, so there are options to need fewer of them for the same confidence:
+- duplicate deals (--duplicate) play every deal from both seats and score the pair,
+- compare (--against) plays two agents, e.g. checkpoints, against the same opponent on the same games
+  (common random numbers) and estimates the difference of their scores from the paired games,
+- a sequential probability ratio test (--sprt MU0 MU1) stops as soon as the score is shown to be MU0 or MU1.
+"""
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+
+from agents.easy_agents import DurakPlayer, RandomPlayer
+from durak_common.profiling import PhaseHistogram
+from two_game import GameRunner
+
+AgentFactory = Callable[[int], DurakPlayer]  # player id -> agent, e.g. an agent class
+
+
+class DQNCheckpoint:
+    """
+    Factory of greedy DQNPlayers loading a saved state dict on the CPU. The players are put in eval mode, in
+    which DQNPlayer never explores.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __call__(self, player_id: int) -> DurakPlayer:
+        from agents import DQNPlayer
+        agent = DQNPlayer(player_id, epsilon=0.0)
+        agent.load_state_dict(torch.load(self.path, map_location="cpu"))
+        agent.eval()
+        return agent
+
+    def __repr__(self):
+        return f"DQNCheckpoint({self.path!r})"
+
+
+def agent_factory(name: str) -> AgentFactory:
+    """
+    "random" for RandomPlayer, otherwise the path of a DQNPlayer state dict.
+    """
+    if name == "random":
+        return RandomPlayer
+    return DQNCheckpoint(name)
+
+
+class GameResult(NamedTuple):
+    seed: int  # seed of the deal
+    seat: int  # seat of agent a, agent b has the other
+    rewards: Tuple[float, float]  # rewards of agent a and agent b
+    steps: int
+
+
+class AgentLatency(NamedTuple):
+    decisions: int
+    mean_us: float
+    p50_us: float
+    p99_us: float
+
+
+class MatchResult(NamedTuple):
+    games: int
+    wins: int  # of agent a
+    losses: int
+    draws: int
+    win_rate: float  # of agent a, draws counting half
+    ci_low: float
+    ci_high: float
+    std_error: float  # of the win rate
+    mean_reward: float  # of agent a
+    seconds: float
+    games_per_sec: float
+    latency: Tuple[AgentLatency, AgentLatency]  # of agent a and agent b
+    sequential: Optional["SequentialResult"] = None  # the outcome of the SPRT, if one was run
+
+
+def wilson_interval(wins: float, games: int, z: float = 1.96) -> Tuple[float, float]:
+    """
+    Wilson score interval of a win rate, at 95% confidence by default.
+    """
+    if games == 0:
+        return 0.0, 1.0
+    p = wins / games
+    center = (p + z * z / (2 * games)) / (1 + z * z / games)
+    margin = z * math.sqrt(p * (1 - p) / games + z * z / (4 * games * games)) / (1 + z * z / games)
+    return max(center - margin, 0.0), min(center + margin, 1.0)
+
+
+class _TimedAgent(DurakPlayer):
+    """
+    Forwards to agent, recording how long each decision takes.
+    """
+
+    def __init__(self, agent: DurakPlayer):
+        super().__init__(agent.player_id)
+        self.agent = agent
+        self.histogram = PhaseHistogram()
+
+    def choose_action(self, current_state, actions, full_state=None):
+        start = time.perf_counter_ns()
+        action = self.agent.choose_action(current_state, actions, full_state=full_state)
+        self.histogram.add(time.perf_counter_ns() - start)
+        return action
+
+    def observe(self, transition):
+        self.agent.observe(transition)
+
+    def seat(self, player_id: int, seed: int):
+        """
+        Seats the agent as player_id and reseeds its own generator for the game, see _play_game for torch's.
+        """
+        self.player_id = self.agent.player_id = player_id
+        np_random = getattr(self.agent, "np_random", None)
+        if np_random is not None:
+            np_random.seed(seed)
+
+
+class _Players(NamedTuple):
+    agents: Tuple[_TimedAgent, _TimedAgent]
+    lowest_rank: Optional[int]  # None for the deck of the two_game backend
+
+
+def _make_players(factories: Tuple[AgentFactory, AgentFactory], lowest_rank: Optional[int]) -> _Players:
+    return _Players(tuple(_TimedAgent(factory(player_id)) for player_id, factory in enumerate(factories)), lowest_rank)
+
+
+def _play_game(players: _Players, seed: int, seat: int) -> GameResult:
+    agent_a, agent_b = players.agents
+    agent_a.seat(seat, 2 * seed + seat)
+    agent_b.seat(1 - seat, 2 * seed + 1 - seat)
+    runner = GameRunner()
+    runner.set_agents([agent_a, agent_b] if seat == 0 else [agent_b, agent_a])
+    # Agents drawing from torch's global generator get the same draws whenever the game is played, so that
+    # a game only depends on its deal and seat, and the caller's generator is restored afterwards
+    with torch.random.fork_rng(devices=[]):
+        torch.manual_seed(2 * seed + seat)
+        rewards = runner.run(init_state=runner.backend.deal(seed, players.lowest_rank))
+    return GameResult(seed, seat, (rewards[seat], rewards[1 - seat]), len(runner.action_history))
+
+
+def _play_games(
+    players: _Players, schedule: Sequence[Tuple[int, int]]
+) -> Tuple[List[GameResult], List[PhaseHistogram]]:
+    for agent in players.agents:
+        agent.histogram = PhaseHistogram()
+    results = [_play_game(players, seed, seat) for seed, seat in schedule]
+    return results, [agent.histogram for agent in players.agents]
+
+
+_worker_players: List[_Players] = []
+
+
+def _init_worker(pairings: Sequence[Tuple[AgentFactory, AgentFactory]], lowest_rank: Optional[int]):
+    global _worker_players
+    torch.set_num_threads(1)
+    _worker_players = [_make_players(factories, lowest_rank) for factories in pairings]
+
+
+def _play_worker_games(task: Tuple[int, Sequence[Tuple[int, int]]]) -> Tuple[List[GameResult], List[PhaseHistogram]]:
+    pairing, schedule = task
+    return _play_games(_worker_players[pairing], schedule)
+
+
+def seat_schedule(num_games: int, seed: int = 0) -> List[Tuple[int, int]]:
+    """
+    The (deal seed, seat of agent a) of every game: a new deal per game, agent a alternating seats.
+    """
+    return [(seed + game, game % 2) for game in range(num_games)]
+
+
+def duplicate_schedule(num_deals: int, seed: int = 0) -> List[Tuple[int, int]]:
+    """
+    Every deal played twice in a row with the seats swapped, so that the luck of the deal cancels out
+    between the two games.
+    """
+    return [(seed + deal, seat) for deal in range(num_deals) for seat in (0, 1)]
+
+
+class Match:
+    """
+    Plays games of agent_a against agent_b across num_workers processes (all CPUs by default), or in this
+    process if num_workers is 0. The agents are built once per process and kept until the match is closed,
+    so a match can play several schedules, e.g. the batches of a sequential test.
+
+    alternatives are more agents playing agent_b in the same processes, e.g. the second checkpoint of a
+    comparison. Pairing 0 is agent_a against agent_b and pairing i is alternatives[i - 1] against agent_b.
+    """
+
+    def __init__(
+        self,
+        agent_a: AgentFactory,
+        agent_b: AgentFactory,
+        lowest_rank: Optional[int] = None,
+        num_workers: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        alternatives: Sequence[AgentFactory] = (),
+    ):
+        pairings = [(agent_a, agent_b)] + [(alternative, agent_b) for alternative in alternatives]
+        self.num_pairings = len(pairings)
+        self.num_workers = num_workers if num_workers is not None else os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._players = None
+        self._pool = None
+        if self.num_workers == 0:
+            self._players = [_make_players(factories, lowest_rank) for factories in pairings]
+        else:
+            self._pool = ProcessPoolExecutor(
+                self.num_workers, initializer=_init_worker, initargs=(pairings, lowest_rank)
+            )
+
+    def play(
+        self, schedule: Sequence[Tuple[int, int]], pairing: int = 0
+    ) -> Tuple[List[GameResult], List[PhaseHistogram]]:
+        """
+        Plays the (deal seed, seat of agent a) games of schedule.
+        :return: the results in schedule order and the decision latencies of agent a and agent b.
+        """
+        return self.play_pairings(schedule, [pairing])[0]
+
+    def play_pairings(
+        self, schedule: Sequence[Tuple[int, int]], pairings: Optional[Sequence[int]] = None
+    ) -> List[Tuple[List[GameResult], List[PhaseHistogram]]]:
+        """
+        Plays schedule with each of pairings, all of them by default. The games of every pairing are handed
+        to the pool at once, so that the pairings share the workers instead of taking turns.
+        :return: the results and latencies of each pairing, see play.
+        """
+        pairings = list(range(self.num_pairings)) if pairings is None else list(pairings)
+        if self._pool is None:
+            return [_play_games(self._players[pairing], schedule) for pairing in pairings]
+        games = len(schedule) * len(pairings)
+        chunk_size = self.chunk_size or max(1, math.ceil(games / (4 * self.num_workers)))
+        chunks = [schedule[start:start + chunk_size] for start in range(0, len(schedule), chunk_size)]
+        tasks = [(pairing, chunk) for pairing in pairings for chunk in chunks]
+        outputs = {pairing: ([], [PhaseHistogram(), PhaseHistogram()]) for pairing in pairings}
+        for (pairing, _), (chunk_results, chunk_histograms) in zip(tasks, self._pool.map(_play_worker_games, tasks)):
+            results, histograms = outputs[pairing]
+            results.extend(chunk_results)
+            for histogram, chunk_histogram in zip(histograms, chunk_histograms):
+                histogram.merge(chunk_histogram)
+        return [outputs[pairing] for pairing in pairings]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self) -> "Match":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def play_schedule(
+    agent_a: AgentFactory,
+    agent_b: AgentFactory,
+    schedule: Sequence[Tuple[int, int]],
+    lowest_rank: Optional[int] = None,
+    num_workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> Tuple[List[GameResult], List[PhaseHistogram]]:
+    """
+    Plays the games of schedule in a Match of its own, see Match.play.
+    """
+    with Match(agent_a, agent_b, lowest_rank, num_workers, chunk_size) as match:
+        return match.play(schedule)
+
+
+def scores(results: Sequence[GameResult]) -> np.ndarray:
+    """
+    The score of agent a in every game: 1 for a win, 0.5 for a draw and 0 for a loss.
+    """
+    rewards = np.array([result.rewards for result in results], dtype=float).reshape(-1, 2)
+    return (np.sign(rewards[:, 0] - rewards[:, 1]) + 1) / 2
+
+
+def unit_scores(results: Sequence[GameResult], duplicate: bool) -> np.ndarray:
+    """
+    The independent samples of agent a's score: one per game, or with duplicate deals the mean over the two
+    games of each deal, which are consecutive in duplicate_schedule.
+    """
+    game_scores = scores(results)
+    if duplicate:
+        return game_scores.reshape(-1, 2).mean(axis=1)
+    return game_scores
+
+
+def normal_interval(samples: np.ndarray, z: float = 1.96) -> Tuple[float, float, float]:
+    """
+    :return: the normal confidence interval of the mean of samples, at 95% by default, and its standard
+    error.
+    """
+    if len(samples) < 2:
+        return 0.0, 1.0, float("nan")
+    std_error = float(samples.std(ddof=1) / math.sqrt(len(samples)))
+    mean = float(samples.mean())
+    return mean - z * std_error, mean + z * std_error, std_error
+
+
+ACCEPT_H0, ACCEPT_H1 = "H0", "H1"
+
+
+class SPRT:
+    """
+    Sequential probability ratio test on the mean of i.i.d. scores, H0: mean = mu0 against H1: mean = mu1,
+    with error rates alpha (accepting H1 under H0) and beta (accepting H0 under H1). The log-likelihood ratio
+    uses the normal approximation with the sample variance, which suits both single games and the paired
+    scores of duplicate deals or checkpoint comparisons.
+    """
+
+    def __init__(self, mu0: float = 0.5, mu1: float = 0.55, alpha: float = 0.05, beta: float = 0.05):
+        self.mu0 = mu0
+        self.mu1 = mu1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+
+    def llr(self, samples: np.ndarray) -> float:
+        if len(samples) < 2:
+            return 0.0
+        # floored for runs of identical scores, e.g. nothing but wins so far
+        variance = max(samples.var(ddof=1), 1 / (4 * len(samples)))
+        return float(len(samples) * (self.mu1 - self.mu0) * (2 * samples.mean() - self.mu0 - self.mu1) / (2 * variance))
+
+    def decide(self, samples: np.ndarray) -> Optional[str]:
+        """
+        :return: ACCEPT_H0 or ACCEPT_H1 once the log-likelihood ratio leaves (lower, upper), else None.
+        """
+        llr = self.llr(samples)
+        if llr <= self.lower:
+            return ACCEPT_H0
+        if llr >= self.upper:
+            return ACCEPT_H1
+        return None
+
+
+class SequentialResult(NamedTuple):
+    decision: Optional[str]  # ACCEPT_H0, ACCEPT_H1, or None if the games ran out first
+    llr: float
+    lower: float
+    upper: float
+
+
+def _latency(histogram: PhaseHistogram) -> AgentLatency:
+    if not histogram.count:
+        return AgentLatency(0, 0.0, 0.0, 0.0)
+    return AgentLatency(
+        histogram.count,
+        histogram.total / histogram.count / 1e3,
+        histogram.quantile(0.5) / 1e3,
+        histogram.quantile(0.99) / 1e3,
+    )
+
+
+def summarize(
+    results: Sequence[GameResult],
+    histograms: Sequence[PhaseHistogram],
+    seconds: float,
+    duplicate: bool = False,
+    sequential: Optional[SequentialResult] = None,
+) -> MatchResult:
+    """
+    With duplicate deals the confidence interval is the normal one over the per-deal scores, otherwise the
+    Wilson interval over games.
+    """
+    rewards = np.array([result.rewards for result in results], dtype=float).reshape(-1, 2)
+    wins = int(np.sum(rewards[:, 0] > rewards[:, 1]))
+    losses = int(np.sum(rewards[:, 0] < rewards[:, 1]))
+    draws = len(results) - wins - losses
+    score = wins + draws / 2
+    samples = unit_scores(results, duplicate)
+    if duplicate:
+        ci_low, ci_high, std_error = normal_interval(samples)
+    else:
+        ci_low, ci_high = wilson_interval(score, len(results))
+        std_error = float(samples.std(ddof=1) / math.sqrt(len(samples))) if len(samples) > 1 else float("nan")
+    return MatchResult(
+        games=len(results),
+        wins=wins,
+        losses=losses,
+        draws=draws,
+        win_rate=score / len(results) if len(results) else 0.0,
+        ci_low=ci_low,
+        ci_high=ci_high,
+        std_error=std_error,
+        mean_reward=float(rewards[:, 0].mean()) if len(results) else 0.0,
+        seconds=seconds,
+        games_per_sec=len(results) / seconds if seconds else 0.0,
+        latency=(_latency(histograms[0]), _latency(histograms[1])),
+        sequential=sequential,
+    )
+
+
+def _schedule(num_games: int, seed: int, duplicate: bool) -> List[Tuple[int, int]]:
+    if num_games <= 0:
+        raise ValueError(f"num_games must be positive, got {num_games}")
+    if duplicate:
+        if num_games % 2:
+            raise ValueError(f"Duplicate deals are played twice, num_games must be even, got {num_games}")
+        return duplicate_schedule(num_games // 2, seed)
+    return seat_schedule(num_games, seed)
+
+
+def _batches(schedule: List[Tuple[int, int]], batch_games: Optional[int], duplicate: bool):
+    if batch_games is None:
+        yield schedule
+        return
+    batch_games += batch_games % 2 if duplicate else 0  # keep the two games of a deal together
+    for start in range(0, len(schedule), batch_games):
+        yield schedule[start:start + batch_games]
+
+
+def evaluate(
+    agent_a: AgentFactory,
+    agent_b: AgentFactory,
+    num_games: int,
+    seed: int = 0,
+    lowest_rank: Optional[int] = None,
+    num_workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    duplicate: bool = False,
+    sprt: Optional[SPRT] = None,
+    batch_games: int = 200,
+) -> MatchResult:
+    """
+    Plays up to num_games games of agent_a against agent_b, on seat_schedule or, with duplicate, on
+    duplicate_schedule, which needs an even num_games. With sprt the games are played in batches of batch_games and the match stops as
+    soon as the test on agent a's score decides.
+    """
+    start = time.perf_counter()
+    schedule = _schedule(num_games, seed, duplicate)
+    results, histograms = [], [PhaseHistogram(), PhaseHistogram()]
+    sequential = None
+    with Match(agent_a, agent_b, lowest_rank, num_workers, chunk_size) as match:
+        for batch in _batches(schedule, batch_games if sprt is not None else None, duplicate):
+            batch_results, batch_histograms = match.play(batch)
+            results.extend(batch_results)
+            for histogram, batch_histogram in zip(histograms, batch_histograms):
+                histogram.merge(batch_histogram)
+            if sprt is not None:
+                samples = unit_scores(results, duplicate)
+                sequential = SequentialResult(sprt.decide(samples), sprt.llr(samples), sprt.lower, sprt.upper)
+                if sequential.decision is not None:
+                    break
+    return summarize(results, histograms, time.perf_counter() - start, duplicate, sequential)
+
+
+class ComparisonResult(NamedTuple):
+    """
+    Agent a against agent b, both playing the same opponent on the same games.
+    """
+    games: int  # per agent
+    score_difference: float  # mean score of a minus mean score of b
+    ci_low: float
+    ci_high: float
+    std_error: float
+    result_a: MatchResult
+    result_b: MatchResult
+    sequential: Optional[SequentialResult] = None
+
+
+def compare(
+    agent_a: AgentFactory,
+    agent_b: AgentFactory,
+    opponent: AgentFactory,
+    num_games: int,
+    seed: int = 0,
+    lowest_rank: Optional[int] = None,
+    num_workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    duplicate: bool = True,
+    sprt: Optional[SPRT] = None,
+    batch_games: int = 200,
+) -> ComparisonResult:
+    """
+    Compares two agents, e.g. checkpoints, with common random numbers: both play the same games against
+    opponent, same deals, seats and opponent randomness, and the difference of their scores is estimated
+    from the paired games, where most of the luck cancels out. With sprt, e.g. SPRT(0, 0.05), the test is on
+    that difference and stops the comparison as soon as it decides. Both agents play in the same pool of
+    num_workers processes.
+    """
+    start = time.perf_counter()
+    schedule = _schedule(num_games, seed, duplicate)
+    results = ([], [])
+    histograms = ([PhaseHistogram(), PhaseHistogram()], [PhaseHistogram(), PhaseHistogram()])
+    sequential = None
+    with Match(agent_a, opponent, lowest_rank, num_workers, chunk_size, alternatives=(agent_b,)) as match:
+        for batch in _batches(schedule, batch_games if sprt is not None else None, duplicate):
+            for (batch_results, batch_histograms), match_results, match_histograms in zip(
+                match.play_pairings(batch), results, histograms
+            ):
+                match_results.extend(batch_results)
+                for histogram, batch_histogram in zip(match_histograms, batch_histograms):
+                    histogram.merge(batch_histogram)
+            differences = unit_scores(results[0], duplicate) - unit_scores(results[1], duplicate)
+            if sprt is not None:
+                sequential = SequentialResult(
+                    sprt.decide(differences), sprt.llr(differences), sprt.lower, sprt.upper
+                )
+                if sequential.decision is not None:
+                    break
+    seconds = time.perf_counter() - start
+    ci_low, ci_high, std_error = normal_interval(differences)
+    return ComparisonResult(
+        games=len(results[0]),
+        score_difference=float(differences.mean()),
+        ci_low=ci_low,
+        ci_high=ci_high,
+        std_error=std_error,
+        result_a=summarize(results[0], histograms[0], seconds, duplicate),
+        result_b=summarize(results[1], histograms[1], seconds, duplicate),
+        sequential=sequential,
+    )
+
+
+def _format_sequential(sequential: Optional[SequentialResult]) -> List[str]:
+    if sequential is None:
+        return []
+    decision = sequential.decision or "undecided"
+    return [f"sprt: {decision}, llr {sequential.llr:.2f} in ({sequential.lower:.2f}, {sequential.upper:.2f})"]
+
+
+def format_result(result: MatchResult) -> str:
+    latency_a, latency_b = result.latency
+    return "\n".join([
+        f"games: {result.games} ({result.wins} won, {result.losses} lost, {result.draws} drawn)",
+        f"win rate: {result.win_rate:.4f} [{result.ci_low:.4f}, {result.ci_high:.4f}], "
+        f"standard error {result.std_error:.4f}",
+        f"mean reward: {result.mean_reward:.4f}",
+        f"speed: {result.games_per_sec:.1f} games/sec over {result.seconds:.1f}s",
+        f"decision latency a: mean {latency_a.mean_us:.1f}us p50 {latency_a.p50_us:.1f}us p99 {latency_a.p99_us:.1f}us",
+        f"decision latency b: mean {latency_b.mean_us:.1f}us p50 {latency_b.p50_us:.1f}us p99 {latency_b.p99_us:.1f}us",
+    ] + _format_sequential(result.sequential))
+
+
+def format_comparison(result: ComparisonResult) -> str:
+    return "\n".join([
+        f"games: {result.games} per agent",
+        f"score a - score b: {result.score_difference:+.4f} [{result.ci_low:+.4f}, {result.ci_high:+.4f}], "
+        f"standard error {result.std_error:.4f}",
+        f"win rate a: {result.result_a.win_rate:.4f}, win rate b: {result.result_b.win_rate:.4f}",
+    ] + _format_sequential(result.sequential))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("agent_a", help='"random" or the path of a DQNPlayer state dict')
+    parser.add_argument("agent_b", help='"random" or the path of a DQNPlayer state dict')
+    parser.add_argument("--games", type=int, default=1000, help="games to play, at most with --sprt")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--lowest-rank", type=int, default=None, help="deck to deal, the backend's by default")
+    parser.add_argument("--workers", type=int, default=None, help="processes to use, 0 plays in this one")
+    parser.add_argument("--duplicate", action="store_true", help="play every deal from both seats")
+    parser.add_argument("--against", help="compare agent_a and agent_b by playing both against this agent")
+    parser.add_argument("--sprt", type=float, nargs=2, metavar=("MU0", "MU1"),
+                        help="stop once the score (or score difference with --against) is shown to be MU0 or MU1")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--batch-games", type=int, default=200, help="games between two looks of the sprt")
+    args = parser.parse_args(argv)
+    sprt = SPRT(*args.sprt, alpha=args.alpha, beta=args.beta) if args.sprt else None
+    options = dict(
+        seed=args.seed, lowest_rank=args.lowest_rank, num_workers=args.workers,
+        sprt=sprt, batch_games=args.batch_games,
+    )
+    if args.against:
+        result = compare(
+            agent_factory(args.agent_a), agent_factory(args.agent_b), agent_factory(args.against), args.games,
+            duplicate=args.duplicate, **options,
+        )
+        print(format_comparison(result))
+    else:
+        result = evaluate(
+            agent_factory(args.agent_a), agent_factory(args.agent_b), args.games, duplicate=args.duplicate, **options,
+        )
+        print(format_result(result))
+
+
+if __name__ == "__main__":
+    main()
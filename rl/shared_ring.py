@@ -0,0 +1,195 @@
+"""
+A ring buffer of fixed-layout records in shared memory, for moving encoded states, actions, masks and
+rewards between actor and learner processes. Records are rows of a numpy structured array laid over a
+multiprocessing.shared_memory block, so putting and getting a record copies its bytes in and out of the
+block and nothing is pickled. Counting semaphores block producers while the ring is full and consumers
+while it is empty, so any number of either can share a ring.
+
+    ring = SharedRing(transition_dtype(state_size, num_actions, num_players), capacity=4096)
+    actor = mp.Process(target=act, args=(ring,))    # the ring is handed over by name, not copied
+    ...
+    ring.put(observation=obs, action=action, legal_mask=mask, rewards=rewards, player=player, done=done)
+    ...
+    batch = ring.get_many(256)                      # structured array, batch["observation"] is (n, state_size)
+    ...
+    ring.close()
+    ring.unlink()                                   # by the process that created it, once everyone is done
+"""
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from queue import Empty, Full
+from typing import Optional
+
+import numpy as np
+
+# The block starts with the write and read positions, the records follow
+_HEADER_SIZE = 64
+_WRITE, _READ = 0, 1
+
+
+def transition_dtype(state_size: int, num_actions: int, num_players: int) -> np.dtype:
+    """
+    Record layout of one step of a DurakEnv, see rl.durak_env: the observation and legal action mask of the
+    acting player, the action played, the rewards of every player after it and whether it ended the game.
+    """
+    return np.dtype([
+        ("observation", np.float32, (state_size,)),
+        ("legal_mask", np.bool_, (num_actions,)),
+        ("action", np.int64),
+        ("player", np.int64),
+        ("rewards", np.float32, (num_players,)),
+        ("done", np.bool_),
+    ])
+
+
+class SharedRing:
+    """
+    Fixed-capacity FIFO of records of dtype in shared memory. Pass it to other processes as an argument of
+    Process (or anything else pickling it while they start) and they attach to the same block.
+    """
+
+    def __init__(self, dtype: np.dtype, capacity: int, context: Optional[str] = None):
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        ctx = mp.get_context(context)
+        self._shm = shared_memory.SharedMemory(create=True, size=_HEADER_SIZE + capacity * self.dtype.itemsize)
+        self._items = ctx.Semaphore(0)  # records ready to be read
+        self._slots = ctx.Semaphore(capacity)  # free records
+        self._write_lock = ctx.Lock()
+        self._read_lock = ctx.Lock()
+        self._map()
+        self._header[:] = 0
+
+    def _map(self):
+        self._header = np.ndarray((2,), dtype=np.int64, buffer=self._shm.buf)
+        self._records = np.ndarray((self.capacity,), dtype=self.dtype, buffer=self._shm.buf, offset=_HEADER_SIZE)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_header"], state["_records"]
+        state["_shm"] = self._shm.name
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._shm = shared_memory.SharedMemory(name=state["_shm"])
+        self._map()
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def __len__(self) -> int:
+        """
+        The number of records waiting to be read, only a snapshot when other processes use the ring.
+        """
+        return int(self._header[_WRITE] - self._header[_READ])
+
+    def put(self, block: bool = True, timeout: Optional[float] = None, **fields):
+        """
+        Appends a record with the given fields, the others being zero, waiting for a free slot unless block
+        is False. Raises queue.Full if there is none in time.
+        """
+        unknown = set(fields) - set(self.dtype.names)
+        if unknown:
+            raise ValueError(f"Unknown fields {sorted(unknown)}")
+        if not self._slots.acquire(block, timeout):
+            raise Full
+        with self._write_lock:
+            position = int(self._header[_WRITE])
+            record = self._records[position % self.capacity]
+            for name in self.dtype.names:
+                record[name] = fields.get(name, 0)
+            self._header[_WRITE] = position + 1
+        self._items.release()
+
+    def put_many(self, records: np.ndarray, timeout: Optional[float] = None):
+        """
+        Appends a structured array of records of this ring's dtype, in order, copying them in as large
+        contiguous blocks as the free space allows. Raises queue.Full if the ring stays full for timeout.
+        This is not atomic: the records written before the ring filled up stay in it, and their number is
+        attached to the exception as its written attribute, so that records[error.written:] can be retried.
+        """
+        records = np.asarray(records, dtype=self.dtype)
+        done = 0
+        while done < len(records):
+            try:
+                count = self._acquire_many(self._slots, len(records) - done, timeout, Full)
+            except Full as error:
+                error.written = done
+                raise
+            with self._write_lock:
+                position = int(self._header[_WRITE])
+                self._copy_in(position, records[done:done + count])
+                self._header[_WRITE] = position + count
+            for _ in range(count):
+                self._items.release()
+            done += count
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> np.void:
+        """
+        Removes and returns the oldest record, waiting for one unless block is False. Raises queue.Empty if
+        there is none in time.
+        """
+        if not self._items.acquire(block, timeout):
+            raise Empty
+        with self._read_lock:
+            position = int(self._header[_READ])
+            record = self._records[position % self.capacity].copy()
+            self._header[_READ] = position + 1
+        self._slots.release()
+        return record
+
+    def get_many(self, max_records: int, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Removes and returns up to max_records of the oldest records, waiting up to timeout (forever if None)
+        for the first one and taking whatever else is ready. Raises queue.Empty if none arrives in time.
+        """
+        count = self._acquire_many(self._items, max_records, timeout, Empty)
+        out = np.empty(count, dtype=self.dtype)
+        with self._read_lock:
+            position = int(self._header[_READ])
+            self._copy_out(position, out)
+            self._header[_READ] = position + count
+        for _ in range(count):
+            self._slots.release()
+        return out
+
+    @staticmethod
+    def _acquire_many(semaphore, count: int, timeout: Optional[float], error) -> int:
+        """
+        Blocks for the first unit of semaphore, then takes as many more of count as are available right away.
+        """
+        if not semaphore.acquire(True, timeout):
+            raise error
+        acquired = 1
+        while acquired < count and semaphore.acquire(False):
+            acquired += 1
+        return acquired
+
+    def _copy_in(self, position: int, records: np.ndarray):
+        start = position % self.capacity
+        first = min(len(records), self.capacity - start)
+        self._records[start:start + first] = records[:first]
+        self._records[:len(records) - first] = records[first:]
+
+    def _copy_out(self, position: int, out: np.ndarray):
+        start = position % self.capacity
+        first = min(len(out), self.capacity - start)
+        out[:first] = self._records[start:start + first]
+        out[first:] = self._records[:len(out) - first]
+
+    def close(self):
+        """
+        Detaches this process from the block. Records handed out by get are copies and stay valid.
+        """
+        self._header = self._records = None
+        self._shm.close()
+
+    def unlink(self):
+        """
+        Frees the block once every process has closed it, by the process that created the ring.
+        """
+        self._shm.unlink()
@@ -0,0 +1,178 @@
+"""
+Runs several DurakEnv instances in worker processes and steps them as a batch. Observations, legal action
+masks, rewards and the acting players are written by the workers straight into arrays in shared memory,
+one row per environment, so only the actions and a short acknowledgement go through the pipes.
+
+    envs = SubprocVectorEnv([functools.partial(TwoGameEnv, lowest_rank=6)] * 8)
+    observations = envs.reset(seed=0)
+    while training:
+        actions = policy(observations, envs.legal_action_masks, envs.current_players)
+        rewards, observations, dones = envs.step(actions)
+    envs.close()
+
+An environment whose game is done is dealt a new game straight away, so the observation returned for it
+is the first of the next game while rewards and dones describe the game that ended. Environment i is
+reset with seed + i and each later game of it with the seed after the one before, see DurakEnv.reset.
+The arrays returned are views of the shared memory, valid until the next call to step or reset.
+"""
+import multiprocessing as mp
+import traceback
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .durak_env import DurakEnv
+
+RESET, STEP, CLOSE = "reset", "step", "close"
+
+
+class _SharedArrays:
+    """
+    The batch arrays, allocated in shared memory so that workers inherit them.
+    """
+
+    def __init__(self, ctx, num_envs: int, state_size: int, num_actions: int, num_players: int):
+        self.shapes = {
+            "observations": ((num_envs, state_size), np.float32),
+            "legal_action_masks": ((num_envs, num_actions), np.bool_),
+            "rewards": ((num_envs, num_players), np.float32),
+            "dones": ((num_envs,), np.bool_),
+            "current_players": ((num_envs,), np.int64),
+        }
+        self.buffers = {
+            name: ctx.RawArray("b", int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            for name, (shape, dtype) in self.shapes.items()
+        }
+
+    def arrays(self) -> dict:
+        return {
+            name: np.frombuffer(self.buffers[name], dtype=dtype).reshape(shape)
+            for name, (shape, dtype) in self.shapes.items()
+        }
+
+
+def _worker(index: int, env_fn: Callable[[], DurakEnv], shared: _SharedArrays, pipe):
+    env = env_fn()
+    arrays = shared.arrays()
+    observations, masks, rewards = arrays["observations"], arrays["legal_action_masks"], arrays["rewards"]
+    dones, current_players = arrays["dones"], arrays["current_players"]
+
+    def write_game_state():
+        observations[index] = env.get_observation()
+        masks[index] = env.get_legal_action_mask()
+        current_players[index] = env.get_current_player_id()
+
+    while True:
+        command, argument = pipe.recv()
+        try:
+            if command == RESET:
+                env.reset(argument)
+                rewards[index] = 0
+                dones[index] = False
+            elif command == STEP:
+                rewards[index], _, dones[index] = env.step(argument)
+                if dones[index]:
+                    env.reset()
+            elif command == CLOSE:
+                pipe.close()
+                return
+            write_game_state()
+            pipe.send(None)
+        except Exception:
+            pipe.send(traceback.format_exc())
+
+
+class SubprocVectorEnv:
+    """
+    Steps len(env_fns) environments, each created by its function in a worker process of its own.
+    """
+
+    def __init__(self, env_fns: Sequence[Callable[[], DurakEnv]], context: Optional[str] = None):
+        if not len(env_fns):
+            raise ValueError("At least one environment is needed")
+        probe = env_fns[0]()
+        self.num_envs = len(env_fns)
+        self.state_size = probe.get_state_size()
+        self.num_actions = probe.get_num_actions()
+        self.num_players = probe.get_num_players()
+        ctx = mp.get_context(context)
+        shared = _SharedArrays(ctx, self.num_envs, self.state_size, self.num_actions, self.num_players)
+        arrays = shared.arrays()
+        self.observations: np.ndarray = arrays["observations"]
+        self.legal_action_masks: np.ndarray = arrays["legal_action_masks"]
+        self.rewards: np.ndarray = arrays["rewards"]
+        self.dones: np.ndarray = arrays["dones"]
+        self.current_players: np.ndarray = arrays["current_players"]
+        self._pipes = []
+        self._processes = []
+        for index, env_fn in enumerate(env_fns):
+            parent, child = ctx.Pipe()
+            process = ctx.Process(target=_worker, args=(index, env_fn, shared, child), daemon=True)
+            process.start()
+            child.close()
+            self._pipes.append(parent)
+            self._processes.append(process)
+        self._waiting = False
+        self.closed = False
+
+    def _send(self, command: str, arguments: Sequence):
+        for pipe, argument in zip(self._pipes, arguments):
+            pipe.send((command, argument))
+        self._waiting = True
+
+    def _wait(self):
+        errors = [pipe.recv() for pipe in self._pipes]
+        self._waiting = False
+        for index, error in enumerate(errors):
+            if error is not None:
+                raise RuntimeError(f"Environment {index} failed:\n{error}")
+
+    def reset(self, seed: int = 0) -> np.ndarray:
+        """
+        Deals a new game in every environment.
+        :return: the observations of the acting players
+        """
+        self._send(RESET, [seed + index for index in range(self.num_envs)])
+        self._wait()
+        return self.observations
+
+    def step_async(self, actions: Sequence[int]):
+        """
+        Sends one action per environment without waiting for them to be played, see step_wait.
+        """
+        if len(actions) != self.num_envs:
+            raise ValueError(f"Expected {self.num_envs} actions, got {len(actions)}")
+        self._send(STEP, [int(action) for action in actions])
+
+    def step_wait(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :return: a tuple of (rewards, observations, dones), one row per environment
+        """
+        self._wait()
+        return self.rewards, self.observations, self.dones
+
+    def step(self, actions: Sequence[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        self.step_async(actions)
+        return self.step_wait()
+
+    def legal_actions(self) -> List[np.ndarray]:
+        return [np.flatnonzero(mask) for mask in self.legal_action_masks]
+
+    def close(self):
+        if self.closed:
+            return
+        if self._waiting:
+            self._wait()
+        for pipe in self._pipes:
+            pipe.send((CLOSE, None))
+        for process in self._processes:
+            process.join()
+        for pipe in self._pipes:
+            pipe.close()
+        self.closed = True
+
+    def __enter__(self) -> "SubprocVectorEnv":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
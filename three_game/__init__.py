@@ -1,3 +1,5 @@
 from .actions import DurakAction
 from .game import DurakGame, DurakDeck
 from .game_state import ObservableDurakGameState, GameTransition
+from .history import DurakGameHistory, GameCheckpoint
+from .history_store import HistoryWriter, HistoryReader
@@ -0,0 +1,127 @@
+"""
+Batched dealing: deal_batch shuffles num_games decks at once by argsorting a matrix of uniform draws and
+derives the hands, stock, visible card, trump suit and first attacker of every game with array operations.
+
+Cards are ids as in DurakAction.ext_from_card, suit * 9 + rank - 6 with suits in the order S, H, D, C,
+whatever the lowest rank. Decks follow the engines' convention: the last cards are dealt first and the
+first card is the visible card.
+
+The draws come from a Philox counter-based generator keyed by seed, each game using its own block of
+counters, so game i of a seed is the same deal whichever batch it is drawn in:
+
+    deal_batch(1000, seed=7).game(123) == deal_batch(1, seed=7, start=123).game(0)
+"""
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+
+from .actions import DurakAction
+
+SUITS = "SHDC"
+RANKS_PER_SUIT = 9  # card ids leave room for every rank from 6 to 14
+HAND_SIZE = 6
+# Philox produces four 64-bit words per counter and a uniform double takes one of them
+_WORDS_PER_COUNTER = 4
+
+
+def card_ids(lowest_rank: int = 6) -> np.ndarray:
+    """
+    The ids of the cards of a deck starting at lowest_rank, in the order S, H, D, C.
+    """
+    ranks = np.arange(lowest_rank - 6, RANKS_PER_SUIT)
+    return (np.arange(len(SUITS))[:, None] * RANKS_PER_SUIT + ranks).reshape(-1).astype(np.int8)
+
+
+def card_from_id(card: int) -> Tuple[str, int]:
+    return DurakAction.card_from_ext(int(card))
+
+
+class Deals(NamedTuple):
+    """
+    num_games deals as arrays with one row per game.
+    """
+    seed: int
+    start: int  # index of the first game within the seed
+    lowest_rank: int
+    decks: np.ndarray  # (num_games, deck size) card ids of the shuffled decks, before dealing
+    hands: np.ndarray  # (num_games, num_players, 6) card ids of the hands, in the order they were dealt
+    stock: np.ndarray  # (num_games, deck size - 6 * num_players) card ids left in the deck after dealing
+    visible_card: np.ndarray  # (num_games,) card id of the visible card, the first of the deck
+    trump: np.ndarray  # (num_games,) suit index of the trump, see SUITS
+    first_attacker: np.ndarray  # (num_games,) the player holding the lowest trump, or a random one
+
+    def __len__(self) -> int:
+        return len(self.decks)
+
+    def game(self, index: int) -> "Deal":
+        return Deal(
+            deck=[card_from_id(card) for card in self.decks[index]],
+            hands=[[card_from_id(card) for card in hand] for hand in self.hands[index]],
+            stock=[card_from_id(card) for card in self.stock[index]],
+            visible_card=card_from_id(self.visible_card[index]),
+            first_attacker=int(self.first_attacker[index]),
+        )
+
+
+class Deal(NamedTuple):
+    """
+    A single game of Deals, with cards as (suit, rank) tuples.
+    """
+    deck: List[Tuple[str, int]]
+    hands: List[List[Tuple[str, int]]]
+    stock: List[Tuple[str, int]]
+    visible_card: Tuple[str, int]
+    first_attacker: int
+
+
+def deal_batch(
+    num_games: int,
+    seed: int = 0,
+    lowest_rank: int = 6,
+    num_players: int = 2,
+    start: int = 0,
+    round_robin: bool = False,
+) -> Deals:
+    """
+    Deals games start to start + num_games of seed.
+    :param round_robin: deal one card to each player in turn like three_game, instead of six cards to
+        each player at once like two_game.
+    """
+    cards = card_ids(lowest_rank)
+    deck_size = len(cards)
+    if HAND_SIZE * num_players > deck_size:
+        raise ValueError(f"A deck of {deck_size} cards cannot be dealt to {num_players} players")
+    # a block of draws per game: one per card for the shuffle, the next one breaks the tie for the attacker
+    counters_per_game = deck_size // _WORDS_PER_COUNTER + 1
+    bit_generator = np.random.Philox(key=seed)
+    bit_generator.advance(start * counters_per_game)
+    draws = np.random.Generator(bit_generator).random((num_games, counters_per_game * _WORDS_PER_COUNTER))
+    decks = cards[np.argsort(draws[:, :deck_size], axis=1)]
+
+    dealt = decks[:, ::-1][:, :HAND_SIZE * num_players]
+    if round_robin:
+        hands = dealt.reshape(num_games, HAND_SIZE, num_players).transpose(0, 2, 1)
+    else:
+        hands = dealt.reshape(num_games, num_players, HAND_SIZE)
+    hands = np.ascontiguousarray(hands)
+    visible_card = decks[:, 0]
+    trump = visible_card // RANKS_PER_SUIT
+
+    # the lowest trump of each player, RANKS_PER_SUIT when they have none
+    trump_ranks = np.where(hands // RANKS_PER_SUIT == trump[:, None, None], hands % RANKS_PER_SUIT, RANKS_PER_SUIT)
+    lowest_trump = trump_ranks.min(axis=2)
+    random_player = (draws[:, deck_size] * num_players).astype(np.int8)
+    has_trump = lowest_trump.min(axis=1) < RANKS_PER_SUIT
+    first_attacker = np.where(has_trump, lowest_trump.argmin(axis=1), random_player).astype(np.int8)
+
+    return Deals(
+        seed=seed,
+        start=start,
+        lowest_rank=lowest_rank,
+        decks=decks,
+        hands=hands,
+        stock=decks[:, :deck_size - HAND_SIZE * num_players],
+        visible_card=visible_card,
+        trump=trump.astype(np.int8),
+        first_attacker=first_attacker,
+    )
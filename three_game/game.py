@@ -1,14 +1,33 @@
 import copy
-import random
-import string
 from pathlib import Path
-import pickle
 
 import numpy as np
-from typing import Optional, List, Tuple, Literal, NamedTuple
+from typing import Optional, List, Tuple, Literal, NamedTuple, Union
 
 from .actions import DurakAction
-from .game_state import ObservableDurakGameState, DurakGameState
+from .game_state import ObservableDurakGameState, DurakGameState, GameTransition
+from .history import DurakGameHistory, GameCheckpoint
+from .history_store import HistoryWriter
+from durak_common.events import (
+    EventEmitter,
+    StepEvent,
+    TakeEvent,
+    RoundOverEvent,
+    GameEndEvent,
+    STEP,
+    TAKE,
+    ROUND_OVER,
+    GAME_END,
+)
+from durak_common.profiling import (
+    PhaseProfiler,
+    DECISION,
+    INFORMATION_STATE,
+    LEGAL_ACTIONS,
+    TRANSITION,
+    HISTORY,
+    EVENT_EMISSION,
+)
 
 
 class Card(NamedTuple):
@@ -20,6 +39,7 @@ class Card(NamedTuple):
 
 
 class DurakDeck:
+    __slots__ = ("deck", "visible_card")
 
     def __init__(self, lowest_card: int, np_rand: np.random.RandomState):
         self.deck = [
@@ -44,6 +64,22 @@ class DurakDeck:
         self.visible_card = self.deck[0]
         return hands, self.visible_card
 
+    @classmethod
+    def from_cards(cls, cards: List[Card]) -> "DurakDeck":
+        """
+        A deck in the given order, the last cards being dealt first, e.g. a deal of three_game.dealing.
+        """
+        deck = cls.__new__(cls)
+        deck.deck = [Card(*card) for card in cards]
+        deck.visible_card = None
+        return deck
+
+    def clone(self) -> "DurakDeck":
+        deck = DurakDeck.__new__(DurakDeck)
+        deck.deck = self.deck[:]
+        deck.visible_card = self.visible_card
+        return deck
+
     def __str__(self):
         return str(self.deck)
 
@@ -58,13 +94,43 @@ class DurakDeck:
         return deck
 
 
-class DurakGame:
+class DurakGame(EventEmitter):
+    # The engine is cloned thousands of times per decision by search agents, so its state lives in slots.
+    # Hands, tables and deck stay lists of Cards rather than fixed card arrays: the order of a hand is the
+    # order of its legal attacks, and lists of at most 36 cards are cheaper to slice than arrays to copy.
+    __slots__ = (
+        "defender_has_taken",
+        "lowest_card",
+        "num_players",
+        "allow_step_back",
+        "np_random",
+        "deck",
+        "player_hands",
+        "visible_card",
+        "attackers",
+        "defender",
+        "player_agents",
+        "players",
+        "in_players",
+        "attack_table",
+        "defend_table",
+        "stopped_attacking",
+        "player_taking_action",
+        "is_done",
+        "graveyard",
+        "seed",
+        "deal_seed",
+        "history",
+        "_listeners",
+        "profiler",
+    )
+
     def __init__(self, allow_step_back=False):
         self.defender_has_taken: bool = False
         self.lowest_card: Optional[int] = None  # lowest card rank in the deck
         self.num_players: Optional[int] = None  # number of players
         self.allow_step_back: bool = allow_step_back  # whether to allow step_back
-        self.np_random = np.random.RandomState()  # numpy random generator
+        self.np_random: Optional[np.random.RandomState] = None  # numpy random generator, set by configure
         self.deck: Optional[DurakDeck] = None  # deck of cards
         self.player_hands: Optional[List[List[tuple]]] = None  # list of player hands
         self.visible_card: Optional[
@@ -87,17 +153,24 @@ class DurakGame:
         self.player_taking_action: Optional[int] = None  # the player taking action
         self.is_done: bool = False  # whether the three_game is done
         self.graveyard: Optional[List[tuple]] = None  # list of cards in the graveyard
-        self.history: List[DurakGameState] = None
+        self.seed: Optional[int] = None  # seed the random generator was configured with
+        self.deal_seed: Optional[int] = None  # seed the current game was dealt with, see init_game
+        self.history: Optional[DurakGameHistory] = None  # action log and checkpoints of the game
+        self._listeners = {}  # event name -> listeners, see durak_common.events
+        self.profiler: Optional[PhaseProfiler] = None  # per-phase timings, see durak_common.profiling
 
     def configure(self, game_config):
         self.num_players = game_config.get("game_num_players", 3)
         self.lowest_card = game_config.get("lowest_card", 6)
-        self.np_random = np.random.RandomState(game_config.get("seed", 0))
+        self.seed = game_config.get("seed", 0)
+        self.np_random = np.random.RandomState(self.seed)
         self.player_agents = game_config["agents"]
+        self.deal_seed = None
 
-    def _determine_init_attacker(self):
+    def _determine_init_attacker(self, np_random: np.random.RandomState):
         """
         Determine the initial attacker.
+        :param np_random: generator picking a random attacker when nobody holds a trump
         :return: int, player id of the initial attacker
         """
         suit, _ = self.visible_card
@@ -109,23 +182,38 @@ class DurakGame:
                     min_rank = r
                     min_rank_player = i
         if min_rank_player < 0:
-            return self.np_random.randint(self.num_players)
+            return np_random.randint(self.num_players)
         return min_rank_player
 
     def reset_game(self):
         self.init_game(init_players=False)
 
-    def init_game(self, init_players: Optional[bool] = True):
+    def init_game(
+        self, init_players: Optional[bool] = True, deck: Optional[DurakDeck] = None, seed: Optional[int] = None
+    ):
         """
         Initialize all the three_game elements.
+        :param deck: deck to deal from instead of shuffling a new one, see DurakDeck.from_cards
+        :param seed: seed of the deal, shuffling the deck and breaking the tie for the first attacker. The
+            first game after configure is dealt with the configured seed and every later one with a seed
+            drawn from the game's generator. The seed is recorded in the history, so that
+            init_game(seed=history.seed) deals the same game again.
         :return: state (dict), player_id (int)
         """
-        self.deck = DurakDeck(self.lowest_card, self.np_random)
+        if deck is None:
+            if seed is None:
+                seed = self.seed if self.deal_seed is None else int(self.np_random.randint(2 ** 31))
+            deal_random = np.random.RandomState(seed)
+            self.deck = DurakDeck(self.lowest_card, deal_random)
+        else:
+            deal_random = self.np_random
+            self.deck = deck
+        self.deal_seed = seed
         self.player_hands, self.visible_card = self.deck.deal(6, self.num_players)
         if init_players:
             self.players = [agent(i) for i, agent in enumerate(self.player_agents)]
         self.in_players = list(range(self.num_players))
-        self.attackers = [self._determine_init_attacker()]
+        self.attackers = [self._determine_init_attacker(deal_random)]
         self.defender = (self.attackers[0] + 1) % self.num_players
         self.player_taking_action = self.attackers[0]
         self.attack_table = []
@@ -134,7 +222,44 @@ class DurakGame:
         self.graveyard = []
         self.is_done = False
         self.defender_has_taken = False
-        self.history = [self.current_state()]
+        self.history = DurakGameHistory(
+            self.checkpoint(), self.num_players, self.lowest_card, seed=seed
+        )
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint: GameCheckpoint, num_players: int, lowest_card: int) -> "DurakGame":
+        """
+        Restores a game without players or history from a checkpoint, e.g. to replay logged actions.
+        """
+        state = checkpoint.state
+        game = cls()
+        game.num_players = num_players
+        game.lowest_card = lowest_card
+        game.deck = DurakDeck.__new__(DurakDeck)
+        game.deck.deck = list(state.deck)
+        game.deck.visible_card = state.visible_card
+        game.player_hands = [list(hand) for hand in state.player_hands]
+        game.visible_card = state.visible_card
+        game.attack_table = list(state.attack_table)
+        game.defend_table = list(state.defend_table)
+        game.graveyard = list(state.graveyard)
+        game.attackers = list(state.attackers)
+        game.defender = state.defender
+        game.player_taking_action = state.player_taking_action
+        game.defender_has_taken = state.defender_has_taken
+        game.stopped_attacking = list(state.stopped_attacking)
+        game.in_players = list(checkpoint.in_players)
+        game.is_done = state.is_done
+        return game
+
+    def checkpoint(self) -> GameCheckpoint:
+        """
+        Snapshots the current state of the game so that it can be restored with from_checkpoint.
+        """
+        return GameCheckpoint(
+            state=self.current_state()._replace(np_rand=None),
+            in_players=tuple(self.in_players),
+        )
 
     def get_observable_state(self, player_id: int) -> ObservableDurakGameState:
         """
@@ -155,15 +280,27 @@ class DurakGame:
         return [1.0 if len(hand) == 0 else -1.0 for hand in self.player_hands]
 
     def step(self):
+        profiler = self.profiler
+        if profiler is not None:
+            t = profiler.start_step()
         player_id = self.player_taking_action
-        information_state = [state.observable(player_id) for state in self.history]
+        information_state = None
+        if self.history is not None:
+            self._sync_initial_history()
+            information_state = self.history.observations(player_id)
+        observation = self.get_observable_state(player_id)
+        if profiler is not None:
+            t = profiler.lap(INFORMATION_STATE, t)
         actions = self.get_legal_actions(player_id)
+        if profiler is not None:
+            t = profiler.lap(LEGAL_ACTIONS, t)
         player = self.players[player_id]
-        action = player.choose_action(information_state[-1], actions, full_state=information_state)
-
-        self._do_step(player_id, action)
-        new_state = self.current_state()
-        self.history.append(new_state)
+        action = player.choose_action(observation, actions, full_state=information_state)
+        if profiler is not None:
+            t = profiler.lap(DECISION, t)
+            self._do_step(player_id, action, clock=t)
+        else:
+            self._do_step(player_id, action)
 
     def current_state(self) -> DurakGameState:
         """
@@ -329,10 +466,13 @@ class DurakGame:
             potential_attackers = self.get_potential_attackers(self.defender)
             if self.attackers[-1] in potential_attackers:
                 potential_attackers.remove(self.attackers[-1])
-            if len(potential_attackers):
-                self.player_taking_action = potential_attackers[0]
-            else:
-                self.player_taking_action = self.defender
+            if not len(potential_attackers):
+                # Everything is beaten and nobody else can attack, e.g. because in_players still counts a
+                # player who ran out of cards this round, so the defender has nothing left to do
+                round_over = True
+                self._clear_table()
+                return round_over
+            self.player_taking_action = potential_attackers[0]
             if self.player_taking_action not in self.attackers + [self.defender]:
                 self.attackers.append(self.player_taking_action)
         return round_over
@@ -346,10 +486,8 @@ class DurakGame:
                 nimplayers.append(i)
         self.in_players = nimplayers
 
-    def _handle_round_over(self, prev_state: dict):
+    def _handle_round_over(self, prev_attackers: List[int], prev_defender: int):
         # Need to replenish hands from deck, going in order of attacker
-        prev_attackers = prev_state["attackers"]
-        prev_defender = prev_state["defender"]
         self._refill_cards(prev_attackers, prev_defender)
         self.defender_has_taken = False
 
@@ -366,16 +504,15 @@ class DurakGame:
             while len(self.player_hands[self.defender]) == 0:
                 self.defender = (self.defender + 1) % self.num_players
 
-    def _do_step(self, player_id: int, action_id: DurakAction):
+    def _do_step(self, player_id: int, action_id: DurakAction, clock: Optional[int] = None):
         """
         Perform one draw of the three_game.
         :param player_id: int, player id of the current player
         :param action_id: int, action taken by the current player
+        :param clock: profiler clock of a step that is already running, when called from step. step has
+            timed the legal actions already, so the legality check is then timed as part of the transition.
         :return: state (dict)
         """
-        print(f"Player {player_id} chose action {action_id}")
-        prev_state = self.get_whole_state()
-        round_over = False
         if self.player_taking_action != player_id and not DurakAction.is_noop(
             action_id
         ):
@@ -386,12 +523,87 @@ class DurakGame:
                     self.player_taking_action,
                 )
             )
+        profiler = self.profiler
+        if profiler is not None:
+            t = profiler.start_step() if clock is None else clock
         if action_id not in self.get_legal_actions(player_id):
             raise ValueError(
                 "Player {} cannot take action {}, it is not a legal action".format(
                     player_id, DurakAction.action_to_string(action_id)
                 )
             )
+        if profiler is not None and clock is None:
+            t = profiler.lap(LEGAL_ACTIONS, t)
+        prev_state = self.current_state() if self._listeners else None
+        if self.history is None:
+            events = self._apply_action(player_id, action_id)
+            if profiler is not None:
+                t = profiler.lap(TRANSITION, t)
+        else:
+            self._sync_initial_history()
+            events = self._apply_action(player_id, action_id)
+            if profiler is not None:
+                t = profiler.lap(TRANSITION, t)
+            self.history.append(player_id, action_id, self.checkpoint)
+            if profiler is not None:
+                t = profiler.lap(HISTORY, t)
+        if self._listeners:
+            state = self.current_state()
+            rewards = tuple(self.get_rewards())
+            self._emit(STEP, StepEvent(player_id, action_id, prev_state, state, rewards))
+            for event, payload in events:
+                self._emit(event, payload)
+            if self.is_done:
+                num_steps = len(self.history) - 1 if self.history is not None else None
+                self._emit(GAME_END, GameEndEvent(rewards, num_steps, state))
+            if profiler is not None:
+                profiler.lap(EVENT_EMISSION, t)
+        if profiler is not None and self.is_done:
+            profiler.end_game()
+
+    def forward_transitions_to_players(self):
+        """
+        Registers a listener calling each player's observe hook with every transition, seen from that
+        player's perspective.
+        """
+        self.add_listener(STEP, self._forward_transition)
+
+    def _forward_transition(self, event: StepEvent):
+        for player_id, player in enumerate(self.players):
+            player.observe(GameTransition(
+                state=event.state.observable(player_id),
+                action=event.action,
+                reward=event.rewards[player_id],
+                next_state=event.next_state.observable(player_id),
+            ))
+
+    def _sync_initial_history(self):
+        """
+        The table may have been set up by hand since dealing, so until the first action is logged the
+        initial checkpoint is refreshed from the current state.
+        """
+        if len(self.history) == 1:
+            self.history.reset_initial_state(self.checkpoint())
+
+    def apply_legal_action(self, player_id: int, action_id: int):
+        """
+        Applies an action known to be legal, e.g. one taken from get_legal_actions by a rollout, without the
+        turn and legality checks of step. The action is neither logged to the history nor announced to
+        listeners.
+        """
+        self._apply_action(player_id, action_id)
+
+    def _apply_action(self, player_id: int, action_id: int) -> list:
+        """
+        Applies an action that is already known to be legal, e.g. when replaying a logged action.
+        :return: the (event, payload) pairs of the TAKE and ROUND_OVER events the action caused, which _do_step
+            emits after its STEP event, empty if there are no listeners.
+        """
+        prev_attackers = list(self.attackers)
+        prev_defender = self.defender
+        prev_defender_has_taken = self.defender_has_taken
+        table = tuple(self.attack_table + self.defend_table) if self._listeners else None
+        round_over = False
         # Delegate handling of actions to helper functions
         if DurakAction.is_attack(action_id):
             self._handle_attack_action(player_id, action_id)
@@ -406,16 +618,30 @@ class DurakGame:
         else:
             raise ValueError("Invalid action_id {}".format(action_id))
 
+        events = []
         if round_over:
-            self._handle_round_over(prev_state)
+            self._handle_round_over(prev_attackers, prev_defender)
+            if self._listeners:
+                defender_took = DurakAction.is_take(action_id) or prev_defender_has_taken
+                if defender_took:
+                    events.append((TAKE, TakeEvent(prev_defender, table)))
+                events.append((ROUND_OVER, RoundOverEvent(
+                    tuple(prev_attackers), prev_defender, defender_took, self.current_state()
+                )))
 
         self.is_done = self._is_game_over()
+        return events
 
-    def save_history(self, save_dir: Path):
-        save_dir.mkdir(parents=True, exist_ok=True)
-        filename = save_dir / f"history{''.join(random.choices(string.ascii_letters, k=10))}.pkl"
-        with open(filename, "wb") as f:
-            pickle.dump(self.history, f)
+    def save_history(self, save_dir: Union[Path, HistoryWriter]):
+        """
+        Appends the game to a columnar history store, see three_game.history_store. Pass an open
+        HistoryWriter when saving many games, a directory writes this game to a shard of its own.
+        """
+        if isinstance(save_dir, HistoryWriter):
+            save_dir.write_game(self.history, self.get_rewards())
+            return
+        with HistoryWriter(Path(save_dir)) as writer:
+            writer.write_game(self.history, self.get_rewards())
 
     def _get_defender_actions(self) -> List[DurakAction]:
         """
@@ -490,6 +716,42 @@ class DurakGame:
     def copy(self):
         return copy.deepcopy(self)
 
+    def clone(self, np_random: Optional[np.random.RandomState] = None) -> "DurakGame":
+        """
+        Cheap copy for search. Only the small lists making up the table, hands, deck and turn order are
+        sliced, while cards (immutable tuples), config and the agents themselves are shared. The history
+        is forked, and listeners and the profiler are not carried over.
+        :param np_random: random generator of the clone. By default the clone shares this game's generator,
+            which the engine only draws from when dealing, so sharing it only matters to a clone that is
+            reset. Copying a generator costs more than the rest of the clone, pass one to keep them apart.
+        """
+        game = type(self).__new__(type(self))
+        game.defender_has_taken = self.defender_has_taken
+        game.lowest_card = self.lowest_card
+        game.num_players = self.num_players
+        game.allow_step_back = self.allow_step_back
+        game.np_random = np_random if np_random is not None else self.np_random
+        game.deck = self.deck.clone()
+        game.player_hands = [hand[:] for hand in self.player_hands]
+        game.visible_card = self.visible_card
+        game.attackers = self.attackers[:]
+        game.defender = self.defender
+        game.player_agents = self.player_agents
+        game.players = self.players[:] if self.players is not None else None
+        game.in_players = self.in_players[:]
+        game.attack_table = self.attack_table[:]
+        game.defend_table = self.defend_table[:]
+        game.stopped_attacking = self.stopped_attacking[:]
+        game.player_taking_action = self.player_taking_action
+        game.is_done = self.is_done
+        game.graveyard = self.graveyard[:]
+        game.seed = self.seed
+        game.deal_seed = self.deal_seed
+        game.history = self.history.fork() if self.history is not None else None
+        game._listeners = {}
+        game.profiler = None
+        return game
+
     def get_whole_state(self):
         return copy.deepcopy(
             {
@@ -0,0 +1,204 @@
+"""
+Compact history of a three_game. Rather than keeping a full DurakGameState for every ply, the history keeps
+the seed the game was dealt with, the log of (player, action) pairs and a checkpoint of the whole
+state every `checkpoint_every` plies. The state or observation at any ply is rebuilt by replaying the
+logged actions from the nearest checkpoint, and observations are only materialized (and then cached per
+player) when somebody actually asks for them.
+"""
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from .game_state import DurakGameState, ObservableDurakGameState
+
+
+class GameCheckpoint(NamedTuple):
+    """
+    Everything needed to restore the engine at a given ply. in_players is kept alongside the state since
+    the engine only updates it at the end of a round, so it cannot be derived from the hands mid-round.
+    """
+    state: DurakGameState
+    in_players: Tuple[int, ...]
+
+
+class DurakGameHistory:
+    """
+    Holds the action log and periodic checkpoints of a single game. Ply 0 is the state after dealing
+    and ply i is the state after the i-th logged action, so there are always len(actions) + 1 plies.
+
+    A fork points at the history it was forked from and only stores the actions logged since, which is
+    safe since logs are append-only: the parent can keep growing without changing the plies the fork
+    shares with it. A fork keeps its parents alive, and is flattened when pickled.
+    """
+
+    def __init__(
+        self,
+        initial: GameCheckpoint,
+        num_players: int,
+        lowest_card: int,
+        seed: Optional[int] = None,
+        checkpoint_every: int = 32,
+    ):
+        self.seed = seed
+        self.num_players = num_players
+        self.lowest_card = lowest_card
+        self.checkpoint_every = checkpoint_every
+        self._parent: Optional[DurakGameHistory] = None  # history this one was forked from
+        self._base = 0  # number of the parent's actions logged before the fork
+        self._actions: List[Tuple[int, int]] = []  # (player_id, action_id) per ply logged since the fork
+        self.checkpoints: Dict[int, GameCheckpoint] = {0: initial}
+        self._observations: Dict[int, List[ObservableDurakGameState]] = {}
+
+    def __len__(self):
+        return self._base + len(self._actions) + 1
+
+    def __getstate__(self):
+        # Observations are just a cache, they can always be rebuilt from the log
+        state = self.__dict__.copy()
+        state["_observations"] = {}
+        state["_parent"] = None
+        state["_base"] = 0
+        state["_actions"] = self.actions
+        return state
+
+    @property
+    def actions(self) -> List[Tuple[int, int]]:
+        """
+        The whole log, (player_id, action_id) per ply. For a fork this joins its own actions to those of
+        its parents, so hot paths should use len(history) rather than the log.
+        """
+        if self._parent is None:
+            return self._actions
+        segments = [self._actions]
+        stop = self._base
+        history = self._parent
+        while history is not None:
+            segments.append(history._actions[:stop - history._base])
+            stop = history._base
+            history = history._parent
+        return [action for segment in reversed(segments) for action in segment]
+
+    def fork(self) -> "DurakGameHistory":
+        """
+        Returns a history that can be extended independently, in constant time with respect to the length
+        of the log: the fork points at this history instead of copying its log. Checkpoints are immutable
+        so they are shared, only the checkpoint index is copied.
+        """
+        history = DurakGameHistory.__new__(DurakGameHistory)
+        history.seed = self.seed
+        history.num_players = self.num_players
+        history.lowest_card = self.lowest_card
+        history.checkpoint_every = self.checkpoint_every
+        if self._actions or self._parent is None:
+            history._parent = self
+            history._base = len(self) - 1
+        else:
+            # nothing was logged since this history was forked, so skip it in the chain
+            history._parent = self._parent
+            history._base = self._base
+        history._actions = []
+        history.checkpoints = dict(self.checkpoints)
+        history._observations = {}
+        return history
+
+    def reset_initial_state(self, initial: GameCheckpoint):
+        """
+        Replaces the initial checkpoint. This is only allowed before any action has been logged, e.g. when
+        a game has been set up by hand after dealing.
+        """
+        if len(self) > 1:
+            raise ValueError("Cannot replace the initial state of a game that has already started")
+        self.checkpoints = {0: initial}
+        self._observations = {}
+
+    def append(self, player_id: int, action_id: int, checkpoint: Callable[[], GameCheckpoint]):
+        """
+        Logs an action. checkpoint is only called when the new ply falls on a checkpoint boundary.
+        """
+        self._actions.append((player_id, int(action_id)))
+        ply = len(self) - 1
+        if ply % self.checkpoint_every == 0:
+            self.checkpoints[ply] = checkpoint()
+
+    def _game_at(self, ply: int):
+        """
+        Returns a scratch engine restored at the nearest checkpoint at or before ply, together with
+        the ply it was restored at.
+        """
+        from .game import DurakGame
+
+        base = (ply // self.checkpoint_every) * self.checkpoint_every
+        game = DurakGame.from_checkpoint(self.checkpoints[base], self.num_players, self.lowest_card)
+        return game, base
+
+    def state_at(self, ply: int) -> DurakGameState:
+        """
+        Reconstructs the full state of the game at ply.
+        """
+        ply = self._check_ply(ply)
+        game, base = self._game_at(ply)
+        for player_id, action_id in self.actions[base:ply]:
+            game._apply_action(player_id, action_id)
+        return game.checkpoint().state
+
+    def iter_states(self) -> Iterator[DurakGameState]:
+        """
+        Yields the full state at every ply in a single replay from the initial checkpoint.
+        """
+        game, _ = self._game_at(0)
+        yield game.checkpoint().state
+        for player_id, action_id in self.actions:
+            game._apply_action(player_id, action_id)
+            yield game.checkpoint().state
+
+    def observation(self, player_id: int, ply: int) -> ObservableDurakGameState:
+        """
+        Returns the observation of player_id at ply, materializing (and caching) every observation of that
+        player up to ply that has not been asked for yet.
+        """
+        ply = self._check_ply(ply)
+        cache = self._observations.setdefault(player_id, [])
+        if ply >= len(cache):
+            start = len(cache)
+            game, base = self._game_at(start)
+            actions = self.actions
+            for i in range(base, ply + 1):
+                if i >= start:
+                    cache.append(game.current_state().observable(player_id))
+                if i < ply:
+                    game._apply_action(*actions[i])
+        return cache[ply]
+
+    def observations(self, player_id: int) -> "LazyObservations":
+        """
+        Returns a read-only sequence of the observations of player_id over the history so far.
+        """
+        return LazyObservations(self, player_id, len(self))
+
+    def _check_ply(self, ply: int) -> int:
+        if ply < 0:
+            ply += len(self)
+        if not 0 <= ply < len(self):
+            raise IndexError("Ply {} out of range for history of length {}".format(ply, len(self)))
+        return ply
+
+
+class LazyObservations(Sequence):
+    """
+    A snapshot view over a player's observations that only builds observations when they are indexed.
+    """
+
+    def __init__(self, history: DurakGameHistory, player_id: int, length: int):
+        self.history = history
+        self.player_id = player_id
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(self.length))]
+        if item < 0:
+            item += self.length
+        if not 0 <= item < self.length:
+            raise IndexError("Observation index out of range")
+        return self.history.observation(self.player_id, item)
@@ -0,0 +1,331 @@
+"""
+Columnar on-disk format for game histories. A store is a directory of shards plus an index.json listing them.
+Every shard is a directory holding one .npy file per column, uncompressed so that readers can memory-map
+it, with one row per ply for the columns below, and a per-game offset array into those rows so that any ply
+of any game can be read without touching the others. Readers also open the compressed .npz shards of older
+stores.
+
+Per ply: game, ply, player, action, defender, attack_size, defend_size, deck_size and hands, where hands
+holds one uint64 per player with bit i set when the player holds the card with DurakAction.ext_from_card
+equal to i. The last ply of a game is the final state and has action -1.
+Per game: game_offsets, seeds, trumps and rewards.
+
+All games in a store must have the same number of players.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .actions import DurakAction
+from .history import DurakGameHistory
+
+PLY_COLUMNS = {
+    "game": np.int32,
+    "ply": np.int16,
+    "player": np.int8,
+    "action": np.int16,
+    "defender": np.int8,
+    "attack_size": np.int8,
+    "defend_size": np.int8,
+    "deck_size": np.int8,
+}
+GAME_COLUMNS = {
+    "seeds": np.int64,
+    "trumps": np.int8,
+    "rewards": np.float32,
+}
+NUM_CARDS = DurakAction.n(4)
+CARD_BITS = {
+    DurakAction.card_from_ext(ext): 1 << ext for ext in range(NUM_CARDS)
+}
+_BIT_SHIFTS = np.arange(NUM_CARDS, dtype=np.uint64)
+
+
+def pack_cards(cards: Sequence[tuple]) -> int:
+    """
+    Packs a collection of cards into an integer bitmask.
+    """
+    bits = 0
+    for card in cards:
+        bits |= CARD_BITS[card]
+    return bits
+
+
+def unpack_cards(words: np.ndarray) -> np.ndarray:
+    """
+    Unpacks an array of bitmasks into a boolean array with a trailing axis of size NUM_CARDS.
+    """
+    return ((np.asarray(words, dtype=np.uint64)[..., None] >> _BIT_SHIFTS) & np.uint64(1)).astype(bool)
+
+
+def cards_from_mask(mask: np.ndarray) -> Tuple[tuple, ...]:
+    """
+    Converts one row of unpack_cards back into card tuples.
+    """
+    return tuple(DurakAction.card_from_ext(int(ext)) for ext in np.flatnonzero(mask))
+
+
+class HistoryWriter:
+    """
+    Streams games into a store, writing a new shard every games_per_shard games. Opening an existing store
+    appends new shards to it.
+    """
+
+    def __init__(self, directory: Path, games_per_shard: int = 1024):
+        self.directory = Path(directory)
+        self.games_per_shard = games_per_shard
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index = _load_index(self.directory)
+        self._reset_buffers()
+
+    def _reset_buffers(self):
+        self._columns: Dict[str, List[int]] = {name: [] for name in PLY_COLUMNS}
+        self._hands: List[List[int]] = []
+        self._game_offsets = [0]
+        self._seeds: List[int] = []
+        self._trumps: List[int] = []
+        self._rewards: List[Sequence[float]] = []
+
+    def write_game(self, history: DurakGameHistory, rewards: Optional[Sequence[float]] = None):
+        """
+        Appends a single game. rewards defaults to zeros for games that were not played to the end.
+        """
+        if self.index["num_players"] is None:
+            self.index["num_players"] = history.num_players
+        elif self.index["num_players"] != history.num_players:
+            raise ValueError("Store holds {}-player games, cannot add a {}-player game".format(
+                self.index["num_players"], history.num_players
+            ))
+        game = len(self._seeds)
+        columns = self._columns
+        actions = history.actions
+        state = None
+        for ply, state in enumerate(history.iter_states()):
+            columns["game"].append(game)
+            columns["ply"].append(ply)
+            columns["player"].append(state.player_taking_action)
+            columns["action"].append(actions[ply][1] if ply < len(actions) else -1)
+            columns["defender"].append(state.defender)
+            columns["attack_size"].append(len(state.attack_table))
+            columns["defend_size"].append(len(state.defend_table))
+            columns["deck_size"].append(len(state.deck))
+            self._hands.append([pack_cards(hand) for hand in state.player_hands])
+        self._game_offsets.append(len(columns["game"]))
+        self._seeds.append(-1 if history.seed is None else history.seed)
+        self._trumps.append(DurakAction.ext_from_card(state.visible_card))
+        self._rewards.append(rewards if rewards is not None else [0.0] * history.num_players)
+        if len(self._seeds) >= self.games_per_shard:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered games to a new shard and updates the index.
+        """
+        if not self._seeds:
+            return
+        shard = "shard_{:06d}".format(len(self.index["shards"]))
+        arrays = {name: np.array(values, dtype=PLY_COLUMNS[name]) for name, values in self._columns.items()}
+        arrays["hands"] = np.array(self._hands, dtype=np.uint64)
+        arrays["game_offsets"] = np.array(self._game_offsets, dtype=np.int64)
+        arrays["seeds"] = np.array(self._seeds, dtype=GAME_COLUMNS["seeds"])
+        arrays["trumps"] = np.array(self._trumps, dtype=GAME_COLUMNS["trumps"])
+        arrays["rewards"] = np.array(self._rewards, dtype=GAME_COLUMNS["rewards"])
+        (self.directory / shard).mkdir(exist_ok=True)
+        for name, array in arrays.items():
+            np.save(self.directory / shard / f"{name}.npy", array)
+        self.index["shards"].append({
+            "file": shard,
+            "num_games": len(self._seeds),
+            "num_plies": len(self._columns["game"]),
+        })
+        _save_index(self.directory, self.index)
+        self._reset_buffers()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class HistoryReader:
+    """
+    Reads a store shard by shard. Only the index and the per-game columns are loaded up front, the per-ply
+    columns of a shard are memory-mapped when a game in it is first read. Rows of game i are
+    game_offsets[i]:game_offsets[i + 1], counted over all shards.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.index = _load_index(self.directory)
+        self.num_players = self.index["num_players"]
+        self._shards: Dict[int, _Shard] = {}
+        infos = self.index["shards"]
+        # first game and first row of every shard, plus one past the last
+        self._shard_games = np.cumsum([0] + [info["num_games"] for info in infos])
+        shard_rows = np.cumsum([0] + [info["num_plies"] for info in infos])
+        offsets = [np.zeros(1, dtype=np.int64)]
+        game_columns = {name: [] for name in GAME_COLUMNS}
+        for i in range(len(infos)):
+            shard = self._shard(i)
+            offsets.append(np.asarray(shard["game_offsets"][1:]) + shard_rows[i])
+            for name, arrays in game_columns.items():
+                arrays.append(np.asarray(shard[name]))
+        self.game_offsets = np.concatenate(offsets)
+        self.game_columns = {
+            name: _concatenate(arrays, name, self.num_players) for name, arrays in game_columns.items()
+        }
+        self.columns = _Columns(self)
+
+    def _shard(self, index: int) -> "_Shard":
+        shard = self._shards.get(index)
+        if shard is None:
+            shard = self._shards[index] = _Shard(self.directory / self.index["shards"][index]["file"])
+        return shard
+
+    def _locate(self, game: int) -> Tuple["_Shard", slice]:
+        """
+        The shard holding game and the rows of the game within it.
+        """
+        if not 0 <= game < self.num_games:
+            raise IndexError("Game {} out of range for a store of {} games".format(game, self.num_games))
+        index = int(np.searchsorted(self._shard_games, game, side="right")) - 1
+        offsets = self._shard(index)["game_offsets"]
+        local = game - int(self._shard_games[index])
+        return self._shard(index), slice(int(offsets[local]), int(offsets[local + 1]))
+
+    @property
+    def num_games(self) -> int:
+        return len(self.game_offsets) - 1
+
+    @property
+    def num_plies(self) -> int:
+        return int(self.game_offsets[-1])
+
+    def rows(self, game: int) -> slice:
+        return slice(int(self.game_offsets[game]), int(self.game_offsets[game + 1]))
+
+    def row(self, game: int, ply: int) -> int:
+        rows = self.rows(game)
+        if not 0 <= ply < rows.stop - rows.start:
+            raise IndexError("Ply {} out of range for game {}".format(ply, game))
+        return rows.start + ply
+
+    def game(self, game: int) -> Dict[str, np.ndarray]:
+        """
+        Returns every per-ply column of a single game, reading only the shard holding it.
+        """
+        shard, rows = self._locate(game)
+        columns = {name: np.asarray(shard[name][rows]) for name in list(PLY_COLUMNS) + ["hands"]}
+        columns["game"] = np.full(rows.stop - rows.start, game, dtype=PLY_COLUMNS["game"])
+        return columns
+
+    def hands(self, rows=slice(None)) -> np.ndarray:
+        """
+        Returns the hands at the given rows, counted over all shards, as a boolean array of shape
+        [..., num_players, NUM_CARDS]. This reads the hands of every shard, see hands_at for a single ply.
+        """
+        return unpack_cards(self.columns["hands"][rows])
+
+    def hands_at(self, game: int, ply: int) -> Tuple[Tuple[tuple, ...], ...]:
+        """
+        Returns the hands of every player at a single ply as tuples of cards, sorted by card index.
+        """
+        shard, rows = self._locate(game)
+        if not 0 <= ply < rows.stop - rows.start:
+            raise IndexError("Ply {} out of range for game {}".format(ply, game))
+        return tuple(cards_from_mask(mask) for mask in unpack_cards(shard["hands"][rows.start + ply]))
+
+
+class _Shard(Mapping):
+    """
+    The columns of one shard, opened on first access: memory-mapped .npy files of a shard directory, or
+    the members of an older .npz shard.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._npz = None if path.is_dir() else np.load(path)
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        array = self._arrays.get(name)
+        if array is None:
+            if self._npz is not None:
+                array = self._npz[name]
+            else:
+                array = np.load(self.path / f"{name}.npy", mmap_mode="r")
+            self._arrays[name] = array
+        return array
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(PLY_COLUMNS) + ["hands", "game_offsets"] + list(GAME_COLUMNS))
+
+    def __len__(self) -> int:
+        return len(PLY_COLUMNS) + 2 + len(GAME_COLUMNS)
+
+
+class _Columns(Mapping):
+    """
+    Flat columns over all the games of a reader. Per-game columns are loaded with the reader, a per-ply
+    column is concatenated from every shard the first time it is asked for.
+    """
+
+    def __init__(self, reader: HistoryReader):
+        self.reader = reader
+        self._ply_columns: Dict[str, np.ndarray] = {}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        reader = self.reader
+        if name in reader.game_columns:
+            return reader.game_columns[name]
+        if name not in PLY_COLUMNS and name != "hands":
+            raise KeyError(name)
+        column = self._ply_columns.get(name)
+        if column is None:
+            if name == "game":
+                # game ids within shards restart at 0, so rebuild them globally
+                column = np.repeat(
+                    np.arange(reader.num_games, dtype=PLY_COLUMNS["game"]), np.diff(reader.game_offsets)
+                )
+            else:
+                shards = [reader._shard(i) for i in range(len(reader.index["shards"]))]
+                column = _concatenate([np.asarray(shard[name]) for shard in shards], name, reader.num_players)
+            self._ply_columns[name] = column
+        return column
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(PLY_COLUMNS) + ["hands"] + list(GAME_COLUMNS))
+
+    def __len__(self) -> int:
+        return len(PLY_COLUMNS) + 1 + len(GAME_COLUMNS)
+
+
+def _concatenate(arrays: List[np.ndarray], name: str, num_players: Optional[int]) -> np.ndarray:
+    if arrays:
+        return np.concatenate(arrays)
+    dtype = {**PLY_COLUMNS, **GAME_COLUMNS}.get(name, np.uint64)
+    # hands and rewards have a column per player
+    shape = (0, num_players or 0) if name in ("hands", "rewards") else (0,)
+    return np.zeros(shape, dtype=dtype)
+
+
+def _load_index(directory: Path) -> dict:
+    path = directory / "index.json"
+    if not path.exists():
+        return {"num_players": None, "shards": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_index(directory: Path, index: dict):
+    tmp = directory / "index.json.tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp, directory / "index.json")
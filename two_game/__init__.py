@@ -6,5 +6,6 @@ from .game import (
     ObservableGameState,
     GameState,
     Card,
-    new_state
+    new_states,
 )
+from .backend import get_backend, set_backend, new_state, legal_actions, step
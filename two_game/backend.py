@@ -0,0 +1,256 @@
+"""
+Engine backends serving the two_game API: new_state, legal_actions and step over GameState values. The
+pure-Python engine in two_game.game is always available. The native durak_rt extension plays the games in
+Rust and hands back ordinary GameState snapshots, so observable(), to_array() and everything built on them,
+such as DQNPlayer, see the same layout whichever backend runs.
+
+The backend is picked with set_backend or the DURAK_BACKEND environment variable: "python" (the default),
+"rust", or "auto" for rust when it is available. Asking for rust without the extension built falls back to
+python with a warning.
+
+Each backend has a deck it deals when callers do not ask for one (Backend.lowest_rank): the 20-card deck of
+lowest_rank=9 for python and the 36-card one of lowest_rank=6, the only deck durak_rt plays, for rust.
+GameRunner.run, TwoGameEnv and rl.evaluation deal that deck by default. Games of other decks are dealt and
+played by python whichever backend is picked.
+"""
+import abc
+import os
+import warnings
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from three_game import DurakAction
+from . import game
+from .game import Card, GameState
+
+BACKEND_ENV_VAR = "DURAK_BACKEND"
+BACKENDS = ("python", "rust", "auto")
+
+
+class Backend(abc.ABC):
+    name = None
+    lowest_rank = 9  # the deck dealt when callers do not ask for one
+
+    def supports(self, lowest_rank: int) -> bool:
+        return True
+
+    @abc.abstractmethod
+    def new_state(self, seed: int, lowest_rank: int) -> GameState:
+        ...
+
+    def deal(self, seed: int = 0, lowest_rank: Optional[int] = None) -> GameState:
+        """
+        new_state, or the Python engine's new_state if this backend does not play that deck. lowest_rank
+        defaults to the backend's own deck.
+        """
+        if lowest_rank is None:
+            lowest_rank = self.lowest_rank
+        if self.supports(lowest_rank):
+            return self.new_state(seed, lowest_rank)
+        return game.new_state(seed, lowest_rank)
+
+    @abc.abstractmethod
+    def legal_actions(self, state: GameState) -> List[DurakAction]:
+        ...
+
+    @abc.abstractmethod
+    def step(self, state: GameState, action: DurakAction) -> GameState:
+        ...
+
+
+class PythonBackend(Backend):
+    name = "python"
+
+    new_state = staticmethod(game.new_state)
+    legal_actions = staticmethod(game.legal_actions)
+    step = staticmethod(game.step)
+
+
+# durak_rt action ids, see twogame_rust/durak_rt/src/game/actions.rs
+RUST_STOP, RUST_TAKE, RUST_ATTACK, RUST_DEFEND = 0, 1, 2, 38
+
+
+def to_rust_action(action: int) -> int:
+    if DurakAction.is_stop_attacking(action):
+        return RUST_STOP
+    if DurakAction.is_take(action):
+        return RUST_TAKE
+    if DurakAction.is_attack(action):
+        return RUST_ATTACK + action
+    return RUST_DEFEND + action - DurakAction.n(4)
+
+
+def from_rust_action(action: int) -> DurakAction:
+    if action == RUST_STOP:
+        return DurakAction.stop_attacking()
+    if action == RUST_TAKE:
+        return DurakAction.take_action()
+    if action < RUST_DEFEND:
+        return DurakAction(action - RUST_ATTACK)
+    return DurakAction(action - RUST_DEFEND + DurakAction.n(4))
+
+
+def _card(index: int) -> Card:
+    return Card(*DurakAction.card_from_ext(index))
+
+
+# Card of every durak_rt card index and back
+_CARDS = tuple(_card(index) for index in range(36))
+_INDICES = {card: index for index, card in enumerate(_CARDS)}
+
+
+def _card_lists(state: GameState) -> Tuple[Sequence[Card], ...]:
+    """
+    The cards of state in the order of durak_rt's full_state: deck, both hands, tables and graveyard.
+    """
+    return (state.deck, *state.hands, state.attack_table, state.defend_table, state.graveyard)
+
+
+class RustBackend(Backend):
+    """
+    Plays the 36-card games in one durak_rt game. Stepping the state it last returned carries on with that
+    game, any other state is restored into it first, so a game costs one native step per move and a search
+    stepping earlier states one restore per move it explores. States of other decks are played by the Python
+    engine. The native game is shared by every call, so a backend must not be used from several threads.
+    """
+    name = "rust"
+    lowest_rank = 6  # the only deck durak_rt plays
+
+    def __init__(self):
+        from durak_rt.wrapper import StepEnv  # fails early when the extension is not built
+        self.env = StepEnv()
+        self._state: Optional[GameState] = None  # the state the native game is at
+        # full_state of the native game at _state and the cards of _state, reused by the next snapshot for
+        # whatever the step left unchanged
+        self._indices: Tuple[Optional[List[int]], ...] = (None,) * 6
+        self._cards: Tuple[Optional[Tuple[Card, ...]], ...] = (None,) * 6
+
+    def supports(self, lowest_rank: int) -> bool:
+        return lowest_rank == self.lowest_rank
+
+    def new_state(self, seed: int = 0, lowest_rank: int = 6) -> GameState:
+        if not self.supports(lowest_rank):
+            raise ValueError(f"durak_rt only plays the 36-card deck, lowest_rank must be {self.lowest_rank}")
+        deck = game.new_deck(np.random.RandomState(seed), lowest_rank)
+        self.env.deal([_INDICES[card] for card in deck])
+        return self._snapshot()
+
+    def _snapshot(self) -> GameState:
+        """
+        The state of the native game, sharing the card tuples of the previous snapshot that did not change.
+        """
+        full_state = self.env.full_state()
+        indices = full_state[:6]
+        cards = tuple(
+            previous if each == previous_indices else tuple(map(_CARDS.__getitem__, each))
+            for each, previous_indices, previous in zip(indices, self._indices, self._cards)
+        )
+        visible_card, acting, defender, taken = full_state[6:]
+        deck, hand1, hand2, attack_table, defend_table, graveyard = cards
+        self._state = GameState(
+            deck=deck,
+            hands=(hand1, hand2),
+            visible_card=_CARDS[visible_card],
+            attack_table=attack_table,
+            defend_table=defend_table,
+            graveyard=graveyard,
+            is_done=self.env.done,
+            player_taking_action=acting,
+            defender=defender,
+            defender_has_taken=taken,
+        )
+        self._indices, self._cards = indices, cards
+        return self._state
+
+    def _play(self, state: GameState) -> bool:
+        """
+        Puts the native game at state unless it already is, or returns False if state is not a 36-card game.
+        """
+        if state is self._state:
+            return True
+        cards = tuple(map(tuple, _card_lists(state)))
+        if sum(map(len, cards)) != len(_CARDS):
+            return False
+        indices = tuple([_INDICES[card] for card in each] for each in cards)
+        self.env.restore((
+            *indices, _INDICES[state.visible_card], state.player_taking_action, state.defender,
+            state.defender_has_taken,
+        ))
+        self._state, self._indices, self._cards = state, indices, cards
+        return True
+
+    def legal_actions(self, state: GameState) -> List[DurakAction]:
+        if state.is_done:
+            return []
+        if not self._play(state):
+            return game.legal_actions(state)
+        return [from_rust_action(action) for action in np.flatnonzero(self.env.legal_mask)]
+
+    def step(self, state: GameState, action: DurakAction) -> GameState:
+        if not self._play(state):
+            return game.step(state, action)
+        self.env.step(to_rust_action(action))
+        return self._snapshot()
+
+
+def rust_unavailable_reason() -> Optional[str]:
+    try:
+        import durak_rt.wrapper  # noqa: F401
+    except ImportError as e:
+        return f"durak_rt is not built ({e})"
+    return None
+
+
+_backend: Optional[Backend] = None
+
+
+def make_backend(name: str) -> Backend:
+    """
+    Creates the named backend, falling back to python with a warning if rust is asked for but unavailable.
+    Picking rust also warns that callers then deal the 36-card deck by default.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r}, must be one of {BACKENDS}")
+    if name == "python":
+        return PythonBackend()
+    reason = rust_unavailable_reason()
+    if reason is None:
+        warnings.warn(
+            f"The rust backend deals lowest_rank={RustBackend.lowest_rank} games unless asked for another deck, "
+            "which python then deals and plays"
+        )
+        return RustBackend()
+    if name == "rust":
+        warnings.warn(f"Falling back to the python backend: {reason}")
+    return PythonBackend()
+
+
+def set_backend(name: str) -> Backend:
+    global _backend
+    _backend = make_backend(name)
+    return _backend
+
+
+def get_backend() -> Backend:
+    """
+    The backend set with set_backend, or else the one named by DURAK_BACKEND, python if it is unset or empty.
+    """
+    if _backend is None:
+        set_backend(os.environ.get(BACKEND_ENV_VAR, "").strip().lower() or "python")
+    return _backend
+
+
+def new_state(seed: int = 0, lowest_rank: Optional[int] = None) -> GameState:
+    """
+    Deals a new game with the current backend, see Backend.deal.
+    """
+    return get_backend().deal(seed, lowest_rank)
+
+
+def legal_actions(state: GameState) -> List[DurakAction]:
+    return get_backend().legal_actions(state)
+
+
+def step(state: GameState, action: DurakAction) -> GameState:
+    return get_backend().step(state, action)
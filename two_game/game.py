@@ -6,7 +6,29 @@ from typing import Tuple, NamedTuple, Literal, Collection, List, Set, Optional
 import torch
 from pathlib import Path
 import os
-from three_game import DurakAction
+from three_game import DurakAction, GameTransition
+from three_game.dealing import deal_batch
+from durak_common.events import (
+    EventEmitter,
+    StepEvent,
+    TakeEvent,
+    RoundOverEvent,
+    GameEndEvent,
+    STEP,
+    TAKE,
+    ROUND_OVER,
+    GAME_END,
+)
+from durak_common.profiling import (
+    PhaseProfiler,
+    DECISION,
+    INFORMATION_STATE,
+    LEGAL_ACTIONS,
+    TRANSITION,
+    REWARDS,
+    HISTORY,
+    EVENT_EMISSION,
+)
 
 
 class Card(NamedTuple):
@@ -251,7 +273,15 @@ def new_state(seed: int = 0, lowest_rank: int = 9) -> GameState:
     Creates a new game state
     """
     rand = np.random.RandomState(seed)
-    d = new_deck(rand, lowest_rank)
+    return state_from_deck(new_deck(rand, lowest_rank), rand)
+
+
+def state_from_deck(deck: List[Card], rand: np.random.RandomState) -> GameState:
+    """
+    Deals a new game state from an ordered deck. The last cards are dealt first and the first card is the
+    visible card. rand picks the first attacker when neither player holds a trump.
+    """
+    d = list(deck)
     hands = tuple([[d.pop() for _ in range(6)] for _ in range(2)])
     visible_card = d[0]
     attack_table = ()
@@ -276,6 +306,34 @@ def new_state(seed: int = 0, lowest_rank: int = 9) -> GameState:
     )
 
 
+# Card of every card id of three_game.dealing
+_CARDS = [Card(*DurakAction.card_from_ext(card)) for card in range(DurakAction.n(4))]
+
+
+def new_states(num_games: int, seed: int = 0, lowest_rank: int = 9, start: int = 0) -> List[GameState]:
+    """
+    Deals games start to start + num_games of seed at once with three_game.dealing.deal_batch, each game
+    being the same whichever batch it is dealt in. These are other deals than new_state(seed), which
+    stays as it is so that earlier runs can be reproduced.
+    """
+    deals = deal_batch(num_games, seed, lowest_rank, start=start)
+    states = []
+    for stock, hands, first_attacker in zip(deals.stock.tolist(), deals.hands.tolist(), deals.first_attacker.tolist()):
+        states.append(GameState(
+            deck=[_CARDS[card] for card in stock],
+            hands=tuple(tuple(_CARDS[card] for card in hand) for hand in hands),
+            visible_card=_CARDS[stock[0]],
+            attack_table=(),
+            defend_table=(),
+            graveyard=(),
+            is_done=False,
+            player_taking_action=first_attacker,
+            defender=(first_attacker + 1) % 2,
+            defender_has_taken=False,
+        ))
+    return states
+
+
 def _refill_player_hands(state: GameState) -> GameState:
     """
     Refills the players' hands after the end of a round if needed
@@ -519,12 +577,16 @@ def step(state: GameState, action: DurakAction) -> GameState:
     return new_state._replace(is_done=_check_done(new_state))
 
 
-class GameRunner:
-    def __init__(self):
+class GameRunner(EventEmitter):
+    def __init__(self, backend=None):
+        from .backend import get_backend  # two_game.backend builds on this module
         self.state_history = []  # Holds a list of perfect-information states
         self.action_history = []  # Holds a list of actions taken by player
         self.reward_history = []  # Holds a list of tuples of rewards for each player
         self.agents = [None, None]
+        self._listeners = {}  # event name -> listeners, see durak_common.events
+        self.profiler: Optional[PhaseProfiler] = None  # per-phase timings, see durak_common.profiling
+        self.backend = backend if backend is not None else get_backend()  # engine playing the games
 
     def set_agent(self, idx, agent):
         if idx not in range(len(self.agents)):
@@ -580,24 +642,88 @@ class GameRunner:
     def step(self) -> GameState:
         if any(agent is None for agent in self.agents):
             raise ValueError("Agent is None")
+        profiler = self.profiler
+        if profiler is not None:
+            t = profiler.start_step()
         state = self.state_history[-1]
-        actions = legal_actions(state)
+        actions = self.backend.legal_actions(state)
+        if profiler is not None:
+            t = profiler.lap(LEGAL_ACTIONS, t)
         if not len(actions):
-            return state._replace(is_done=True)
-        information_state = self.get_information_state(state.player_taking_action)
-        action = self.agents[state.player_taking_action].choose_action(
+            state = state._replace(is_done=True)
+            if self._listeners:
+                self._emit(GAME_END, GameEndEvent(rewards(state), len(self.action_history), state))
+            if profiler is not None:
+                profiler.end_game()
+            return state
+        player_id = state.player_taking_action
+        information_state = self.get_information_state(player_id)
+        if profiler is not None:
+            t = profiler.lap(INFORMATION_STATE, t)
+        action = self.agents[player_id].choose_action(
             information_state[-1], actions, full_state=information_state
         )
-        state = step(state, action)
+        if profiler is not None:
+            t = profiler.lap(DECISION, t)
+        prev_state = state
+        state = self.backend.step(state, action)
+        if profiler is not None:
+            t = profiler.lap(TRANSITION, t)
+        reward = rewards(state)
+        if profiler is not None:
+            t = profiler.lap(REWARDS, t)
         self.state_history.append(state)
         self.action_history.append(action)
-        self.reward_history.append(rewards(state))
+        self.reward_history.append(reward)
+        if profiler is not None:
+            t = profiler.lap(HISTORY, t)
+        if self._listeners:
+            self._emit_step_events(player_id, action, prev_state, state)
+            if profiler is not None:
+                profiler.lap(EVENT_EMISSION, t)
+        if profiler is not None and state.is_done:
+            profiler.end_game()
         return state
 
+    def _emit_step_events(self, player_id: int, action: DurakAction, prev_state: GameState, state: GameState):
+        """
+        Emits the events following a step. A round is over once the table has been cleared, and in heads-up
+        the defender stays the defender exactly when they picked the table up.
+        """
+        self._emit(STEP, StepEvent(player_id, action, prev_state, state, rewards(state)))
+        if len(prev_state.attack_table) and not len(state.attack_table):
+            defender_took = state.defender == prev_state.defender
+            if defender_took:
+                self._emit(TAKE, TakeEvent(prev_state.defender, prev_state.attack_table + prev_state.defend_table))
+            attackers = ((prev_state.defender + 1) % 2,)
+            self._emit(ROUND_OVER, RoundOverEvent(attackers, prev_state.defender, defender_took, state))
+        if state.is_done:
+            self._emit(GAME_END, GameEndEvent(rewards(state), len(self.action_history), state))
+
+    def forward_transitions_to_players(self):
+        """
+        Registers a listener calling each agent's observe hook with every transition, seen from that
+        agent's perspective.
+        """
+        self.add_listener(STEP, self._forward_transition)
+
+    def _forward_transition(self, event: StepEvent):
+        for player_id, agent in enumerate(self.agents):
+            agent.observe(GameTransition(
+                state=event.state.observable(player_id),
+                action=event.action,
+                reward=event.rewards[player_id],
+                next_state=event.next_state.observable(player_id),
+            ))
+
     def run(
-        self, seed=0, init_state: Optional[GameState] = None
+        self, seed=0, init_state: Optional[GameState] = None, lowest_rank: Optional[int] = None
     ) -> Tuple[float, float]:
-        init_state = init_state if init_state is not None else new_state(seed)
+        """
+        Plays a game from init_state, or else from a deal of seed with the deck of lowest_rank, by default the
+        backend's own, see two_game.backend. Returns the rewards of both players.
+        """
+        init_state = init_state if init_state is not None else self.backend.deal(seed, lowest_rank)
         self.state_history = [init_state]
         if any(agent is None for agent in self.agents):
             raise ValueError("Agent is None")
@@ -2,13 +2,16 @@
 This file is a wrapper around the raw output from py03 to add type hints 
 and whatnot to the classes
 """
-from typing import List, Tuple
+from typing import Callable, List, NamedTuple, Optional, Tuple
 import numpy as np
 from durak_rt.rust import (
     Card as _Card, 
     GameEnv as _GameEnv, 
     ObservableGameState as _ObservableGameState,
-    ActionList as _ActionList
+    ActionList as _ActionList,
+    BatchRunner as _BatchRunner,
+    StepEnv as _StepEnv,
+    play_many as _play_many
 )
 
 
@@ -131,3 +134,113 @@ class GameEnv():
         return _GameEnv.num_actions()
 
 
+class StepEnv:
+    """
+    Game driven from Python one action at a time. After every reset and step, observation holds the view of
+    the acting player and legal_mask its legal actions. Both arrays are written in place by the engine, so
+    pass your own (e.g. rows of a preallocated batch) to avoid any copy.
+    """
+
+    def __init__(self, observation: Optional[np.ndarray] = None, legal_mask: Optional[np.ndarray] = None):
+        if observation is None:
+            observation = np.zeros(GameEnv.state_shape(), dtype=np.uint8)
+        if legal_mask is None:
+            legal_mask = np.zeros(GameEnv.num_actions(), dtype=bool)
+        self.observation = observation
+        self.legal_mask = legal_mask
+        self.env = _StepEnv(observation, legal_mask)
+
+    def reset(self, seed: int) -> int:
+        """Deals a new game and returns the acting player"""
+        return self.env.reset(seed)
+
+    def deal(self, cards: List[int]) -> int:
+        """
+        Deals a new game from a deck of card indices (suit * 9 + rank - 6 with suits S, H, D, C), the last card
+        being drawn first and the first one being the visible card. Returns the acting player.
+        """
+        return self.env.deal(cards)
+
+    def step(self, action: int) -> bool:
+        """Plays action for the acting player and returns whether the game is over"""
+        return self.env.step(action)
+
+    def full_state(self) -> tuple:
+        """
+        Returns (deck, hand1, hand2, attack_table, defense_table, graveyard, visible_card, acting_player,
+        defender, defender_has_taken) with cards as indices, as in deal
+        """
+        return self.env.full_state()
+
+    def restore(self, state: tuple) -> bool:
+        """
+        Puts the game in a state as returned by full_state, without replaying it, and returns whether the game
+        is over
+        """
+        return self.env.restore(state)
+
+    @property
+    def acting_player(self) -> int:
+        return self.env.acting_player
+
+    @property
+    def done(self) -> bool:
+        return self.env.done
+
+    def rewards(self) -> Tuple[float, float]:
+        """Returns the final rewards of both players, (0, 0) while the game is running"""
+        return self.env.rewards()
+
+
+# Called with the observations (B, 151), legal masks (B, num_actions) and history lengths (B,) of the games
+# waiting for a decision, returns one action index per game
+BatchPolicy = Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]
+
+
+class BatchRunner:
+    """
+    Plays n_games games with one seat taken by a Python policy and the other played natively. The policy is
+    called once per round with every game waiting for it, rather than once per move.
+    """
+
+    def __init__(self, n_games: int, python_player: int = 0, opponent: str = "random"):
+        self.runner = _BatchRunner(n_games, python_player, opponent)
+
+    def run(self, policy: BatchPolicy, seed: int) -> np.ndarray:
+        """Plays every game to the end and returns the (n_games, 2) rewards"""
+        return self.runner.run(policy, seed)
+
+    @property
+    def policy_calls(self) -> int:
+        """Number of times the policy has been called"""
+        return self.runner.policy_calls
+
+
+class Trajectories(NamedTuple):
+    """Every decision of a batch of games, game g being the steps offsets[g]:offsets[g + 1]"""
+    observations: np.ndarray  # (steps, 151) uint8, same layout as ObservableGameState.to_numpy
+    actions: np.ndarray  # (steps,) uint8 action indices
+    players: np.ndarray  # (steps,) uint8 acting player of each step
+    legal_masks: np.ndarray  # (steps, num_actions) bool
+    rewards: np.ndarray  # (n_games, 2) float32 final rewards of both players
+    offsets: np.ndarray  # (n_games + 1,) int64
+
+    def game(self, index: int) -> "Trajectories":
+        """Returns the steps of a single game"""
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return Trajectories(
+            self.observations[start:end],
+            self.actions[start:end],
+            self.players[start:end],
+            self.legal_masks[start:end],
+            self.rewards[index:index + 1],
+            self.offsets[index:index + 2] - start,
+        )
+
+
+def play_many(n_games: int, seed: int, policy: str = "random") -> Trajectories:
+    """
+    Plays n_games games natively and in parallel, without holding the GIL. Game i is dealt and played from
+    its own stream of seed, so the result only depends on n_games and seed.
+    """
+    return Trajectories(**_play_many(n_games, seed, policy))
@@ -1,6 +1,6 @@
 use core::fmt;
 
-use rand::seq::SliceRandom;
+use rand::{seq::SliceRandom, Rng};
 
 #[derive(Clone, Copy, PartialEq, Debug, Eq, Ord, PartialOrd)]
 pub enum Suit {
@@ -131,15 +131,28 @@ impl Deck {
         Deck { cards: cards }
     }
 
+    /// A deck holding `cards`, the last one being drawn first and the first one being the visible card.
+    pub fn from_cards(cards: Vec<Card>) -> Deck {
+        Deck { cards }
+    }
+
     pub fn len(&self) -> usize {
         self.cards.len()
     }
 
+    pub fn cards(&self) -> &[Card] {
+        &self.cards
+    }
+
     pub fn shuffle(&mut self) {
         let mut rng = rand::thread_rng();
         self.cards.shuffle(&mut rng);
     }
 
+    pub fn shuffle_with<R: Rng + ?Sized>(&mut self, rng: &mut R) {
+        self.cards.shuffle(rng);
+    }
+
     fn draw(&mut self) -> Option<Card> {
         self.cards.pop()
     }
@@ -0,0 +1,91 @@
+use super::{
+    actions::{num_actions, Action, ActionList},
+    cards::{Card, Suit},
+    gamestate::{GamePlayer, ObservableGameState},
+};
+
+/// Length of an encoded observation, the same layout as `ObservableGameStatePy::to_numpy`:
+/// acting player (2), hand (36), attack table (36), defense table (36), deck size (1),
+/// visible card (36), defender has taken (1), defender (2), cards in the opponent's hand (1).
+pub const OBS_SIZE: usize = 151;
+
+const HAND: usize = 2;
+const ATTACK_TABLE: usize = HAND + 36;
+const DEFENSE_TABLE: usize = ATTACK_TABLE + 36;
+const DECK_SIZE: usize = DEFENSE_TABLE + 36;
+const VISIBLE_CARD: usize = DECK_SIZE + 1;
+const DEFENDER_HAS_TAKEN: usize = VISIBLE_CARD + 36;
+const DEFENDER: usize = DEFENDER_HAS_TAKEN + 1;
+const CARDS_IN_OPPONENT: usize = DEFENDER + 2;
+
+// to_numpy goes through CardPy, which puts clubs before diamonds, unlike the action ids
+fn card_index(card: &Card) -> usize {
+    let suit = match card.suit {
+        Suit::Spades => 0,
+        Suit::Hearts => 1,
+        Suit::Clubs => 2,
+        Suit::Diamonds => 3,
+    };
+    suit * 9 + (card.rank - 6) as usize
+}
+
+fn player_index(player: GamePlayer) -> usize {
+    match player {
+        GamePlayer::Player1 => 0,
+        GamePlayer::Player2 => 1,
+    }
+}
+
+/// Writes the observation into `out`, which must hold at least `OBS_SIZE` entries.
+pub fn encode_observation(state: &ObservableGameState, out: &mut [u8]) {
+    let out = &mut out[..OBS_SIZE];
+    out.fill(0);
+    out[player_index(state.acting_player)] = 1;
+    for card in state.hand.0.iter() {
+        out[HAND + card_index(card)] = 1;
+    }
+    for card in state.attack_table.iter() {
+        out[ATTACK_TABLE + card_index(card)] = 1;
+    }
+    for card in state.defense_table.iter() {
+        out[DEFENSE_TABLE + card_index(card)] = 1;
+    }
+    out[DECK_SIZE] = state.num_cards_in_deck;
+    out[VISIBLE_CARD + card_index(&state.visible_card)] = 1;
+    out[DEFENDER_HAS_TAKEN] = state.defender_has_taken as u8;
+    out[DEFENDER + player_index(state.defender)] = 1;
+    out[CARDS_IN_OPPONENT] = state.cards_in_opponent;
+}
+
+/// Writes the legal action bitmap into `out`, which must hold at least `num_actions()` entries.
+pub fn encode_legal_actions(actions: &ActionList, out: &mut [bool]) {
+    let out = &mut out[..num_actions() as usize];
+    out.fill(false);
+    for action in actions.0.iter() {
+        out[<Action as Into<u8>>::into(*action) as usize] = true;
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use crate::game::game::Game;
+
+    use super::*;
+
+    #[test]
+    fn test_encode_new_game() {
+        let game = Game::new();
+        let mut out = vec![7; OBS_SIZE];
+        encode_observation(&game.game_state.observe(GamePlayer::Player1), &mut out);
+        assert_eq!(out[HAND..ATTACK_TABLE].iter().sum::<u8>(), 6);
+        assert_eq!(out[ATTACK_TABLE..DECK_SIZE].iter().sum::<u8>(), 0);
+        assert_eq!(out[DECK_SIZE], 24);
+        assert_eq!(out[VISIBLE_CARD..DEFENDER_HAS_TAKEN].iter().sum::<u8>(), 1);
+        assert_eq!(out[CARDS_IN_OPPONENT], 6);
+
+        let actions = game.legal_actions();
+        let mut mask = vec![true; num_actions() as usize];
+        encode_legal_actions(&actions, &mut mask);
+        assert_eq!(mask, actions.to_bitmap());
+    }
+}
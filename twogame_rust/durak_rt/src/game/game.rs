@@ -1,5 +1,7 @@
 use std::{collections::HashSet, vec};
 
+use rand::Rng;
+
 use super::{
     actions::{Action, ActionList},
     cards::{Card, Deck, Hand, Suit},
@@ -34,8 +36,18 @@ fn det_first_attacker(hand1: &Hand, hand2: &Hand, suit: Suit) -> GamePlayer {
 
 impl Game {
     pub fn new() -> Game {
+        Game::with_rng(&mut rand::thread_rng())
+    }
+
+    /// Deals a new game with the deck shuffled by `rng`, so that seeded games are reproducible.
+    pub fn with_rng<R: Rng + ?Sized>(rng: &mut R) -> Game {
         let mut deck = Deck::new(6);
-        deck.shuffle();
+        deck.shuffle_with(rng);
+        Game::from_deck(deck)
+    }
+
+    /// Deals a new game from an already ordered deck.
+    pub fn from_deck(mut deck: Deck) -> Game {
         let hand1 = Hand(deck.draw_n(6));
         let hand2 = Hand(deck.draw_n(6));
         let visible_card = deck.get_first().unwrap();
@@ -1,6 +1,8 @@
 // whatever to do in mod.rs
 pub mod actions;
 pub mod cards;
+pub mod encoding;
 pub mod game;
 pub mod gamestate;
 pub mod player;
+pub mod trajectory;
@@ -0,0 +1,135 @@
+use rand::{Rng, SeedableRng};
+use rand_chacha::ChaCha8Rng;
+use rayon::prelude::*;
+
+use super::{
+    actions::{num_actions, Action, ActionList},
+    encoding::{encode_legal_actions, encode_observation, OBS_SIZE},
+    game::{Game, GameLogic},
+};
+
+/// Policies that can play both seats natively, without calling back into Python.
+#[derive(Clone, Copy, PartialEq, Eq, Debug)]
+pub enum NativePolicy {
+    Random,
+}
+
+impl TryFrom<&str> for NativePolicy {
+    type Error = String;
+
+    fn try_from(name: &str) -> Result<Self, Self::Error> {
+        match name {
+            "random" => Ok(NativePolicy::Random),
+            _ => Err(format!("Unknown policy {:?}, expected \"random\"", name)),
+        }
+    }
+}
+
+impl NativePolicy {
+    pub fn choose_action<R: Rng>(&self, actions: &ActionList, rng: &mut R) -> Action {
+        match self {
+            NativePolicy::Random => actions.0[rng.gen_range(0..actions.0.len())],
+        }
+    }
+}
+
+/// Every decision of one or more games, stored flat so that it can be handed to NumPy without copying
+/// per step. Decision `i` has its observation at `observations[i * OBS_SIZE..(i + 1) * OBS_SIZE]` and its
+/// legal mask at `legal_masks[i * num_actions()..]`; game `g` covers the decisions `offsets[g]..offsets[g + 1]`.
+#[derive(Default)]
+pub struct Trajectories {
+    pub observations: Vec<u8>,
+    pub actions: Vec<u8>,
+    pub players: Vec<u8>,
+    pub legal_masks: Vec<bool>,
+    pub rewards: Vec<f32>,
+    pub offsets: Vec<i64>,
+}
+
+impl Trajectories {
+    pub fn num_steps(&self) -> usize {
+        self.actions.len()
+    }
+
+    pub fn num_games(&self) -> usize {
+        self.rewards.len() / 2
+    }
+
+    fn extend(&mut self, other: Trajectories) {
+        let start = self.num_steps() as i64;
+        self.offsets
+            .extend(other.offsets.iter().skip(1).map(|offset| start + offset));
+        self.observations.extend(other.observations);
+        self.actions.extend(other.actions);
+        self.players.extend(other.players);
+        self.legal_masks.extend(other.legal_masks);
+        self.rewards.extend(other.rewards);
+    }
+}
+
+/// Plays one game with `policy` in both seats. Game `stream` of `seed` is dealt and played with its own
+/// ChaCha stream, so the result does not depend on which thread runs it.
+pub fn play_game(seed: u64, stream: u64, policy: NativePolicy) -> Trajectories {
+    let mut rng = ChaCha8Rng::seed_from_u64(seed);
+    rng.set_stream(stream);
+    let mut game = Game::with_rng(&mut rng);
+    let mut trajectory = Trajectories::default();
+    let mask_size = num_actions() as usize;
+    while !game.is_over() {
+        let player = game.game_state.acting_player;
+        let actions = game.legal_actions();
+
+        let start = trajectory.observations.len();
+        trajectory.observations.resize(start + OBS_SIZE, 0);
+        encode_observation(
+            &game.game_state.observe(player),
+            &mut trajectory.observations[start..],
+        );
+        let start = trajectory.legal_masks.len();
+        trajectory.legal_masks.resize(start + mask_size, false);
+        encode_legal_actions(&actions, &mut trajectory.legal_masks[start..]);
+
+        let action = policy.choose_action(&actions, &mut rng);
+        trajectory.actions.push(u8::from(action));
+        trajectory.players.push(u8::from(player));
+        game.step(action).expect("native policies only choose legal actions");
+    }
+    let (reward1, reward2) = game.get_rewards();
+    trajectory.rewards = vec![reward1, reward2];
+    trajectory.offsets = vec![0, trajectory.num_steps() as i64];
+    trajectory
+}
+
+/// Plays `n_games` games on the rayon pool and concatenates them in game order.
+pub fn play_many(n_games: u64, seed: u64, policy: NativePolicy) -> Trajectories {
+    let games: Vec<Trajectories> = (0..n_games)
+        .into_par_iter()
+        .map(|stream| play_game(seed, stream, policy))
+        .collect();
+    let mut all = Trajectories::default();
+    all.offsets.push(0);
+    for game in games {
+        all.extend(game);
+    }
+    all
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_play_many_is_reproducible() {
+        let first = play_many(8, 3, NativePolicy::Random);
+        let second = play_many(8, 3, NativePolicy::Random);
+        assert_eq!(first.num_games(), 8);
+        assert_eq!(first.offsets.len(), 9);
+        assert_eq!(*first.offsets.last().unwrap() as usize, first.num_steps());
+        assert_eq!(first.observations.len(), first.num_steps() * OBS_SIZE);
+        assert_eq!(first.actions, second.actions);
+        assert_eq!(first.rewards, second.rewards);
+        for (i, action) in first.actions.iter().enumerate() {
+            assert!(first.legal_masks[i * num_actions() as usize + *action as usize]);
+        }
+    }
+}
@@ -1,7 +1,7 @@
 use pyo3::prelude::*;
 use python::{
-    actions_py::ActionListPy, card_py::CardPy, env_py::GameEnvPy,
-    gamestate_py::ObservableGameStatePy,
+    actions_py::ActionListPy, batch_runner_py::BatchRunnerPy, card_py::CardPy, env_py::GameEnvPy,
+    gamestate_py::ObservableGameStatePy, step_env_py::StepEnvPy, trajectory_py::play_many,
 };
 mod game;
 mod python;
@@ -13,5 +13,8 @@ pub fn rust(_py: Python, m: &PyModule) -> PyResult<()> {
     m.add_class::<GameEnvPy>()?;
     m.add_class::<ObservableGameStatePy>()?;
     m.add_class::<ActionListPy>()?;
+    m.add_class::<StepEnvPy>()?;
+    m.add_class::<BatchRunnerPy>()?;
+    m.add_function(wrap_pyfunction!(play_many, m)?)?;
     Ok(())
 }
@@ -0,0 +1,149 @@
+use numpy::{ndarray::Array2, AllowTypeChange, IntoPyArray, PyArray2, PyArrayLike1};
+use pyo3::{exceptions::PyValueError, pyclass, pymethods, Py, PyAny, PyResult, Python};
+use rand::SeedableRng;
+use rand_chacha::ChaCha8Rng;
+use rayon::prelude::*;
+
+use crate::game::{
+    actions::{num_actions, Action},
+    encoding::{encode_legal_actions, encode_observation, OBS_SIZE},
+    game::{Game, GameLogic},
+    gamestate::GamePlayer,
+    trajectory::NativePolicy,
+};
+
+struct GameSlot {
+    game: Game,
+    rng: ChaCha8Rng,
+}
+
+impl GameSlot {
+    /// Plays the native seat until the Python seat has to act or the game is over.
+    fn advance(&mut self, python_player: GamePlayer, opponent: NativePolicy) {
+        while !self.game.is_over() && self.game.game_state.acting_player != python_player {
+            let action = opponent.choose_action(&self.game.legal_actions(), &mut self.rng);
+            self.game
+                .step(action)
+                .expect("native policies only choose legal actions");
+        }
+    }
+}
+
+/// Runs many games in which one seat is played by a Python policy and the other natively. The native
+/// moves of every game are played on the rayon pool until each game waits for the Python seat, and the
+/// policy is then called once for all the waiting games:
+///
+///     policy(observations, legal_masks, history_lengths) -> actions
+///
+/// with observations (B, 151) u8, legal_masks (B, num_actions) bool and history_lengths (B,) i64, the
+/// number of moves played so far in each game, and actions any sequence of B action indices.
+#[pyclass(name = "BatchRunner")]
+pub struct BatchRunnerPy {
+    n_games: u64,
+    python_player: GamePlayer,
+    opponent: NativePolicy,
+    #[pyo3(get)]
+    policy_calls: u64,
+}
+
+#[pymethods]
+impl BatchRunnerPy {
+    #[new]
+    #[pyo3(signature = (n_games, python_player = 0, opponent = "random"))]
+    pub fn new(n_games: u64, python_player: u8, opponent: &str) -> PyResult<Self> {
+        let python_player = match python_player {
+            0 => GamePlayer::Player1,
+            1 => GamePlayer::Player2,
+            _ => return Err(PyValueError::new_err("python_player must be 0 or 1")),
+        };
+        Ok(BatchRunnerPy {
+            n_games,
+            python_player,
+            opponent: NativePolicy::try_from(opponent).map_err(PyValueError::new_err)?,
+            policy_calls: 0,
+        })
+    }
+
+    /// Plays every game to the end, game `i` being dealt from stream `i` of `seed`, and returns the
+    /// rewards of both players as an (n_games, 2) array.
+    pub fn run(&mut self, py: Python<'_>, policy: &PyAny, seed: u64) -> PyResult<Py<PyArray2<f32>>> {
+        let mut slots: Vec<GameSlot> = (0..self.n_games)
+            .map(|stream| {
+                let mut rng = ChaCha8Rng::seed_from_u64(seed);
+                rng.set_stream(stream);
+                GameSlot {
+                    game: Game::with_rng(&mut rng),
+                    rng,
+                }
+            })
+            .collect();
+        let mask_size = num_actions() as usize;
+        loop {
+            let (python_player, opponent) = (self.python_player, self.opponent);
+            py.allow_threads(|| {
+                slots
+                    .par_iter_mut()
+                    .for_each(|slot| slot.advance(python_player, opponent))
+            });
+            let waiting: Vec<usize> = (0..slots.len())
+                .filter(|&i| !slots[i].game.is_over())
+                .collect();
+            if waiting.is_empty() {
+                break;
+            }
+
+            let mut observations = Array2::<u8>::zeros((waiting.len(), OBS_SIZE));
+            let mut legal_masks = Array2::<bool>::default((waiting.len(), mask_size));
+            let mut history_lengths = Vec::with_capacity(waiting.len());
+            for (row, &i) in waiting.iter().enumerate() {
+                let game = &slots[i].game;
+                encode_observation(
+                    &game.game_state.observe(python_player),
+                    observations.row_mut(row).as_slice_mut().unwrap(),
+                );
+                encode_legal_actions(
+                    &game.legal_actions(),
+                    legal_masks.row_mut(row).as_slice_mut().unwrap(),
+                );
+                history_lengths.push(game.history.len() as i64);
+            }
+
+            let actions: PyArrayLike1<i64, AllowTypeChange> = policy
+                .call1((
+                    observations.into_pyarray(py),
+                    legal_masks.clone().into_pyarray(py),
+                    history_lengths.into_pyarray(py),
+                ))?
+                .extract()?;
+            self.policy_calls += 1;
+            let actions = actions.as_array();
+            if actions.len() != waiting.len() {
+                return Err(PyValueError::new_err(format!(
+                    "policy returned {} actions for {} games",
+                    actions.len(),
+                    waiting.len()
+                )));
+            }
+            for (row, (&i, &action)) in waiting.iter().zip(actions.iter()).enumerate() {
+                if action < 0 || action >= mask_size as i64 || !legal_masks[[row, action as usize]] {
+                    return Err(PyValueError::new_err(format!(
+                        "policy chose illegal action {} in game {}",
+                        action, i
+                    )));
+                }
+                slots[i]
+                    .game
+                    .step(Action::from(action as u8))
+                    .map_err(|e| PyValueError::new_err(e.to_string()))?;
+            }
+        }
+
+        let mut rewards = Array2::<f32>::zeros((slots.len(), 2));
+        for (i, slot) in slots.iter().enumerate() {
+            let (reward1, reward2) = slot.game.get_rewards();
+            rewards[[i, 0]] = reward1;
+            rewards[[i, 1]] = reward2;
+        }
+        Ok(rewards.into_pyarray(py).to_owned())
+    }
+}
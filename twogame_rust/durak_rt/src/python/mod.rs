@@ -1,6 +1,9 @@
 pub mod actions_py;
+pub mod batch_runner_py;
 pub mod card_py;
 pub mod env_py;
 pub mod gamestate_py;
 pub mod player_py;
+pub mod step_env_py;
+pub mod trajectory_py;
 pub mod utils;
@@ -0,0 +1,201 @@
+use numpy::PyArray1;
+use pyo3::{exceptions::PyValueError, pyclass, pymethods, Py, PyResult, Python};
+use rand::SeedableRng;
+use rand_chacha::ChaCha8Rng;
+
+use crate::game::{
+    actions::{num_actions, Action},
+    cards::{Card, Deck, Hand},
+    encoding::{encode_legal_actions, encode_observation, OBS_SIZE},
+    game::{Game, GameLogic},
+    gamestate::{GamePlayer, GameState},
+};
+
+type FullState = (Vec<u8>, Vec<u8>, Vec<u8>, Vec<u8>, Vec<u8>, Vec<u8>, u8, u8, u8, bool);
+
+/// Environment driven from Python one decision at a time. The observation of the acting player and its
+/// legal action bitmap are written into the two arrays passed to the constructor, which the caller owns and
+/// reads after every `reset` and `step`; nothing is allocated on the Python side per call.
+#[pyclass(name = "StepEnv")]
+pub struct StepEnvPy {
+    game: Game,
+    observation: Py<PyArray1<u8>>,
+    legal_mask: Py<PyArray1<bool>>,
+    done: bool,
+}
+
+fn check_buffer<T>(name: &str, array: &PyArray1<T>, size: usize) -> PyResult<()>
+where
+    T: numpy::Element,
+{
+    if !array.is_contiguous() {
+        return Err(PyValueError::new_err(format!("{} must be contiguous", name)));
+    }
+    if array.len() < size {
+        return Err(PyValueError::new_err(format!(
+            "{} must hold at least {} entries, got {}",
+            name,
+            size,
+            array.len()
+        )));
+    }
+    Ok(())
+}
+
+fn player_from_u8(player: u8) -> PyResult<GamePlayer> {
+    match player {
+        0 => Ok(GamePlayer::Player1),
+        1 => Ok(GamePlayer::Player2),
+        _ => Err(PyValueError::new_err(format!("Invalid player {}", player))),
+    }
+}
+
+impl StepEnvPy {
+    fn write_buffers(&self, py: Python<'_>) -> PyResult<()> {
+        let player = self.game.game_state.acting_player;
+        let mut observation = self.observation.as_ref(py).try_readwrite()?;
+        encode_observation(&self.game.game_state.observe(player), observation.as_slice_mut()?);
+        let mut legal_mask = self.legal_mask.as_ref(py).try_readwrite()?;
+        if self.done {
+            legal_mask.as_slice_mut()?.fill(false);
+        } else {
+            encode_legal_actions(&self.game.legal_actions(), legal_mask.as_slice_mut()?);
+        }
+        Ok(())
+    }
+}
+
+#[pymethods]
+impl StepEnvPy {
+    #[new]
+    pub fn new(py: Python<'_>, observation: Py<PyArray1<u8>>, legal_mask: Py<PyArray1<bool>>) -> PyResult<Self> {
+        check_buffer("observation", observation.as_ref(py), OBS_SIZE)?;
+        check_buffer("legal_mask", legal_mask.as_ref(py), num_actions() as usize)?;
+        Ok(StepEnvPy {
+            game: Game::new(),
+            observation,
+            legal_mask,
+            done: true,
+        })
+    }
+
+    /// Deals a new game from `seed` and returns the acting player.
+    pub fn reset(&mut self, py: Python<'_>, seed: u64) -> PyResult<u8> {
+        self.game = Game::with_rng(&mut ChaCha8Rng::seed_from_u64(seed));
+        self.done = self.game.is_over();
+        self.write_buffers(py)?;
+        Ok(self.acting_player())
+    }
+
+    /// Deals a new game from the given deck of card indices (suit * 9 + rank - 6, the suits ordered as in
+    /// the action ids), the last card being drawn first and the first one being the visible card. Returns the
+    /// acting player. This lets other engines replay the exact same deal.
+    pub fn deal(&mut self, py: Python<'_>, cards: Vec<u8>) -> PyResult<u8> {
+        let mut seen = [false; 36];
+        for &card in cards.iter() {
+            if card >= 36 || seen[card as usize] {
+                return Err(PyValueError::new_err(format!("Invalid or repeated card {}", card)));
+            }
+            seen[card as usize] = true;
+        }
+        if cards.len() < 13 {
+            return Err(PyValueError::new_err("the deck must hold at least 13 cards"));
+        }
+        self.game = Game::from_deck(Deck::from_cards(cards.into_iter().map(Card::from).collect()));
+        self.done = self.game.is_over();
+        self.write_buffers(py)?;
+        Ok(self.acting_player())
+    }
+
+    /// Plays `action` for the acting player and returns whether the game is over. The buffers then hold
+    /// the view of the next acting player, with an empty legal mask once the game is over.
+    pub fn step(&mut self, py: Python<'_>, action: u8) -> PyResult<bool> {
+        if self.done {
+            return Err(PyValueError::new_err("step called on a finished game, call reset first"));
+        }
+        if action >= num_actions() {
+            return Err(PyValueError::new_err(format!("Invalid action {}", action)));
+        }
+        if self.game.step(Action::from(action)).is_err() {
+            return Err(PyValueError::new_err(format!("Illegal action {}", action)));
+        }
+        self.done = self.game.is_over();
+        self.write_buffers(py)?;
+        Ok(self.done)
+    }
+
+    /// The full state as (deck, hand1, hand2, attack_table, defense_table, graveyard, visible_card,
+    /// acting_player, defender, defender_has_taken), cards being indices as in `deal`. Unlike the
+    /// observation buffer this includes both hands and keeps the order of the deck and tables.
+    pub fn full_state(&self) -> FullState {
+        let state = &self.game.game_state;
+        let indices = |cards: &[Card]| cards.iter().map(|&card| u8::from(card)).collect::<Vec<u8>>();
+        (
+            indices(state.deck.cards()),
+            indices(&state.hand1.0),
+            indices(&state.hand2.0),
+            indices(&state.attack_table),
+            indices(&state.defense_table),
+            indices(&state.graveyard),
+            u8::from(state.visible_card),
+            u8::from(state.acting_player),
+            u8::from(state.defending_player),
+            state.defender_has_taken,
+        )
+    }
+
+    /// Puts the game in a state returned by `full_state`, e.g. to search from an earlier state without
+    /// replaying the game up to it. The 36 cards must each be in exactly one of the deck, hands, tables and
+    /// graveyard. Returns whether the game is over.
+    pub fn restore(&mut self, py: Python<'_>, state: FullState) -> PyResult<bool> {
+        let (deck, hand1, hand2, attack_table, defense_table, graveyard, visible_card, acting, defender, taken) =
+            state;
+        let mut seen = [false; 36];
+        for &card in [&deck, &hand1, &hand2, &attack_table, &defense_table, &graveyard]
+            .iter()
+            .flat_map(|cards| cards.iter())
+        {
+            if card >= 36 || seen[card as usize] {
+                return Err(PyValueError::new_err(format!("Invalid or repeated card {}", card)));
+            }
+            seen[card as usize] = true;
+        }
+        if seen.contains(&false) || visible_card >= 36 {
+            return Err(PyValueError::new_err("the state must hold the 36 cards and a visible card"));
+        }
+        let cards = |indices: Vec<u8>| indices.into_iter().map(Card::from).collect::<Vec<Card>>();
+        self.game = Game {
+            history: Vec::new(),
+            game_state: GameState::new(
+                Deck::from_cards(cards(deck)),
+                cards(attack_table),
+                cards(defense_table),
+                Hand(cards(hand1)),
+                Hand(cards(hand2)),
+                player_from_u8(acting)?,
+                player_from_u8(defender)?,
+                Card::from(visible_card),
+                taken,
+                cards(graveyard),
+            ),
+        };
+        self.done = self.game.is_over();
+        self.write_buffers(py)?;
+        Ok(self.done)
+    }
+
+    #[getter]
+    pub fn acting_player(&self) -> u8 {
+        u8::from(self.game.game_state.acting_player)
+    }
+
+    #[getter]
+    pub fn done(&self) -> bool {
+        self.done
+    }
+
+    /// Final rewards of both players, (0, 0) while the game is running.
+    pub fn rewards(&self) -> (f32, f32) {
+        self.game.get_rewards()
+    }
+}
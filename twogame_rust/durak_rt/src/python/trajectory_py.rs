@@ -0,0 +1,36 @@
+use numpy::{ndarray::Array2, IntoPyArray};
+use pyo3::{exceptions::PyValueError, pyfunction, types::PyDict, PyObject, PyResult, Python};
+
+use crate::game::{
+    actions::num_actions,
+    encoding::OBS_SIZE,
+    trajectory::{self, NativePolicy},
+};
+
+/// Plays `n_games` games natively on the rayon pool with the GIL released and returns a dict of contiguous
+/// arrays: `observations` (steps, 151) u8, `actions` (steps,) u8, `players` (steps,) u8 with the acting
+/// player of each step, `legal_masks` (steps, num_actions) bool, `rewards` (n_games, 2) f32 and `offsets`
+/// (n_games + 1,) i64, game `g` being the steps `offsets[g]..offsets[g + 1]`.
+#[pyfunction]
+#[pyo3(signature = (n_games, seed, policy = "random"))]
+pub fn play_many(py: Python<'_>, n_games: u64, seed: u64, policy: &str) -> PyResult<PyObject> {
+    let policy = NativePolicy::try_from(policy).map_err(PyValueError::new_err)?;
+    let games = py.allow_threads(|| trajectory::play_many(n_games, seed, policy));
+
+    let steps = games.num_steps();
+    let observations = Array2::from_shape_vec((steps, OBS_SIZE), games.observations)
+        .map_err(|e| PyValueError::new_err(e.to_string()))?;
+    let legal_masks = Array2::from_shape_vec((steps, num_actions() as usize), games.legal_masks)
+        .map_err(|e| PyValueError::new_err(e.to_string()))?;
+    let rewards = Array2::from_shape_vec((n_games as usize, 2), games.rewards)
+        .map_err(|e| PyValueError::new_err(e.to_string()))?;
+
+    let result = PyDict::new(py);
+    result.set_item("observations", observations.into_pyarray(py))?;
+    result.set_item("actions", games.actions.into_pyarray(py))?;
+    result.set_item("players", games.players.into_pyarray(py))?;
+    result.set_item("legal_masks", legal_masks.into_pyarray(py))?;
+    result.set_item("rewards", rewards.into_pyarray(py))?;
+    result.set_item("offsets", games.offsets.into_pyarray(py))?;
+    Ok(result.into())
+}